@@ -0,0 +1,133 @@
+"""大变更集下结果流水线的内存基准。
+
+使用 tracemalloc 测量合成变更集在以下两种表示下的峰值内存：
+- legacy: 每个结果 json.dumps 后再 json.loads，分类为带前缀字符串的嵌套字典，并保留全部差异文本
+- compact: 流水线直接产出 FileResult 对象，合并后界面只保存共享的问题组，差异文本用后即释放
+
+用法:
+    python benchmarks/memory_benchmark.py --files 2000 --diff-lines 200 --findings 12
+"""
+import os
+import sys
+import gc
+import json
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.classifier import TYPE_PREFIXES, classify_suggestions, empty_file_data  # noqa: E402
+from src.core.consolidation import IncrementalConsolidator  # noqa: E402
+from src.core.pipeline import AnalysisPipeline  # noqa: E402
+from benchmarks.synthetic import SyntheticConfig, SyntheticAnalyzer  # noqa: E402
+
+
+class _SyntheticGit:
+    """按需生成差异文本的 Git 替身"""
+
+    config = SyntheticConfig()
+
+    def __init__(self, diff_lines):
+        self.diff_lines = diff_lines
+
+    def get_head_commit(self):
+        return None
+
+    def get_change_stats(self):
+        return {}
+
+    def get_file_diff(self, file_path):
+        lines = [f"@@ -1,{self.diff_lines} +1,{self.diff_lines} @@"]
+        lines.extend(f"+    value_{i} = compute('{file_path}', {i})" for i in range(self.diff_lines))
+        return '\n'.join(lines)
+
+
+def _legacy(files, git, analyzer):
+    """旧的表示：结果序列化往返，复制为带前缀字符串的嵌套字典，差异文本保留到最后"""
+    analysis_results = []
+    diffs = []
+    for file_path in files:
+        diff = git.get_file_diff(file_path)
+        diffs.append(f"File: {file_path}\n{diff}")
+        suggestions = analyzer.analyze_changes(file_path, diff)
+        analysis_results.append({'file': file_path, 'suggestions': json.dumps(suggestions, ensure_ascii=False)})
+
+    findings = []
+    analysis_data = {}
+    for result in analysis_results:
+        file_path = result['file']
+        file_data, _ = classify_suggestions(json.loads(result['suggestions']))
+        for severity, type_data in file_data.items():
+            for issue_type, items in type_data.items():
+                prefix_length = len(TYPE_PREFIXES[issue_type]) + 1
+                findings.extend(
+                    {'file': file_path, 'severity': severity, 'issue_type': issue_type, 'text': item[prefix_length:]}
+                    for item in items
+                )
+        analysis_data[file_path] = empty_file_data()
+
+    groups = {}
+    for finding in findings:
+        group = groups.setdefault((finding['issue_type'], finding['text']), dict(finding, files=[]))
+        group['files'].append(finding['file'])
+    for group in groups.values():
+        item = f"{TYPE_PREFIXES[group['issue_type']]} {group['text']}"
+        if len(group['files']) > 1:
+            item += f"（共{len(group['files'])}个文件）"
+        for file_path in group['files']:
+            analysis_data[file_path][group['severity']][group['issue_type']].append(item)
+    return analysis_data, analysis_results, diffs
+
+
+def _compact(files, git, analyzer):
+    """当前的表示：流水线产出紧凑对象，差异文本在生成提交信息后释放"""
+    run = AnalysisPipeline(git, analyzer).run(files)
+    diffs = run.pop('diffs')
+    results = run.pop('results')
+    # 与界面相同，逐个结果增量合并
+    consolidator = IncrementalConsolidator(git.config.dedup_threshold)
+    analysis_data = {}
+    for result in results:
+        groups = analysis_data[result.file] = []
+        for finding in result.findings:
+            group, _ = consolidator.add_finding(finding)
+            if group not in groups:
+                groups.append(group)
+        for change in result.changes:
+            consolidator.add_change(change)
+    del results
+    # 提交信息生成完成后差异文本即被释放
+    del diffs
+    return analysis_data
+
+
+def measure(name, func, *args):
+    gc.collect()
+    tracemalloc.start()
+    retained = func(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del retained
+    print(f"{name:<8} 峰值 {peak / 1024 / 1024:8.1f} MiB    结束时保留 {current / 1024 / 1024:8.1f} MiB")
+    return peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="结果流水线内存基准")
+    parser.add_argument('--files', type=int, default=2000, help="变更文件数")
+    parser.add_argument('--diff-lines', type=int, default=200, help="每个文件的差异行数")
+    parser.add_argument('--findings', type=int, default=12, help="每个文件的问题数")
+    args = parser.parse_args(argv)
+
+    files = [f"src/module_{i // 50}/file_{i}.py" for i in range(args.files)]
+    git = _SyntheticGit(args.diff_lines)
+    analyzer = SyntheticAnalyzer(args.findings)
+
+    print(f"{args.files} 个文件，每个 {args.diff_lines} 行差异、{args.findings} 个问题")
+    legacy_peak = measure('legacy', _legacy, files, git, analyzer)
+    compact_peak = measure('compact', _compact, files, git, analyzer)
+    print(f"峰值降低 {(1 - compact_peak / legacy_peak) * 100:.0f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""按阶段的峰值内存剖析。
+
+在临时目录生成指定规模的合成仓库，使用真实的 GitAssistant、AnalysisPipeline 和
+MainWindow 结果展示逻辑（分析器为不发请求的替身，控件为内存中的文本），在检测、差异、
+分析、渲染、提交信息各阶段边界记录 tracemalloc 快照和进程 RSS，并列出各阶段新增内存
+最多的调用位置。
+
+用法:
+    python benchmarks/memory_profile.py --files 1000 --lines 600 --new-files 50
+    python benchmarks/memory_profile.py --files 1000 --json out.json
+    python benchmarks/memory_profile.py --files 1000 --baseline out.json   # 与上次结果比较峰值
+"""
+import os
+import sys
+import gc
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.git_assistant import GitAssistant  # noqa: E402
+from src.core.pipeline import AnalysisPipeline  # noqa: E402
+from src.utils.profiling import MemoryProfiler, stage  # noqa: E402
+from benchmarks.synthetic import SyntheticConfig, SyntheticAnalyzer, create_repo, headless_window  # noqa: E402
+
+
+def profile_run(repo_path, findings, workers, profiler):
+    """按 MainWindow.start_analysis 的流程执行一次完整分析"""
+    config = SyntheticConfig()
+    config.max_workers = workers
+    assistant = GitAssistant(repo_path, config=config)
+    # 模块导入和对象构建不计入各阶段
+    window = headless_window(config)
+    pipeline = AnalysisPipeline(assistant, SyntheticAnalyzer(findings))
+    gc.collect()
+    profiler.start()
+
+    with stage('detection'):
+        modified_files = assistant.get_modified_files()
+    window.reset_results(len(modified_files))
+    run = pipeline.run(
+        modified_files, on_result=window.add_file_result, on_skipped=window.add_skipped_file,
+        on_commit_message=window.show_ai_commit_message
+    )
+    run.pop('diffs')
+    run.pop('results')
+    with stage('rendering'):
+        window.finish_results(run['unfinished'])
+    return window
+
+
+def compare(baseline_path, profiler):
+    """打印与基线相比各阶段峰值的变化"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {record['name']: record for record in json.load(f)['stages']}
+    print("\n与基线比较（峰值）:")
+    for record in profiler.stages:
+        previous = baseline.get(record.name)
+        if previous is None or not previous['peak']:
+            continue
+        change = (record.peak - previous['peak']) / previous['peak'] * 100
+        print(f"  {record.name:<12}{previous['peak'] / 1048576:8.1f} -> {record.peak / 1048576:8.1f} MiB ({change:+.0f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按阶段的峰值内存剖析")
+    parser.add_argument('--files', type=int, default=500, help="合成仓库的文件数")
+    parser.add_argument('--lines', type=int, default=300, help="每个文件的行数")
+    parser.add_argument('--modified', type=float, default=1.0, help="被修改的文件比例")
+    parser.add_argument('--new-files', type=int, default=0, help="未跟踪的新文件数")
+    parser.add_argument('--findings', type=int, default=12, help="每个文件的问题数")
+    parser.add_argument('--workers', type=int, default=4, help="并发分析线程数")
+    parser.add_argument('--top', type=int, default=8, help="每个阶段列出的调用位置数")
+    parser.add_argument('--frames', type=int, default=1, help="调用位置的调用栈深度")
+    parser.add_argument('--repo', help="使用已有仓库而不是生成合成仓库")
+    parser.add_argument('--json', help="把结果写入 JSON 文件")
+    parser.add_argument('--baseline', help="与之前写出的 JSON 结果比较")
+    args = parser.parse_args(argv)
+
+    temp_dir = None
+    repo_path = args.repo
+    if repo_path is None:
+        temp_dir = tempfile.mkdtemp(prefix='git-llm-profile-')
+        repo_path = create_repo(temp_dir, args.files, args.lines, args.modified, args.new_files)
+        print(f"合成仓库: {args.files} 个文件 × {args.lines} 行，修改比例 {args.modified}，新文件 {args.new_files} 个")
+
+    profiler = MemoryProfiler(top=args.top, frames=args.frames)
+    try:
+        window = profile_run(repo_path, args.findings, args.workers, profiler)
+        del window
+    finally:
+        profiler.stop()
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print(profiler.report())
+    if args.baseline:
+        compare(args.baseline, profiler)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(profiler.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""基准和剖析共用的合成数据。
+
+- SyntheticConfig: 不读取 .env 的配置替身
+- SyntheticAnalyzer: 返回固定结构建议、不发送请求的分析器替身
+- create_repo: 生成指定规模的临时 Git 仓库并制造修改
+- headless_window: 不创建 Tk 窗口、以内存中的文本代替控件的 MainWindow，用于测量渲染阶段
+"""
+import os
+import subprocess
+
+
+class SyntheticConfig:
+    model = 'benchmark'
+    reuse_results = False
+    hunk_cache = False
+    similar_threshold = 0.0
+    cluster_threshold = 0.0
+    secret_scan = False
+    secret_patterns_file = None
+    secret_entropy = 4.5
+    staged_only = False
+    max_workers = 4
+    dedup_threshold = 0.8
+    max_diff_lines = 0
+    generated_patterns = None
+    order_policy = 'none'
+    risk_patterns = None
+    refine_commit_message = False
+    context_tokens = 0
+    max_run_tokens = 0
+    max_run_cost = 0.0
+    input_price = 0.0
+    output_price = 0.0
+    expected_latency = 8.0
+    budget_steps = ('compact', 'summary', 'sample')
+    run_timeout = 0.0
+    remote_cache_url = None
+
+    def should_ignore(self, file_path):
+        return False
+
+
+class SyntheticAnalyzer:
+    """返回固定结构建议的分析器替身"""
+
+    def __init__(self, findings=12):
+        self.findings = findings
+
+    def analyze_changes(self, file_path, diff_content, cancel_token=None, priority=None, context=None, detail='full',
+                        tag_hunks=False):
+        half = max(1, self.findings // 2)
+        return {
+            'code_quality': {
+                'changes': [f"在 {file_path} 中新增计算逻辑"],
+                'issues': [f"{file_path} 第 {i} 处存在重复计算" for i in range(half)],
+                'improvements': ["建议提取公共函数"]
+            },
+            'security_issues': {
+                'vulnerabilities': [f"{file_path} 的输入 {i} 未校验" for i in range(self.findings - half)],
+                'warnings': ["未发现安全问题"],
+                'recommendations': ["建议增加输入校验"]
+            }
+        }
+
+    def generate_commit_message(self, diffs, cancel_token=None, priority=None, review_notes=None):
+        return f"chore: 更新 {len(diffs)} 个文件"
+
+
+def _git(path, *args):
+    subprocess.run(
+        ['git', '-c', 'user.name=benchmark', '-c', 'user.email=benchmark@example.com', *args],
+        cwd=path, check=True, stdout=subprocess.DEVNULL
+    )
+
+
+def _file_content(index, lines, revision):
+    return ''.join(
+        f"def func_{index}_{line}(value):\n    return value * {line + revision}\n\n" for line in range(lines // 3)
+    )
+
+
+def create_repo(path, files=200, lines=300, modified=1.0, new_files=0):
+    """在 path 下创建合成仓库。
+
+    Args:
+        path (str): 仓库目录（需为空或不存在）
+        files (int): 已提交的文件数
+        lines (int): 每个文件的行数
+        modified (float): 提交后被修改的文件比例（0~1），被修改的文件每个函数都会变化
+        new_files (int): 未跟踪的新文件数
+
+    Returns:
+        str: 仓库路径
+    """
+    os.makedirs(path, exist_ok=True)
+    _git(path, 'init', '-q')
+    paths = [os.path.join(f"pkg_{i // 50}", f"module_{i}.py") for i in range(files)]
+    for index, relative in enumerate(paths):
+        full = os.path.join(path, relative)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, 'w', encoding='utf-8') as f:
+            f.write(_file_content(index, lines, 0))
+    _git(path, 'add', '-A')
+    _git(path, 'commit', '-q', '-m', 'init')
+
+    for index, relative in enumerate(paths[:int(files * modified)]):
+        with open(os.path.join(path, relative), 'w', encoding='utf-8') as f:
+            f.write(_file_content(index, lines, 1))
+    for index in range(new_files):
+        full = os.path.join(path, 'new', f"added_{index}.py")
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, 'w', encoding='utf-8') as f:
+            f.write(_file_content(files + index, lines, 0))
+    return path
+
+
+class _HeadlessWidget:
+    """以字符串列表代替 Tk Text/Listbox，保留控件中的全部文本"""
+
+    def __init__(self):
+        self.items = []
+
+    def size(self):
+        return len(self.items)
+
+    def delete(self, first, last=None):
+        if last is None and isinstance(first, int):
+            del self.items[first]
+        else:
+            self.items = []
+
+    def insert(self, index, text, *tags):
+        if isinstance(index, int):
+            self.items.insert(index, text)
+        elif index == '1.0':
+            self.items.insert(0, text)
+        else:
+            self.items.append(text)
+
+    def itemconfig(self, *args, **kwargs):
+        pass
+
+    def see(self, *args):
+        pass
+
+    def get(self, *args):
+        return ''.join(self.items)
+
+
+class _HeadlessGit:
+    def __init__(self, config):
+        self.config = config
+
+
+def headless_window(config):
+    """创建不依赖显示环境的 MainWindow，只用于调用结果展示相关的方法"""
+    from src.core.search import FilterQuery
+    from src.gui.main_window import MainWindow
+
+    window = MainWindow.__new__(MainWindow)
+    window.git_assistant = _HeadlessGit(config)
+    window.active_filter = FilterQuery()
+    for name in ('file_list', 'summary_text', 'detail_text', 'commit_message', 'status_text'):
+        setattr(window, name, _HeadlessWidget())
+    return window
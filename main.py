@@ -1,14 +1,214 @@
 import os
 import sys
-import tkinter as tk
-from src.gui.main_window import MainWindow
+import argparse
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AI Git Commit Assistant")
+    parser.add_argument('repo_path', nargs='?', default=os.getcwd(), help="Git 仓库路径，默认为当前目录")
+    parser.add_argument('--daemon', action='store_true', help="以前台方式启动后台守护进程")
+    parser.add_argument('--stop-daemon', action='store_true', help="停止正在运行的守护进程")
+    parser.add_argument('--commit-msg-file', metavar='FILE',
+                        help="生成提交信息并写入指定文件（供 prepare-commit-msg 钩子使用）")
+    parser.add_argument('--review', metavar='RANGE',
+                        help="审查提交范围（例如 main..feature），无需检出代码")
+    parser.add_argument('--staged', action='store_true',
+                        help="只分析和提交暂存区中的修改（等同于 GIT_LLM_STAGED_ONLY=true）")
+    parser.add_argument('--export-jsonl', metavar='FILE',
+                        help="不启动界面，分析变更并逐文件流式写出 JSON Lines（- 表示标准输出）")
+    parser.add_argument('--export-sarif', metavar='FILE',
+                        help="不启动界面，分析变更并逐文件流式写出 SARIF 2.1.0，供代码扫描看板使用")
+    parser.add_argument('--cache-server', nargs='?', const='127.0.0.1:8765', metavar='HOST:PORT',
+                        help="启动团队共享的远程结果缓存服务（默认 127.0.0.1:8765）")
+    parser.add_argument('--cache-db', metavar='FILE', default='git-llm-cache.db',
+                        help="远程结果缓存服务的数据库路径（默认 ./git-llm-cache.db）")
+    parser.add_argument('--profile', nargs='?', const='profile', metavar='DIR',
+                        help="按阶段记录 CPU 剖析数据（pstats 与火焰图折叠调用栈），写入 DIR（默认 ./profile）")
+    return parser.parse_args(argv)
+
+
+def write_commit_message(repo_path, message_file):
+    """为 prepare-commit-msg 钩子生成提交信息，守护进程可用时优先使用守护进程"""
+    from src.core.daemon import DaemonClient
+    from src.utils.profiling import stage
+
+    # 已有提交信息（如 -m、merge、amend）时不覆盖
+    with open(message_file, 'r', encoding='utf-8') as f:
+        existing = [line for line in f if line.strip() and not line.startswith('#')]
+    if existing:
+        return
+
+    client = DaemonClient.try_connect()
+    if client is not None:
+        message = client.generate_commit_message_for_repo(repo_path)
+    else:
+        from src.core.git_assistant import GitAssistant
+        from src.core.ai_analyzer import AIAnalyzer
+
+        assistant = GitAssistant(repo_path)
+        with stage('detection'):
+            modified_files = assistant.get_modified_files()
+        with stage('diffing'):
+            diffs = [f"File: {file_path}\n{assistant.get_file_diff(file_path)}" for file_path in modified_files]
+        with stage('commit'):
+            message = AIAnalyzer().generate_commit_message(diffs)
+
+    if message.startswith('error:'):
+        print(f"生成提交信息失败: {message}", file=sys.stderr)
+        return
+
+    with open(message_file, 'r', encoding='utf-8') as f:
+        template = f.read()
+    with open(message_file, 'w', encoding='utf-8') as f:
+        f.write(message + "\n" + template)
+
+
+def review_range(repo_path, rev_range):
+    """命令行审查提交范围，逐提交输出报告并在最后输出汇总"""
+    from src.core.daemon import DaemonClient
+    from src.core.git_assistant import GitAssistant
+    from src.core.history import HistoryReviewer, format_commit_report, format_aggregate_report
+    from src.core.result_store import ResultStore
+    from src.utils.profiling import stage
+
+    ai_analyzer = DaemonClient.try_connect()
+    if ai_analyzer is None:
+        from src.core.ai_analyzer import AIAnalyzer
+        ai_analyzer = AIAnalyzer()
+
+    git_assistant = GitAssistant(repo_path)
+    reviewer = HistoryReviewer(git_assistant, ai_analyzer, result_store=ResultStore.for_repo(git_assistant))
+    with stage('analysis'):
+        aggregate = reviewer.review(
+            rev_range, on_commit=lambda report: print(format_commit_report(report), flush=True)
+        )
+    with stage('rendering'):
+        print()
+        print(format_aggregate_report(aggregate))
+
+
+def export_results(repo_path, jsonl_path=None, sarif_path=None):
+    """不启动界面分析当前变更，每个文件完成时立即写入导出文件"""
+    from src.core.daemon import DaemonClient
+    from src.core.exporters import ExporterGroup, JsonLinesExporter, SarifExporter
+    from src.core.git_assistant import GitAssistant
+    from src.core.pipeline import AnalysisPipeline
+    from src.core.remote_cache import RemoteCacheClient
+    from src.core.result_store import ResultStore
+    from src.core.symbols import SymbolIndex
+    from src.utils.profiling import stage
+
+    ai_analyzer = DaemonClient.try_connect()
+    if ai_analyzer is None:
+        from src.core.ai_analyzer import AIAnalyzer
+        ai_analyzer = AIAnalyzer()
+
+    git_assistant = GitAssistant(repo_path)
+    pipeline = AnalysisPipeline(
+        git_assistant, ai_analyzer, ResultStore.for_repo(git_assistant),
+        symbol_index=SymbolIndex.for_repo(git_assistant),
+        remote_cache=RemoteCacheClient.from_config(git_assistant.config)
+    )
+    exporters = []
+    if jsonl_path:
+        exporters.append(JsonLinesExporter(jsonl_path))
+    if sarif_path:
+        exporters.append(SarifExporter(sarif_path))
+
+    with ExporterGroup(exporters) as exporter:
+        with stage('detection'):
+            modified_files = git_assistant.get_modified_files()
+        # 结果写出后即丢弃，不在内存中累积
+        run = pipeline.run(
+            modified_files, on_result=exporter.write_result, on_skipped=exporter.write_skipped,
+            keep_results=False
+        )
+    print(
+        f"已导出 {len(modified_files) - len(run['unfinished'])}/{len(modified_files)} 个文件的分析结果",
+        file=sys.stderr
+    )
+
+
+def serve_cache(address, db_path):
+    """启动远程结果缓存服务，令牌读取 GIT_LLM_REMOTE_CACHE_TOKEN"""
+    from src.core.remote_cache import RemoteCacheServer
+
+    host, _, port = address.rpartition(':')
+    server = RemoteCacheServer(
+        os.path.abspath(db_path), host or '127.0.0.1', int(port), os.getenv('GIT_LLM_REMOTE_CACHE_TOKEN') or None
+    )
+    print(f"远程结果缓存服务: {server.address}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
 
 def main():
-    repo_path = sys.argv[1] if len(sys.argv) > 1 else os.getcwd()
-    
+    args = parse_args()
+
+    if args.staged:
+        # .env 以覆盖模式加载，命令行参数需要在每次加载后重新应用
+        from src.utils.config import Config
+        Config.override('GIT_LLM_STAGED_ONLY', 'true')
+
+    if args.export_jsonl or args.export_sarif:
+        # 导出结果可以写到标准输出（-），控制台日志改到标准错误，避免混入 JSON Lines / SARIF
+        from src.utils.logger import Logger
+        Logger.set_console_stream(sys.stderr)
+
+    if args.profile:
+        from src.utils.profiling import CpuProfiler
+
+        profiler = CpuProfiler(os.path.abspath(args.profile))
+        profiler.start()
+        try:
+            run(args)
+        finally:
+            profiler.stop()
+            print(profiler.report(), file=sys.stderr)
+        return
+
+    run(args)
+
+
+def run(args):
+    if args.daemon:
+        from src.core.daemon import DaemonServer
+        DaemonServer().serve_forever()
+        return
+
+    if args.cache_server:
+        serve_cache(args.cache_server, args.cache_db)
+        return
+
+    if args.stop_daemon:
+        from src.core.daemon import DaemonClient
+        client = DaemonClient.try_connect()
+        if client is None:
+            print("守护进程未运行")
+        else:
+            client.shutdown()
+        return
+
+    if args.review:
+        review_range(args.repo_path, args.review)
+        return
+
+    if args.commit_msg_file:
+        write_commit_message(args.repo_path, args.commit_msg_file)
+        return
+
+    if args.export_jsonl or args.export_sarif:
+        export_results(args.repo_path, args.export_jsonl, args.export_sarif)
+        return
+
+    import tkinter as tk
+    from src.gui.main_window import MainWindow
+
     root = tk.Tk()
-    app = MainWindow(root, repo_path)
+    app = MainWindow(root, args.repo_path)
     root.mainloop()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,10 +1,107 @@
 import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 import openai
+from .backends import create_backend
+from .budget import COMPLETION_TOKENS
+from .cancellation import AnalysisCancelled
+from .hunks import HUNK_TAG
+from .resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, hedged_call
+from .scheduler import RequestScheduler, PRIORITY_INTERACTIVE, PRIORITY_NORMAL
+from ..utils.metrics import metrics
+from ..utils.tokens import estimate_messages_tokens
 from ..utils.config import Config
 from ..utils.logger import Logger
 
 logger = Logger(__name__)
 
+# 预估的输出 token 数，用于 TPM 限流
+ANALYSIS_COMPLETION_TOKENS = 800
+COMMIT_COMPLETION_TOKENS = 300
+
+# 限流或临时错误时的最大重试次数
+MAX_RETRIES = 3
+
+# 运行预算不足时附加在系统提示后的降级说明
+DETAIL_INSTRUCTIONS = {
+    'full': '',
+    'compact': "\n本次运行预算有限：只返回 code_quality 和 security_issues 两个字段，省略 performance 和 best_practices。",
+    'summary': (
+        "\n本次运行预算有限，只做摘要级分析：只返回 code_quality.changes（不超过3条）和 "
+        "security_issues.vulnerabilities，省略其他字段，每条不超过一句话。差异可能已被截断。"
+    ),
+}
+
+# 修改分析提示时需递增 remote_cache.PROMPT_VERSION
+ANALYSIS_SYSTEM_PROMPT = """你是一个专业的代码审查助手，请用中文分析代码变更并提供结构化的JSON格式建议。
+                        你的响应必须是一个JSON对象，包含以下字段：
+                        {
+                            "code_quality": {
+                                "changes": ["代码变更的具体内容描述"],
+                                "issues": ["发现的代码质量问题"],
+                                "improvements": ["代码改进建议"]
+                            },
+                            "security_issues": {
+                                "vulnerabilities": ["安全漏洞描述"],
+                                "warnings": ["安全警告信息"],
+                                "recommendations": ["安全改进建议"]
+                            },
+                            "performance": {
+                                "bottlenecks": ["性能瓶颈描述"],
+                                "optimizations": ["优化建议"],
+                                "suggestions": ["其他性能改进建议"]
+                            },
+                            "best_practices": {
+                                "violations": ["违反最佳实践的地方"],
+                                "recommendations": ["最佳实践建议"],
+                                "examples": ["改进示例"]
+                            }
+                        }
+                        
+                        请确保：
+                        1. 返回的是有效的JSON格式
+                        2. 所有内容必须使用中文
+                        3. 每个数组至少包含一个项目
+                        4. 如果某个方面没有问题，使用积极的评价，例如"代码结构清晰"、"未发现安全问题"等
+                        5. 建议要具体且可操作
+                        6. 描述要清晰易懂
+                        """
+
+
+# 差异中的差异块带编号时追加的说明，编号格式见 hunks.HUNK_TAG
+HUNK_TAG_INSTRUCTION = (
+    f"\n差异中的差异块按 {HUNK_TAG.format(1)}、{HUNK_TAG.format(2)} …… 编号：只涉及单个差异块的条目请以该编号开头，"
+    f"例如 \"{HUNK_TAG.format(2)} 未校验输入参数\"；涉及多个差异块或整个文件的条目不加编号。"
+)
+
+
+def analysis_messages(file_path, diff_content, context=None, detail='full', tag_hunks=False):
+    """构建单个文件分析请求的消息，同步与异步分析器共用"""
+    user_content = f"文件: {file_path}\n差异内容:\n{diff_content}"
+    if context:
+        user_content += f"\n\n相关上下文（仅供理解，不属于本次变更）:\n{context}"
+    system_content = ANALYSIS_SYSTEM_PROMPT + DETAIL_INSTRUCTIONS.get(detail, '')
+    if tag_hunks:
+        system_content += HUNK_TAG_INSTRUCTION
+    return [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": user_content},
+    ]
+
+
+def analysis_error(error):
+    """分析失败时返回的结果，结构与正常结果相同"""
+    return {
+        'error': str(error),
+        'code_quality': {'error': '分析失败'},
+        'security_issues': {'error': '分析失败'},
+        'performance': {'error': '分析失败'},
+        'best_practices': {'error': '分析失败'}
+    }
+
 """AI代码分析器，负责分析代码变更并生成建议。
 
 此类使用OpenAI API来分析代码变更，提供：
@@ -13,10 +110,13 @@ logger = Logger(__name__)
 3. 提交信息生成
 """
 class AIAnalyzer:
-    def __init__(self):
+    def __init__(self, backend=None):
         """初始化AI分析器。
         
         配置OpenAI API的认证信息和基础URL。
+
+        Args:
+            backend (ChatBackend): 请求后端，默认按 GIT_LLM_BACKEND 配置创建
         
         Raises:
             Exception: 初始化失败时抛出异常
@@ -24,14 +124,29 @@ class AIAnalyzer:
         logger.info("初始化 AI 分析器...")
         try:
             config = Config()
-            openai.api_key = config.api_key
-            openai.base_url = config.api_base
+            self.request_timeout = config.request_timeout or None
+            self.backend = backend if backend is not None else create_backend(config)
+            self.scheduler = RequestScheduler(config.requests_per_minute, config.tokens_per_minute)
+            self.breaker = CircuitBreaker(
+                config.breaker_threshold, config.breaker_window, cooldown=config.breaker_cooldown
+            )
+            self.hedge_percentile = config.hedge_percentile
+            self.hedge_min_delay = config.hedge_min_delay
+            # 按预估输出 token 数区分请求类型，分析与提交信息的耗时分布不同
+            self._latencies = {}
+            self._latencies_lock = threading.Lock()
+            self._usage = threading.local()
+            self.model = config.model
+            self.cache_size = config.cache_size
+            self._cache = OrderedDict()
+            self._cache_lock = threading.Lock()
             logger.info("AI 分析器初始化完成")
         except Exception as e:
             logger.exception("AI 分析器初始化失败")
             raise
 
-    def analyze_changes(self, file_path, diff_content):
+    def analyze_changes(self, file_path, diff_content, cancel_token=None, priority=PRIORITY_NORMAL, context=None,
+                        detail='full', tag_hunks=False):
         """分析文件变更并返回结构化的建议。
         
         使用OpenAI API分析代码差异，生成包含代码质量、安全问题等方面的建议。
@@ -39,6 +154,12 @@ class AIAnalyzer:
         Args:
             file_path (str): 变更文件的路径
             diff_content (str): git diff的内容
+            cancel_token (CancelToken): 取消令牌，取消时中止进行中的请求
+            priority (int): 调度优先级通道
+            context (str): 可选的补充上下文（所在函数、调用的定义签名等），不属于本次变更
+            detail (str): 分析级别，full 完整分析；运行预算不足时为 compact（省略性能与最佳实践）
+                或 summary（只做摘要级分析）
+            tag_hunks (bool): 差异中的差异块带有编号（hunks.join_hunks），要求按编号标注每条建议
             
         Returns:
             dict: 包含分析结果的JSON对象，结构如下：
@@ -56,75 +177,54 @@ class AIAnalyzer:
                 }
         """
         logger.info(f"开始分析文件: {file_path}")
+        cache_key = self._cache_key('analyze', self.model, file_path, diff_content, context or '', detail,
+                                    'tagged' if tag_hunks else '')
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info(f"命中缓存: {file_path}")
+            return cached
+
         try:
-            response = openai.chat.completions.create(
-                model="gpt-3.5-turbo-1106",  # 使用支持 JSON 模式的模型
+            response = self._create_completion(
+                cancel_token, priority, COMPLETION_TOKENS.get(detail, ANALYSIS_COMPLETION_TOKENS),
+                model=self.model,  # 使用支持 JSON 模式的模型
                 response_format={ "type": "json_object" },
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """你是一个专业的代码审查助手，请用中文分析代码变更并提供结构化的JSON格式建议。
-                        你的响应必须是一个JSON对象，包含以下字段：
-                        {
-                            "code_quality": {
-                                "changes": ["代码变更的具体内容描述"],
-                                "issues": ["发现的代码质量问题"],
-                                "improvements": ["代码改进建议"]
-                            },
-                            "security_issues": {
-                                "vulnerabilities": ["安全漏洞描述"],
-                                "warnings": ["安全警告信息"],
-                                "recommendations": ["安全改进建议"]
-                            },
-                            "performance": {
-                                "bottlenecks": ["性能瓶颈描述"],
-                                "optimizations": ["优化建议"],
-                                "suggestions": ["其他性能改进建议"]
-                            },
-                            "best_practices": {
-                                "violations": ["违反最佳实践的地方"],
-                                "recommendations": ["最佳实践建议"],
-                                "examples": ["改进示例"]
-                            }
-                        }
-                        
-                        请确保：
-                        1. 返回的是有效的JSON格式
-                        2. 所有内容必须使用中文
-                        3. 每个数组至少包含一个项目
-                        4. 如果某个方面没有问题，使用积极的评价，例如"代码结构清晰"、"未发现安全问题"等
-                        5. 建议要具体且可操作
-                        6. 描述要清晰易懂
-                        """
-                    },
-                    {
-                        "role": "user",
-                        "content": f"文件: {file_path}\n差异内容:\n{diff_content}"
-                    }
-                ]
+                messages=analysis_messages(file_path, diff_content, context, detail, tag_hunks)
             )
             
-            result = response.choices[0].message.content
             # 确保返回的是有效的JSON
-            return json.loads(result)
+            result = json.loads(response.content)
+            self._cache_put(cache_key, result)
+            return result
             
+        except AnalysisCancelled:
+            raise
         except Exception as e:
             logger.error(f"分析文件 {file_path} 时发生错误: {str(e)}")
-            return {
-                'error': str(e),
-                'code_quality': {'error': '分析失败'},
-                'security_issues': {'error': '分析失败'},
-                'performance': {'error': '分析失败'},
-                'best_practices': {'error': '分析失败'}
-            }
-
-    def generate_commit_message(self, diffs):
-        """生成提交信息"""
+            return analysis_error(e)
+
+    def generate_commit_message(self, diffs, cancel_token=None, priority=PRIORITY_INTERACTIVE, review_notes=None):
+        """生成提交信息
+
+        Args:
+            diffs (list): ["File: 路径\\n差异", ...]
+            review_notes (str): 可选的代码审查结论，用于在分析完成后完善提交信息
+        """
         logger.info("开始生成提交信息")
+        cache_key = self._cache_key('commit', self.model, review_notes or '', *diffs)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info("命中缓存: 提交信息")
+            return cached
+
         try:
             combined_diff = "\n\n".join(diffs)
-            response = openai.chat.completions.create(
-                model="gpt-3.5-turbo-1106",
+            user_content = f"代码变更内容:\n{combined_diff}"
+            if review_notes:
+                user_content += f"\n\n代码审查结论（供参考）:\n{review_notes}"
+            response = self._create_completion(
+                cancel_token, priority, COMMIT_COMPLETION_TOKENS,
+                model=self.model,
                 response_format={ "type": "json_object" },
                 messages=[
                     {
@@ -155,12 +255,12 @@ class AIAnalyzer:
                     },
                     {
                         "role": "user",
-                        "content": f"代码变更内容:\n{combined_diff}"
+                        "content": user_content
                     }
                 ]
             )
             
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(response.content)
             # 构造约定式提交信息
             commit_message = f"{result['type']}"
             if result.get('scope'):
@@ -168,9 +268,181 @@ class AIAnalyzer:
             commit_message += f": {result['description']}"
             if result.get('body'):
                 commit_message += f"\n\n{result['body']}"
-                
+
+            self._cache_put(cache_key, commit_message)
             return commit_message
             
+        except AnalysisCancelled:
+            raise
         except Exception as e:
             logger.error(f"生成提交信息时发生错误: {str(e)}")
-            return f"error: {str(e)}" 
\ No newline at end of file
+            return f"error: {str(e)}"
+
+    def _create_completion(self, cancel_token=None, priority=PRIORITY_NORMAL, completion_tokens=0, **kwargs):
+        """经调度器放行后发送聊天补全请求。
+
+        请求按本地估算的 token 数占用 RPM/TPM 令牌桶；收到限流响应时暂停调度器
+        并重试，临时性错误按指数退避重试。耗时超过同类请求的对冲百分位时再发出一个相同请求，
+        先返回的结果生效；接口错误率过高时熔断，剩余请求立即失败。
+
+        Raises:
+            AnalysisCancelled: 请求完成前运行被取消
+            CircuitOpenError: 熔断期间
+        """
+        estimated = estimate_messages_tokens(kwargs['messages']) + completion_tokens
+        latencies = self._latency_tracker(completion_tokens)
+        for attempt in range(MAX_RETRIES + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"接口错误率过高，已熔断，{self.breaker.retry_in():.0f} 秒后重试")
+            self.scheduler.acquire(estimated, priority, cancel_token)
+            try:
+                response, hedge_fired, _ = hedged_call(
+                    lambda: self._send_counted(estimated, cancel_token, **kwargs), self._hedge_delay(latencies),
+                    allow=lambda: self._allow_hedge(estimated, cancel_token)
+                )
+            except openai.RateLimitError as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                self.scheduler.pause(self._retry_after(e, attempt))
+                continue
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                self.breaker.record_failure()
+                if attempt == MAX_RETRIES or isinstance(e, openai.APITimeoutError):
+                    raise
+                delay = 0.5 * (2 ** attempt)
+                logger.warning(f"请求失败，{delay:.1f} 秒后重试: {str(e)}")
+                if cancel_token is not None:
+                    if cancel_token.wait(delay):
+                        raise AnalysisCancelled(cancel_token.reason)
+                else:
+                    time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            latencies.record(response.latency)
+            # 运行预算按这些计数统计实际用量；后端未返回用量时按本地估算。
+            # 发出对冲请求后两个请求都会计费，无论哪个先返回，落后的一个按提示 token 计入
+            prompt_tokens = estimated - completion_tokens
+            sent = 2 if hedge_fired else 1
+            self._record_usage(
+                sent, prompt_tokens * sent,
+                max(0, response.total_tokens - prompt_tokens) if response.total_tokens else completion_tokens
+            )
+            metrics.observe('llm.latency', response.latency)
+            return response
+
+    @contextmanager
+    def track_usage(self):
+        """统计当前线程在上下文内发送的请求数和 token 数，守护进程据此在每个响应中返回用量。
+
+        Yields:
+            dict: {'requests': 请求数, 'prompt_tokens': 输入 token 数, 'completion_tokens': 输出 token 数}
+        """
+        usage = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        previous = getattr(self._usage, 'current', None)
+        self._usage.current = usage
+        try:
+            yield usage
+        finally:
+            self._usage.current = previous
+
+    def _record_usage(self, requests, prompt_tokens, completion_tokens):
+        metrics.increment('llm.requests', requests)
+        metrics.increment('llm.prompt_tokens', prompt_tokens)
+        metrics.increment('llm.completion_tokens', completion_tokens)
+        usage = getattr(self._usage, 'current', None)
+        if usage is not None:
+            usage['requests'] += requests
+            usage['prompt_tokens'] += prompt_tokens
+            usage['completion_tokens'] += completion_tokens
+
+    def _latency_tracker(self, completion_tokens):
+        with self._latencies_lock:
+            tracker = self._latencies.get(completion_tokens)
+            if tracker is None:
+                tracker = self._latencies[completion_tokens] = LatencyTracker()
+            return tracker
+
+    def _hedge_delay(self, latencies):
+        """发出对冲请求前的等待秒数，未开启或样本不足时返回 None"""
+        if not self.hedge_percentile:
+            return None
+        threshold = latencies.percentile(self.hedge_percentile)
+        if threshold is None:
+            return None
+        return max(threshold, self.hedge_min_delay)
+
+    def _allow_hedge(self, estimated, cancel_token=None):
+        """对冲请求同样占用限流额度，按普通通道放行且不排队：有请求在排队或令牌不足时不对冲"""
+        if cancel_token is not None and cancel_token.cancelled:
+            return False
+        return self.scheduler.try_acquire(estimated, PRIORITY_NORMAL)
+
+    def _send_counted(self, estimated, cancel_token=None, **kwargs):
+        """发送已经过调度器放行的请求，返回后用实际用量修正该请求占用的 TPM 额度。
+
+        对冲时两个请求各自修正，落后的请求在完成时修正，失败的请求保留预估占用。
+        """
+        response = self._send(cancel_token, **kwargs)
+        self.scheduler.record_usage(estimated, response.total_tokens)
+        return response
+
+    def _send(self, cancel_token=None, **kwargs):
+        """通过后端发送单次请求。
+
+        提供取消令牌时，单次请求的超时不超过运行剩余时间。
+
+        Returns:
+            CompletionResult: 补全结果
+        """
+        timeout = None
+        if cancel_token is not None:
+            cancel_token.check()
+            timeout = self.request_timeout
+            remaining = cancel_token.remaining()
+            if remaining is not None:
+                timeout = remaining if timeout is None else min(timeout, remaining)
+        return self.backend.complete(
+            kwargs['model'], kwargs['messages'], kwargs.get('response_format'),
+            timeout=timeout, cancel_token=cancel_token
+        )
+
+    @staticmethod
+    def _retry_after(error, attempt):
+        """从限流响应头中读取需要等待的秒数"""
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        for name in ('retry-after', 'x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens'):
+            value = headers.get(name)
+            if not value:
+                continue
+            try:
+                return float(value.rstrip('s'))
+            except ValueError:
+                continue
+        return 2.0 * (2 ** attempt)
+
+    def _cache_key(self, kind, *parts):
+        """根据请求类型和内容计算缓存键"""
+        digest = hashlib.sha256(kind.encode('utf-8'))
+        for part in parts:
+            digest.update(b'\0')
+            digest.update(part.encode('utf-8', errors='replace'))
+        return digest.hexdigest()
+
+    def _cache_get(self, key):
+        """读取内存缓存（LRU）"""
+        with self._cache_lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+    def _cache_put(self, key, value):
+        """写入内存缓存，超过容量时淘汰最久未使用的条目"""
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,178 @@
+import json
+import asyncio
+import openai
+from .ai_analyzer import (
+    AIAnalyzer, ANALYSIS_COMPLETION_TOKENS, MAX_RETRIES, analysis_error, analysis_messages
+)
+from .backends import create_backend
+from .budget import COMPLETION_TOKENS
+from .findings import FileResult
+from .git_assistant import GitAssistant
+from .pipeline import AnalysisPipeline
+from ..utils.metrics import metrics
+from ..utils.tokens import estimate_messages_tokens
+from ..utils.config import Config
+from ..utils.logger import Logger
+
+logger = Logger(__name__)
+
+"""基于 asyncio 的分析接口，供嵌入异步服务使用，不依赖图形界面。
+
+    from src.core.async_analyzer import analyze_repo
+
+    async for result in analyze_repo('/path/to/repo', concurrency=8):
+        print(result.file, result.counts())
+
+- 按完成顺序逐个产出 FileResult，最多同时进行 concurrency 个请求
+- 取消外层任务或提前结束迭代时，进行中的请求随之取消；提前 break 时建议用
+  contextlib.aclosing()（Python 3.10+）包裹或显式调用 aclose()，以便立即取消而不是等待垃圾回收
+- GIT_LLM_BACKEND=openai 时使用 AsyncOpenAI 客户端；record / replay 后端在线程中调用同步后端
+- 与图形界面相同地分拣和排序文件，并合并本地密钥扫描的结果；不使用结果存储和远程缓存
+"""
+
+
+class AsyncAIAnalyzer:
+    def __init__(self, config=None, client=None):
+        """
+        Args:
+            config (Config): 配置，默认读取 .env
+            client (openai.AsyncOpenAI): 已有的异步客户端，默认按配置创建
+        """
+        config = config or Config()
+        self.model = config.model
+        self.request_timeout = config.request_timeout or None
+        self._backend = None
+        if client is None and config.backend != 'openai':
+            self._backend = create_backend(config)
+        elif client is None:
+            client = openai.AsyncOpenAI(
+                api_key=config.api_key, base_url=config.api_base, timeout=self.request_timeout, max_retries=0
+            )
+        self.client = client
+
+    async def analyze_changes(self, file_path, diff_content, context=None, detail='full'):
+        """分析文件变更，返回与 AIAnalyzer.analyze_changes 结构相同的建议字典。
+
+        失败时返回带 error 字段的结果；任务被取消时抛出 asyncio.CancelledError。
+        """
+        messages = analysis_messages(file_path, diff_content, context, detail)
+        try:
+            content = await self._complete(messages, COMPLETION_TOKENS.get(detail, ANALYSIS_COMPLETION_TOKENS))
+            return json.loads(content)
+        except Exception as e:
+            logger.error(f"分析文件 {file_path} 时发生错误: {str(e)}")
+            return analysis_error(e)
+
+    async def _complete(self, messages, completion_tokens):
+        """发送请求，限流和临时错误时按与同步分析器相同的策略重试"""
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                content, total_tokens = await self._send(messages)
+            except openai.RateLimitError as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                await asyncio.sleep(AIAnalyzer._retry_after(e, attempt))
+                continue
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                if attempt == MAX_RETRIES or isinstance(e, openai.APITimeoutError):
+                    raise
+                delay = 0.5 * (2 ** attempt)
+                logger.warning(f"请求失败，{delay:.1f} 秒后重试: {str(e)}")
+                await asyncio.sleep(delay)
+                continue
+
+            prompt_tokens = estimate_messages_tokens(messages)
+            metrics.increment('llm.requests')
+            metrics.increment('llm.prompt_tokens', prompt_tokens)
+            metrics.increment(
+                'llm.completion_tokens',
+                max(0, total_tokens - prompt_tokens) if total_tokens else completion_tokens
+            )
+            return content
+
+    async def _send(self, messages):
+        response_format = {"type": "json_object"}
+        if self._backend is not None:
+            result = await asyncio.to_thread(
+                self._backend.complete, self.model, messages, response_format, self.request_timeout
+            )
+            return result.content, result.total_tokens
+        response = await self.client.chat.completions.create(
+            model=self.model, messages=messages, response_format=response_format
+        )
+        usage = getattr(response, 'usage', None)
+        return response.choices[0].message.content, getattr(usage, 'total_tokens', None)
+
+    async def close(self):
+        if self._backend is not None:
+            self._backend.close()
+        elif self.client is not None:
+            await self.client.close()
+
+
+async def analyze_repo(path='.', files=None, concurrency=None, config=None, client=None, on_skipped=None):
+    """异步分析仓库中的变更文件，按完成顺序逐个产出结果。
+
+    Args:
+        path (str): 仓库路径
+        files (list): 要分析的文件，默认为全部变更文件（遵循 .aigitignore 和 GIT_LLM_STAGED_ONLY）
+        concurrency (int): 最大并发请求数，默认读取 GIT_LLM_MAX_WORKERS
+        config (Config): 配置，默认读取 .env
+        client (openai.AsyncOpenAI): 已有的异步客户端，由调用方负责关闭
+        on_skipped (callable): 分拣跳过的文件以 (文件路径, 原因) 调用
+
+    Yields:
+        FileResult: 单个文件的分析结果
+    """
+    config = config or Config()
+    concurrency = max(1, concurrency or config.max_workers)
+    git_assistant = GitAssistant(path, config)
+    # 流水线只用于分拣和排序，不发送请求
+    pipeline = AnalysisPipeline(git_assistant, None, max_workers=concurrency)
+    analyzer = AsyncAIAnalyzer(config, client)
+
+    if files is None:
+        files = await asyncio.to_thread(git_assistant.get_modified_files)
+    files, skipped, sizes = await asyncio.to_thread(pipeline.triage, files)
+    if on_skipped is not None:
+        for file_path, reason in skipped:
+            on_skipped(file_path, reason)
+    files = pipeline.order(files, sizes)
+
+    async def analyze_file(file_path):
+        diff_content = await asyncio.to_thread(git_assistant.get_file_diff, file_path)
+        secrets = pipeline.secret_scanner.scan(file_path, diff_content) if pipeline.secret_scanner else ()
+        suggestions = await analyzer.analyze_changes(file_path, diff_content)
+        result = FileResult.from_suggestions(file_path, suggestions)
+        if secrets:
+            result.findings = secrets + result.findings
+        return result
+
+    pending = {}
+    remaining = iter(files)
+    try:
+        # 同一时刻最多 concurrency 个任务，完成一个再启动下一个，差异按需读取
+        for file_path in remaining:
+            pending[asyncio.ensure_future(analyze_file(file_path))] = file_path
+            if len(pending) >= concurrency:
+                break
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                file_path = pending.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.error(f"分析文件 {file_path} 时发生错误: {str(e)}")
+                    result = FileResult.from_suggestions(file_path, {'error': str(e)})
+                next_file = next(remaining, None)
+                if next_file is not None:
+                    pending[asyncio.ensure_future(analyze_file(next_file))] = next_file
+                yield result
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        if client is None:
+            await analyzer.close()
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import openai
+from ..utils.logger import Logger
+
+logger = Logger(__name__)
+
+
+class CompletionResult:
+    """一次聊天补全的结果"""
+
+    __slots__ = ('content', 'total_tokens', 'latency')
+
+    def __init__(self, content, total_tokens=None, latency=0.0):
+        self.content = content
+        self.total_tokens = total_tokens
+        self.latency = latency
+
+
+class ReplayMissError(Exception):
+    """回放模式下磁带中没有对应请求的记录"""
+
+
+def request_key(model, messages, response_format=None):
+    """计算请求的稳定哈希，用于录制和回放时匹配请求"""
+    payload = json.dumps(
+        {'model': model, 'messages': messages, 'response_format': response_format},
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+"""聊天补全后端接口。
+
+AIAnalyzer 通过后端发送请求，后端负责实际的传输：
+- OpenAIBackend: 调用 OpenAI API
+- RecordingBackend: 包装其他后端，把请求、响应和耗时写入磁带文件
+- ReplayBackend: 离线回放磁带，可立即返回或按录制时的耗时返回
+"""
+class ChatBackend:
+    def complete(self, model, messages, response_format=None, timeout=None, cancel_token=None):
+        """发送聊天补全请求。
+
+        Args:
+            model (str): 模型名称
+            messages (list): 聊天消息列表
+            response_format (dict): 响应格式，例如 {"type": "json_object"}
+            timeout (float): 本次请求的超时秒数
+            cancel_token (CancelToken): 取消令牌
+
+        Returns:
+            CompletionResult: 补全结果
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """释放后端持有的资源"""
+
+
+class OpenAIBackend(ChatBackend):
+    def __init__(self, api_key, base_url, timeout=None):
+        """初始化 OpenAI 后端。
+
+        所有请求（包括各次运行）复用同一个客户端，保持 HTTP 连接池常驻；重试由 AIAnalyzer 负责，
+        以便限流时同步暂停调度器。
+        """
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+
+    def complete(self, model, messages, response_format=None, timeout=None, cancel_token=None):
+        kwargs = {'model': model, 'messages': messages}
+        if response_format is not None:
+            kwargs['response_format'] = response_format
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+
+        started = time.monotonic()
+        if cancel_token is None:
+            response = self.client.chat.completions.create(**kwargs)
+        else:
+            # 令牌被取消时立即返回；被放弃的请求不关闭共享的连接池，
+            # 在其单次请求超时（不超过运行剩余时间）后结束
+            response = cancel_token.call(self.client.chat.completions.create, **kwargs)
+
+        usage = getattr(response, 'usage', None)
+        return CompletionResult(
+            response.choices[0].message.content,
+            getattr(usage, 'total_tokens', None),
+            time.monotonic() - started
+        )
+
+    def close(self):
+        self.client.close()
+
+
+class RecordingBackend(ChatBackend):
+    def __init__(self, inner, cassette_path):
+        """初始化录制后端。
+
+        Args:
+            inner (ChatBackend): 实际发送请求的后端
+            cassette_path (str): 磁带文件路径（JSON Lines，追加写入）
+        """
+        self.inner = inner
+        self.cassette_path = cassette_path
+        directory = os.path.dirname(os.path.abspath(cassette_path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = open(cassette_path, 'a', encoding='utf-8')
+        logger.info(f"录制模式，请求将写入: {cassette_path}")
+
+    def complete(self, model, messages, response_format=None, timeout=None, cancel_token=None):
+        result = self.inner.complete(model, messages, response_format, timeout, cancel_token)
+        entry = {
+            'key': request_key(model, messages, response_format),
+            'request': {'model': model, 'messages': messages, 'response_format': response_format},
+            'response': {'content': result.content, 'total_tokens': result.total_tokens},
+            'latency': result.latency
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+        return result
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+        self.inner.close()
+
+
+class ReplayBackend(ChatBackend):
+    def __init__(self, cassette_path, timing='instant'):
+        """初始化回放后端。
+
+        同一请求被录制多次时按录制顺序轮流返回。
+
+        Args:
+            cassette_path (str): 磁带文件路径
+            timing (str): instant 立即返回；recorded 按录制时的耗时返回
+        """
+        if timing not in ('instant', 'recorded'):
+            raise ValueError(f"未知的回放时序: {timing}")
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._positions = {}
+        with open(cassette_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry['key'], []).append(entry)
+        logger.info(f"回放模式，已加载 {sum(len(v) for v in self._entries.values())} 条记录: {cassette_path}")
+
+    def complete(self, model, messages, response_format=None, timeout=None, cancel_token=None):
+        key = request_key(model, messages, response_format)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise ReplayMissError(f"磁带中没有匹配的请求记录: {key[:12]}")
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            entry = entries[position % len(entries)]
+
+        latency = entry.get('latency', 0.0) if self.timing == 'recorded' else 0.0
+        if latency > 0:
+            if timeout is not None:
+                latency = min(latency, timeout)
+            if cancel_token is not None:
+                cancel_token.call(time.sleep, latency)
+            else:
+                time.sleep(latency)
+        response = entry['response']
+        return CompletionResult(response['content'], response.get('total_tokens'), latency)
+
+
+def create_backend(config):
+    """根据配置创建后端。
+
+    GIT_LLM_BACKEND 为 openai（默认）、record 或 replay。
+    """
+    if config.backend == 'replay':
+        return ReplayBackend(config.cassette_path, config.replay_timing)
+
+    backend = OpenAIBackend(config.api_key, config.api_base, config.request_timeout or None)
+    if config.backend == 'record':
+        return RecordingBackend(backend, config.cassette_path)
+    return backend
@@ -0,0 +1,271 @@
+"""单次运行的成本与耗时预算。
+
+分析开始前按本地 token 估算预估整次运行的请求数、token 数、费用和耗时，
+超过配置的上限时依次降级，直到预估落在预算内：
+- full: 完整分析
+- compact: 跳过性能和最佳实践部分，输出更短
+- summary: 只做摘要级分析（变更概述和安全问题），每个文件的差异截断到固定 token 数
+- sample: 在摘要级分析的基础上只保留高风险文件，低风险文件按变更从大到小抽样跳过
+运行中实际 token 用量或费用达到上限时停止发送新的请求。
+"""
+import math
+import time
+from ..utils.metrics import metrics
+
+DETAIL_LEVELS = ('full', 'compact', 'summary')
+DEGRADE_STEPS = ('full', 'compact', 'summary', 'sample')
+
+# 各分析级别的系统提示和输出 token 预估
+PROMPT_TOKENS = {'full': 450, 'compact': 480, 'summary': 500}
+COMPLETION_TOKENS = {'full': 800, 'compact': 450, 'summary': 200}
+# 生成提交信息的提示与输出 token 预估
+COMMIT_OVERHEAD_TOKENS = 600
+
+# 摘要级分析时每个文件差异的 token 上限
+SUMMARY_DIFF_TOKENS = 600
+
+# 未设置上限、预估只用于展示时按 numstat 行数估算
+TOKENS_PER_LINE = 12
+
+SAMPLED_REASON = '超出运行预算，已抽样跳过'
+
+
+class RunEstimate:
+    """一次运行的预估或实际用量"""
+
+    __slots__ = ('requests', 'prompt_tokens', 'completion_tokens', 'seconds', 'cost')
+
+    def __init__(self, requests=0, prompt_tokens=0, completion_tokens=0, seconds=0.0, cost=None):
+        self.requests = requests
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.seconds = seconds
+        self.cost = cost  # 未配置单价时为 None
+
+    @property
+    def tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def describe(self):
+        """简短的中文描述，例如 "12 个请求、约 18.3k tokens、$0.04、约 45 秒" """
+        parts = [f"{self.requests} 个请求", f"约 {_format_tokens(self.tokens)} tokens"]
+        if self.cost is not None:
+            parts.append(f"${self.cost:.2f}")
+        parts.append(f"约 {self.seconds:.0f} 秒")
+        return '、'.join(parts)
+
+
+class BudgetPlan:
+    """预算约束下的执行计划"""
+
+    __slots__ = ('step', 'detail', 'files', 'sampled', 'estimate', 'full_estimate')
+
+    def __init__(self, step, files, sampled, estimate, full_estimate):
+        self.step = step                    # DEGRADE_STEPS 之一
+        self.detail = 'summary' if step == 'sample' else step
+        self.files = files                  # 需要分析的文件（保持原有顺序）
+        self.sampled = sampled              # 抽样跳过的文件
+        self.estimate = estimate            # 按计划执行的预估
+        self.full_estimate = full_estimate  # 不降级时的预估
+
+    @property
+    def degraded(self):
+        return self.step != 'full'
+
+    def describe(self):
+        note = {
+            'full': '',
+            'compact': '，超出预算：跳过性能与最佳实践分析',
+            'summary': '，超出预算：只做摘要级分析',
+            'sample': f"，超出预算：摘要级分析并跳过 {len(self.sampled)} 个低风险文件",
+        }[self.step]
+        text = f"预计 {self.estimate.describe()}{note}"
+        if self.degraded:
+            text += f"（完整分析预计 {self.full_estimate.describe()}）"
+        return text
+
+
+def _format_tokens(tokens):
+    return f"{tokens / 1000:.1f}k" if tokens >= 1000 else str(tokens)
+
+
+"""运行预算控制器。
+
+此类负责一次运行的预算：
+1. estimate / plan: 分析开始前预估用量，超出上限时选择降级方式
+2. start / exceeded: 运行中按实际用量检查是否达到上限
+3. actual: 运行结束后的实际用量
+"""
+class BudgetGovernor:
+    def __init__(self, max_tokens=0, max_cost=0.0, max_seconds=0.0, input_price=0.0, output_price=0.0,
+                 expected_latency=8.0, max_workers=4, steps=DEGRADE_STEPS):
+        """
+        Args:
+            max_tokens (int): 整次运行的 token 上限，0 表示不限制
+            max_cost (float): 整次运行的费用上限（美元），0 表示不限制，需要配置单价
+            max_seconds (float): 整次运行的时间上限（秒），0 表示不限制
+            input_price (float): 每 1K 输入 token 的单价
+            output_price (float): 每 1K 输出 token 的单价
+            expected_latency (float): 完整分析单个请求的预计耗时（秒），本进程已有请求时使用实测平均值
+            max_workers (int): 并发请求数
+            steps (tuple): 允许使用的降级方式（按顺序尝试）
+        """
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.max_seconds = max_seconds
+        self.input_price = input_price
+        self.output_price = output_price
+        self.expected_latency = expected_latency
+        self.max_workers = max(1, max_workers)
+        self.steps = tuple(step for step in DEGRADE_STEPS if step == 'full' or step in steps)
+        self.plan_used = None
+        self._started_at = None
+        self._baseline = None
+
+    @classmethod
+    def from_config(cls, config, max_workers=None):
+        return cls(
+            max_tokens=config.max_run_tokens,
+            max_cost=config.max_run_cost,
+            max_seconds=config.run_timeout,
+            input_price=config.input_price,
+            output_price=config.output_price,
+            expected_latency=config.expected_latency,
+            max_workers=max_workers or config.max_workers,
+            steps=config.budget_steps,
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.max_tokens or self.max_cost or self.max_seconds)
+
+    def _cost(self, prompt_tokens, completion_tokens):
+        if not (self.input_price or self.output_price):
+            return None
+        return prompt_tokens / 1000 * self.input_price + completion_tokens / 1000 * self.output_price
+
+    def _latency(self):
+        observed = metrics.snapshot()['observations'].get('llm.latency')
+        if observed and observed['count']:
+            return observed['avg']
+        return self.expected_latency
+
+    def estimate(self, diff_tokens, detail='full', commit_message=True):
+        """按分析级别预估用量。
+
+        Args:
+            diff_tokens (dict): {文件路径: 差异 token 数}
+            detail (str): 分析级别，见 DETAIL_LEVELS
+            commit_message (bool): 是否包含一次提交信息请求
+
+        Returns:
+            RunEstimate: 预估用量
+        """
+        requests = len(diff_tokens)
+        prompt = 0
+        for tokens in diff_tokens.values():
+            if detail == 'summary':
+                tokens = min(tokens, SUMMARY_DIFF_TOKENS)
+            prompt += tokens + PROMPT_TOKENS[detail]
+        completion = requests * COMPLETION_TOKENS[detail]
+        # 输出 token 决定大部分耗时
+        seconds = math.ceil(requests / self.max_workers) * self._latency() * (
+            COMPLETION_TOKENS[detail] / COMPLETION_TOKENS['full']
+        )
+        if commit_message and diff_tokens:
+            requests += 1
+            prompt += sum(diff_tokens.values()) + COMMIT_OVERHEAD_TOKENS
+            completion += COMPLETION_TOKENS['summary']
+        return RunEstimate(requests, prompt, completion, seconds, self._cost(prompt, completion))
+
+    def _fits(self, estimate):
+        if self.max_tokens and estimate.tokens > self.max_tokens:
+            return False
+        if self.max_cost and estimate.cost is not None and estimate.cost > self.max_cost:
+            return False
+        if self.max_seconds and estimate.seconds > self.max_seconds:
+            return False
+        return True
+
+    def plan(self, diff_tokens, risk_scores=None, commit_message=True):
+        """选择预算内的执行计划。
+
+        依次尝试完整分析、跳过性能与最佳实践、摘要级分析；仍超出预算时
+        按风险从低到高、变更从大到小跳过文件，直到预估落在预算内（至少保留一个文件）。
+
+        Args:
+            diff_tokens (dict): {文件路径: 差异 token 数}，按分析顺序
+            risk_scores (dict): {文件路径: 风险分}，抽样时优先保留高风险文件
+            commit_message (bool): 是否包含一次提交信息请求
+
+        Returns:
+            BudgetPlan: 执行计划
+        """
+        files = list(diff_tokens)
+        full_estimate = self.estimate(diff_tokens, 'full', commit_message)
+        plan = None
+        if not self.enabled or self._fits(full_estimate):
+            plan = BudgetPlan('full', files, [], full_estimate, full_estimate)
+        else:
+            for step in self.steps[1:]:
+                if step != 'sample':
+                    estimate = self.estimate(diff_tokens, step, commit_message)
+                    if self._fits(estimate):
+                        plan = BudgetPlan(step, files, [], estimate, full_estimate)
+                        break
+                    continue
+                plan = self._sample(diff_tokens, risk_scores or {}, commit_message, full_estimate)
+                break
+        if plan is None:
+            # 不允许抽样时按最后一级执行，运行中达到上限后停止
+            step = self.steps[-1]
+            plan = BudgetPlan(step, files, [], self.estimate(diff_tokens, step, commit_message), full_estimate)
+        self.plan_used = plan
+        return plan
+
+    def _sample(self, diff_tokens, risk_scores, commit_message, full_estimate):
+        kept = dict(diff_tokens)
+        # 先跳过风险最低、变更最大的文件
+        candidates = sorted(kept, key=lambda path: (risk_scores.get(path, 0), -kept[path]))
+        sampled = []
+        estimate = self.estimate(kept, 'summary', commit_message)
+        for path in candidates:
+            if self._fits(estimate) or len(kept) <= 1:
+                break
+            del kept[path]
+            sampled.append(path)
+            estimate = self.estimate(kept, 'summary', commit_message)
+        return BudgetPlan('sample', list(kept), sampled, estimate, full_estimate)
+
+    def start(self):
+        """记录运行开始时的用量基线"""
+        self._started_at = time.monotonic()
+        self._baseline = metrics.snapshot()['counters']
+
+    def actual(self):
+        """运行开始以来的实际用量（通过守护进程分析时按守护进程响应中返回的用量统计）"""
+        counters = metrics.snapshot()['counters']
+        baseline = self._baseline or {}
+
+        def delta(name):
+            return counters.get(name, 0) - baseline.get(name, 0)
+
+        prompt = delta('llm.prompt_tokens')
+        completion = delta('llm.completion_tokens')
+        seconds = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+        return RunEstimate(delta('llm.requests'), prompt, completion, seconds, self._cost(prompt, completion))
+
+    def exceeded(self):
+        """实际 token 用量或费用是否已达到上限（时间上限由取消令牌的截止时间负责）"""
+        if not (self.max_tokens or self.max_cost):
+            return False
+        actual = self.actual()
+        if self.max_tokens and actual.tokens >= self.max_tokens:
+            return True
+        return bool(self.max_cost and actual.cost is not None and actual.cost >= self.max_cost)
+
+
+def diff_token_counts(file_paths, sizes=None):
+    """每个文件差异的 token 数，按 numstat 变更行数近似估算，未设置上限时用于展示预估而不必读取差异"""
+    sizes = sizes or {}
+    return {file_path: sizes.get(file_path, 0) * TOKENS_PER_LINE + 50 for file_path in file_paths}
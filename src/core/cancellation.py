@@ -0,0 +1,146 @@
+import time
+import threading
+from ..utils.logger import Logger
+
+logger = Logger(__name__)
+
+
+class AnalysisCancelled(Exception):
+    """分析被取消、超过整体截止时间或运行预算用尽时抛出"""
+
+
+"""协作式取消令牌，贯穿一次分析运行。
+
+此类提供：
+1. 手动取消（例如用户点击"取消"）
+2. 整体截止时间，到期后自动取消
+3. 取消回调，用于中止进行中的 HTTP 请求、关闭连接等（运行结束时由 close 统一释放）
+4. 可被取消的阻塞调用（call），取消后调用方立即返回
+"""
+class CancelToken:
+    def __init__(self, deadline=None):
+        """初始化取消令牌。
+
+        Args:
+            deadline (float): 整体截止时间（秒，从现在开始计算），None 表示不限制
+        """
+        self.reason = None
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._callbacks = []
+        self._waiters = set()
+        self._timer = None
+        self.deadline = None
+        if deadline:
+            self.deadline = time.monotonic() + deadline
+            self._timer = threading.Timer(deadline, self.cancel, args=('deadline',))
+            self._timer.daemon = True
+            self._timer.start()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    @property
+    def expired(self):
+        """是否因截止时间到期或运行预算用尽而取消（而不是用户手动取消）"""
+        return self.reason in ('deadline', 'budget')
+
+    def remaining(self):
+        """距离截止时间的剩余秒数，未设置截止时间时返回 None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason='cancelled'):
+        """取消运行并触发所有回调，重复调用无副作用"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+            waiters = list(self._waiters)
+            self._callbacks.clear()
+        if self._timer is not None:
+            self._timer.cancel()
+
+        logger.info(f"分析运行已取消: {reason}")
+        for waiter in waiters:
+            waiter.set()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"执行取消回调失败: {str(e)}")
+
+    def close(self):
+        """运行正常结束时释放资源：执行剩余回调但不标记为取消"""
+        with self._lock:
+            callbacks = list(self._callbacks)
+            self._callbacks.clear()
+        if self._timer is not None:
+            self._timer.cancel()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"执行清理回调失败: {str(e)}")
+
+    def add_callback(self, callback):
+        """注册取消回调，已取消时立即执行"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def check(self):
+        """已取消时抛出 AnalysisCancelled"""
+        if self._event.is_set():
+            raise AnalysisCancelled(self.reason)
+
+    def wait(self, timeout=None):
+        """等待取消发生，返回是否已取消"""
+        return self._event.wait(timeout)
+
+    def call(self, func, *args, **kwargs):
+        """在辅助线程中执行阻塞调用，取消时调用方立即返回。
+
+        被放弃的调用会在其自身超时后结束，不会阻塞进程退出。
+
+        Raises:
+            AnalysisCancelled: 调用完成前令牌被取消
+        """
+        done = threading.Event()
+        outcome = {}
+
+        def target():
+            try:
+                outcome['value'] = func(*args, **kwargs)
+            except BaseException as e:
+                outcome['error'] = e
+            finally:
+                done.set()
+
+        with self._lock:
+            if self._event.is_set():
+                raise AnalysisCancelled(self.reason)
+            self._waiters.add(done)
+        try:
+            threading.Thread(target=target, name='git-llm-request', daemon=True).start()
+            done.wait()
+        finally:
+            with self._lock:
+                self._waiters.discard(done)
+
+        if 'error' in outcome:
+            raise outcome['error']
+        if 'value' not in outcome:
+            raise AnalysisCancelled(self.reason)
+        return outcome['value']
@@ -0,0 +1,155 @@
+"""分析结果分类工具。
+
+将 AIAnalyzer 返回的建议按严重程度（严重/警告/建议）和类型（安全/规范）
+进行归类，供图形界面、历史审查等模块共用。
+"""
+
+# 严重问题判断规则
+SEVERE_KEYWORDS = [
+    '密码泄露', '凭证泄露', '系统崩溃', '严重漏洞', '注入攻击',
+    'SQL注入', 'XSS攻击', '远程执行', '权限提升', '拒绝服务',
+    '未授权访问', '敏感信息泄露'
+]
+
+SEVERITY_NAMES = {'severe': '严重问题', 'warning': '警告', 'suggestion': '建议'}
+TYPE_NAMES = {'security': '安全', 'standard': '规范'}
+TYPE_PREFIXES = {'security': '[安全]', 'standard': '[规范]'}
+
+# 分析结果中不是建议的键：变更描述，以及流水线写入的复用来源标记
+METADATA_KEYS = frozenset({'changes', 'reused'})
+
+
+def empty_file_data():
+    """创建空的分类结果结构"""
+    return {
+        'severe': {'security': [], 'standard': []},
+        'warning': {'security': [], 'standard': []},
+        'suggestion': {'security': [], 'standard': []}
+    }
+
+
+def empty_stats():
+    """创建空的问题统计结构"""
+    return {
+        'severe': {'security': 0, 'standard': 0},
+        'warning': {'security': 0, 'standard': 0},
+        'suggestion': {'security': 0, 'standard': 0}
+    }
+
+
+def extract_changes(suggestions):
+    """提取建议中的变更描述。
+
+    Args:
+        suggestions (dict): AIAnalyzer 返回的分析结果
+
+    Returns:
+        list: 变更描述列表
+    """
+    changes = suggestions.get('changes')
+    if not changes:
+        return []
+    if isinstance(changes, dict):
+        result = []
+        for details in changes.values():
+            if isinstance(details, list):
+                result.extend(details)
+            else:
+                result.append(details)
+        return result
+    if isinstance(changes, list):
+        return list(changes)
+    if isinstance(changes, str):
+        return [changes]
+    return []
+
+
+def classify_item(category, item):
+    """判断单条建议的严重程度和类型。
+
+    Args:
+        category (str): 建议所属的分析类别，如 security_issues
+        item (str): 建议内容
+
+    Returns:
+        tuple: (severity, issue_type)，无需展示的条目返回 None
+    """
+    # 跳过"未发现问题"类的信息
+    if '未发现' in item or '没有发现' in item:
+        return None
+
+    issue_type = 'security' if category == 'security_issues' else 'standard'
+
+    severity = 'warning'  # 默认为警告级别
+    if any(keyword in item.lower() for keyword in SEVERE_KEYWORDS):
+        severity = 'severe'
+    elif '建议' in item or '优化' in item or '改进' in item or category == 'best_practices':
+        severity = 'suggestion'
+    return severity, issue_type
+
+
+def iter_findings(suggestions):
+    """逐条遍历分析结果中需要展示的建议。
+
+    Args:
+        suggestions (dict): AIAnalyzer 返回的分析结果
+
+    Yields:
+        tuple: (category, severity, issue_type, item)
+    """
+    for category, content in suggestions.items():
+        if not content or category in METADATA_KEYS:
+            continue
+
+        items = []
+        if isinstance(content, dict):
+            for values in content.values():
+                if isinstance(values, list):
+                    items.extend(values)
+                else:
+                    items.append(values)
+        elif isinstance(content, list):
+            items.extend(content)
+        else:
+            items.append(content)
+
+        for item in items:
+            if not isinstance(item, str):
+                continue
+            classified = classify_item(category, item)
+            if classified is None:
+                continue
+            severity, issue_type = classified
+            yield category, severity, issue_type, item
+
+
+def classify_suggestions(suggestions):
+    """将分析结果按严重程度和类型分类。
+
+    Args:
+        suggestions (dict): AIAnalyzer 返回的分析结果
+
+    Returns:
+        tuple: (file_data, changes)
+            file_data 结构为 {severity: {issue_type: ["[安全] ...", ...]}}
+            changes 为变更描述列表
+    """
+    file_data = empty_file_data()
+    for _, severity, issue_type, item in iter_findings(suggestions):
+        file_data[severity][issue_type].append(f"{TYPE_PREFIXES[issue_type]} {item}")
+    return file_data, extract_changes(suggestions)
+
+
+def count_issues(file_data):
+    """统计分类结果中各严重程度的问题数量"""
+    return {
+        severity: sum(len(issues) for issues in type_data.values())
+        for severity, type_data in file_data.items()
+    }
+
+
+def add_to_stats(stats_data, file_data):
+    """将单个文件的分类结果累加到整体统计中"""
+    for severity, type_data in file_data.items():
+        for issue_type, issues in type_data.items():
+            stats_data[severity][issue_type] += len(issues)
@@ -0,0 +1,124 @@
+"""跨文件的近似重复建议合并。
+
+机械性变更（批量重命名、统一替换导入等）往往让模型对每个文件给出措辞略有不同的相同建议。
+此模块使用 MinHash + LSH 在近线性时间内把这些近似重复的条目合并为一条，
+并记录涉及的全部文件。
+"""
+from .findings import FindingGroup, ChangeGroup
+from ..utils.minhash import text_signature, band_keys, similarity
+
+_SEVERITY_ORDER = {'severe': 0, 'warning': 1, 'suggestion': 2}
+
+# 逐条合并时，严重程度不同的问题只有文本几乎相同（相似度不低于该值）时才合并并提升组的严重程度；
+# 一般的近似合并只在严重程度相同的问题之间进行，避免措辞相近的建议被提升为严重问题
+ESCALATE_SIMILARITY = 0.95
+
+
+def files_label(files):
+    """生成合并条目的文件标签，例如 "a.py 等3个文件" """
+    if len(files) == 1:
+        return files[0]
+    return f"{files[0]} 等{len(files)}个文件"
+
+
+class IncrementalConsolidator:
+    """逐条加入问题和变更描述，随结果到达增量维护合并分组。
+
+    使用 MinHash 签名和 LSH 分桶：新条目只与共享分桶的各组首条比较，
+    命中即加入该组，否则成为新组。问题只合并类型（安全/规范）相同的条目，并按严重程度分别分桶，
+    与严重程度不同的组只在完全相同或相似度达到 ESCALATE_SIMILARITY 时合并。
+    """
+
+    def __init__(self, threshold):
+        """
+        Args:
+            threshold (float): 相似度阈值，0 表示只合并完全相同的文本
+        """
+        self.threshold = threshold
+        self._buckets = {}
+        self._signatures = {}  # 问题分组 -> 首条的签名
+
+    def _match(self, partition, entry, severity=None):
+        """查找条目所属的已有分组。
+
+        Args:
+            partition: 分区（问题类型），不同分区的条目不合并
+            entry: Finding 或 Change
+            severity (str): 问题的严重程度，变更描述为 None
+
+        Returns:
+            tuple: (group, pending)，未命中时 group 为 None，pending 供 _register 登记新组
+        """
+        if self.threshold <= 0:
+            key = (partition, entry.text)
+            return self._buckets.get(key), [key]
+
+        sig = text_signature(entry.text, remove=(entry.file, entry.file.rsplit('/', 1)[-1]))
+        bands = band_keys(sig)
+        group = self._lookup(partition, severity, bands, sig, self.threshold)
+        if group is None and severity is not None:
+            near_exact = max(self.threshold, ESCALATE_SIMILARITY)
+            for other in _SEVERITY_ORDER:
+                if other != severity:
+                    group = self._lookup(partition, other, bands, sig, near_exact)
+                    if group is not None:
+                        break
+        if group is not None:
+            return group, None
+        return None, ([(partition, severity, key) for key in bands], sig)
+
+    def _lookup(self, partition, severity, bands, sig, threshold):
+        for key in bands:
+            leader = self._buckets.get((partition, severity, key))
+            if leader is not None and similarity(leader[0], sig) >= threshold:
+                return leader[1]
+        return None
+
+    def add_finding(self, finding):
+        """加入一条问题。
+
+        Returns:
+            tuple: (group, previous_severity)
+                previous_severity 为加入前该组的严重程度，新建的组为 None
+        """
+        group, pending = self._match(finding.issue_type, finding, finding.severity)
+        if group is not None:
+            previous = group.severity
+            if finding.file not in group.files:
+                group.files.append(finding.file)
+            group.severity = min(previous, finding.severity, key=_SEVERITY_ORDER.get)
+            if group.severity != previous and group in self._signatures:
+                # 提升后也登记到新严重程度的分桶，之后同级的近似问题可以合并进来
+                sig = self._signatures[group]
+                self._register(([(finding.issue_type, group.severity, key) for key in band_keys(sig)], sig), group)
+            return group, previous
+
+        group = FindingGroup(finding.text, finding.severity, finding.issue_type, [finding.file])
+        self._register(pending, group)
+        if self.threshold > 0:
+            self._signatures[group] = pending[1]
+        return group, None
+
+    def add_change(self, change):
+        """加入一条变更描述。
+
+        Returns:
+            tuple: (group, created)
+        """
+        group, pending = self._match(None, change)
+        if group is not None:
+            if change.file not in group.files:
+                group.files.append(change.file)
+            return group, False
+
+        group = ChangeGroup(change.text, [change.file])
+        self._register(pending, group)
+        return group, True
+
+    def _register(self, pending, group):
+        if self.threshold <= 0:
+            self._buckets[pending[0]] = group
+            return
+        keys, sig = pending
+        for key in keys:
+            self._buckets.setdefault(key, (sig, group))
@@ -0,0 +1,259 @@
+import os
+import json
+import socket
+import socketserver
+import threading
+from .cancellation import AnalysisCancelled
+from .scheduler import PRIORITY_INTERACTIVE, PRIORITY_NORMAL
+from ..utils.config import Config
+from ..utils.metrics import metrics
+from ..utils.logger import Logger
+
+logger = Logger(__name__)
+
+"""后台守护进程，通过 Unix 域套接字提供分析服务。
+
+守护进程常驻内存，保持以下资源处于热状态：
+1. 已解析的 Config
+2. 已打开的 Git 仓库（按路径缓存）
+3. AIAnalyzer 的 HTTP 连接池和内存缓存
+
+协议为按行分隔的 JSON：每行一个请求，每行一个响应。
+请求格式: {"op": "analyze" | "commit_message" | "ping" | "shutdown", ...}
+响应格式: {"ok": true, "result": ..., "usage": {...}} 或 {"ok": false, "error": "..."}
+usage 为该请求实际发送的模型请求数和 token 数，客户端计入本进程的指标，运行预算据此统计实际用量
+"""
+
+
+class _DaemonHandler(socketserver.StreamRequestHandler):
+    """处理单个客户端连接，连接内可以连续发送多个请求"""
+
+    def handle(self):
+        # 便于外部采样器按线程归属耗时
+        threading.current_thread().name = 'git-llm-daemon-conn'
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line.decode('utf-8'))
+                with self.server.daemon.ai_analyzer.track_usage() as usage:
+                    result = self.server.daemon.dispatch(request)
+                response = {'ok': True, 'result': result, 'usage': usage}
+            except Exception as e:
+                logger.error(f"处理守护进程请求失败: {str(e)}")
+                response = {'ok': False, 'error': str(e)}
+            try:
+                self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                self.wfile.flush()
+            except OSError:
+                # 客户端已取消请求并断开连接
+                return
+
+
+class DaemonServer:
+    def __init__(self, socket_path=None):
+        """初始化守护进程。
+
+        Args:
+            socket_path (str): Unix 域套接字路径，默认读取配置
+        """
+        if not hasattr(socket, 'AF_UNIX'):
+            raise RuntimeError("当前平台不支持 Unix 域套接字，无法启动守护进程")
+
+        from .ai_analyzer import AIAnalyzer
+
+        self.config = Config()
+        self.socket_path = socket_path or self.config.daemon_socket
+        self.ai_analyzer = AIAnalyzer()
+        self._assistants = {}
+        self._assistants_lock = threading.Lock()
+        self._server = None
+
+    def serve_forever(self):
+        """启动服务并阻塞，直到收到 shutdown 请求"""
+        if os.path.exists(self.socket_path):
+            if DaemonClient.try_connect(self.socket_path) is not None:
+                raise RuntimeError(f"守护进程已在运行: {self.socket_path}")
+            # 清理上次异常退出留下的套接字文件
+            os.unlink(self.socket_path)
+
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, _DaemonHandler)
+        self._server.daemon_threads = True
+        self._server.daemon = self
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"守护进程已启动，监听: {self.socket_path}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            logger.info("守护进程已退出")
+
+    def dispatch(self, request):
+        """根据 op 字段分发请求"""
+        op = request.get('op')
+        if op == 'ping':
+            return {'pid': os.getpid()}
+        if op == 'analyze':
+            file_path = request['file']
+            diff_content = request.get('diff')
+            if diff_content is None:
+                diff_content = self._get_assistant(request['repo']).get_file_diff(file_path)
+            return self.ai_analyzer.analyze_changes(
+                file_path, diff_content, priority=request.get('priority', PRIORITY_NORMAL),
+                context=request.get('context'), detail=request.get('detail', 'full'),
+                tag_hunks=request.get('tag_hunks', False)
+            )
+        if op == 'commit_message':
+            diffs = request.get('diffs')
+            if diffs is None:
+                assistant = self._get_assistant(request['repo'])
+                diffs = [
+                    f"File: {file_path}\n{assistant.get_file_diff(file_path)}"
+                    for file_path in assistant.get_modified_files()
+                ]
+            return self.ai_analyzer.generate_commit_message(
+                diffs, priority=request.get('priority', PRIORITY_INTERACTIVE),
+                review_notes=request.get('review_notes')
+            )
+        if op == 'shutdown':
+            threading.Thread(target=self._server.shutdown, name='git-llm-daemon-shutdown', daemon=True).start()
+            return None
+        raise ValueError(f"未知的请求类型: {op}")
+
+    def _get_assistant(self, repo_path):
+        """获取（并缓存）指定仓库的 GitAssistant"""
+        from .git_assistant import GitAssistant
+
+        repo_path = os.path.abspath(repo_path)
+        with self._assistants_lock:
+            if repo_path not in self._assistants:
+                logger.info(f"打开仓库: {repo_path}")
+                self._assistants[repo_path] = GitAssistant(repo_path)
+            return self._assistants[repo_path]
+
+
+class DaemonClient:
+    """守护进程的轻量客户端。
+
+    接口与 AIAnalyzer 保持一致（analyze_changes / generate_commit_message），
+    可以直接替换 AIAnalyzer 使用。每个线程持有独立的连接。
+    """
+
+    def __init__(self, socket_path=None, timeout=None):
+        self.socket_path = socket_path or Config().daemon_socket
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @classmethod
+    def try_connect(cls, socket_path=None, timeout=None):
+        """尝试连接守护进程。
+
+        Returns:
+            DaemonClient: 守护进程可用时返回客户端，否则返回 None
+        """
+        if not hasattr(socket, 'AF_UNIX'):
+            return None
+        try:
+            client = cls(socket_path, timeout)
+            if not os.path.exists(client.socket_path):
+                return None
+            client.ping()
+            return client
+        except (OSError, ValueError):
+            return None
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            conn = (sock, sock.makefile('rb'))
+            self._local.conn = conn
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            conn[1].close()
+            conn[0].close()
+
+    def request(self, op, cancel_token=None, **params):
+        """发送请求并等待响应。
+
+        Args:
+            op (str): 请求类型
+            cancel_token (CancelToken): 取消令牌，取消时断开连接以中止等待
+
+        Raises:
+            RuntimeError: 守护进程返回错误时抛出
+            AnalysisCancelled: 响应到达前运行被取消
+        """
+        payload = json.dumps(dict(params, op=op), ensure_ascii=False).encode('utf-8') + b'\n'
+        if cancel_token is not None:
+            cancel_token.check()
+        sock, reader = self._connection()
+
+        def abort():
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        if cancel_token is not None:
+            sock.settimeout(cancel_token.remaining() or self.timeout)
+            cancel_token.add_callback(abort)
+        try:
+            sock.sendall(payload)
+            line = reader.readline()
+        except OSError:
+            self._close()
+            if cancel_token is not None and cancel_token.cancelled:
+                raise AnalysisCancelled(cancel_token.reason)
+            raise
+        finally:
+            if cancel_token is not None:
+                cancel_token.remove_callback(abort)
+        if not line:
+            self._close()
+            if cancel_token is not None and cancel_token.cancelled:
+                raise AnalysisCancelled(cancel_token.reason)
+            raise ConnectionError("守护进程已关闭连接")
+        if cancel_token is not None:
+            sock.settimeout(self.timeout)
+
+        response = json.loads(line.decode('utf-8'))
+        # 守护进程代为发送的模型请求计入本进程的指标，运行预算按这些计数统计实际用量
+        for name, value in (response.get('usage') or {}).items():
+            metrics.increment(f"llm.{name}", value)
+        if not response.get('ok'):
+            raise RuntimeError(response.get('error', '守护进程请求失败'))
+        return response.get('result')
+
+    def ping(self):
+        return self.request('ping')
+
+    def shutdown(self):
+        return self.request('shutdown')
+
+    def analyze_changes(self, file_path, diff_content, cancel_token=None, priority=PRIORITY_NORMAL, context=None,
+                        detail='full', tag_hunks=False):
+        """通过守护进程分析文件变更，返回结构与 AIAnalyzer.analyze_changes 相同"""
+        return self.request(
+            'analyze', cancel_token, file=file_path, diff=diff_content, priority=priority, context=context,
+            detail=detail, tag_hunks=tag_hunks
+        )
+
+    def generate_commit_message(self, diffs, cancel_token=None, priority=PRIORITY_INTERACTIVE, review_notes=None):
+        """通过守护进程生成提交信息"""
+        return self.request(
+            'commit_message', cancel_token, diffs=list(diffs), priority=priority, review_notes=review_notes
+        )
+
+    def generate_commit_message_for_repo(self, repo_path):
+        """由守护进程在其已打开的仓库上收集差异并生成提交信息"""
+        return self.request('commit_message', repo=os.path.abspath(repo_path))
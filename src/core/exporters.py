@@ -0,0 +1,206 @@
+"""分析结果的流式导出。
+
+导出器实现 write_result(FileResult) / write_skipped(文件路径, 原因) / close()，
+可直接作为 AnalysisPipeline.run 的 on_result / on_skipped 回调。每个文件完成时立即写出，
+不在内存中累积结果，因此内存占用与结果总量无关：
+- JsonLinesExporter: 每行一个 JSON 对象，便于管道处理和在两次运行之间比较
+- SarifExporter: SARIF 2.1.0，供代码扫描看板使用，级别来自严重/警告/建议分类
+"""
+import sys
+import json
+import hashlib
+import threading
+
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+
+# 严重程度到 SARIF 级别的映射
+SARIF_LEVELS = {'severe': 'error', 'warning': 'warning', 'suggestion': 'note'}
+
+SARIF_RULES = (
+    {
+        'id': 'security',
+        'name': 'SecurityIssue',
+        'shortDescription': {'text': '安全问题'},
+    },
+    {
+        'id': 'standard',
+        'name': 'CodingStandardIssue',
+        'shortDescription': {'text': '代码规范问题'},
+    },
+    {
+        'id': 'skipped',
+        'name': 'SkippedFile',
+        'shortDescription': {'text': '分拣阶段跳过、未发送给模型的文件'},
+        'defaultConfiguration': {'level': 'none'},
+    },
+)
+
+
+def _open_output(target):
+    """target 为 '-' 时写到标准输出，为路径时新建文件，否则视为已打开的文本流"""
+    if target == '-':
+        return sys.stdout, False
+    if isinstance(target, str):
+        return open(target, 'w', encoding='utf-8'), True
+    return target, False
+
+
+class _StreamExporter:
+    """逐条写出并立即刷新的导出器基类，可在多个工作线程中调用"""
+
+    def __init__(self, target):
+        self._stream, self._owns_stream = _open_output(target)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _write(self, text):
+        with self._lock:
+            if self._closed:
+                return
+            self._stream.write(text)
+            self._stream.flush()
+
+    def _finish(self):
+        """关闭前写出的结尾内容"""
+        return ''
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._stream.write(self._finish())
+            self._stream.flush()
+            self._closed = True
+            if self._owns_stream:
+                self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class JsonLinesExporter(_StreamExporter):
+    """JSON Lines 导出，每个文件一行：
+
+    {"type": "result", "file": ..., "findings": [{"severity", "issue_type", "text"}], "changes": [...], "error": ...,
+     "reused": null 或 {"path": 复用结果的来源文件, "similarity": 相似度, "cluster": 共享结果的聚类文件数（可选）}}
+    {"type": "skipped", "file": ..., "reason": ...}
+    """
+
+    def _write_line(self, record):
+        self._write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def write_result(self, result):
+        self._write_line({
+            'type': 'result',
+            'file': result.file,
+            'findings': [
+                {'severity': finding.severity, 'issue_type': finding.issue_type, 'text': finding.text}
+                for finding in result.findings
+            ],
+            'changes': [change.text for change in result.changes],
+            'error': result.error,
+            'reused': result.reused,
+        })
+
+    def write_skipped(self, file_path, reason):
+        self._write_line({'type': 'skipped', 'file': file_path, 'reason': reason})
+
+
+class SarifExporter(_StreamExporter):
+    """SARIF 2.1.0 导出。
+
+    文档头（工具与规则定义）在创建时写出，每条问题在所属文件完成时追加到 results 数组，
+    close() 时补齐数组和对象的结尾，因此写到一半中断的文件只缺少结尾。
+    问题没有行号信息，位置只包含文件路径；partialFingerprints 由文件、类型和文本计算，
+    便于看板在多次运行之间识别同一问题。
+    """
+
+    def __init__(self, target, tool_version=None):
+        super().__init__(target)
+        self._first = True
+        self._errors = 0
+        driver = {'name': 'git-llm', 'informationUri': 'https://github.com/869413421/git-llm', 'rules': SARIF_RULES}
+        if tool_version:
+            driver['version'] = tool_version
+        header = json.dumps({'tool': {'driver': driver}}, ensure_ascii=False)
+        # 去掉结尾的 }，在同一个 run 对象中继续写 results
+        self._write(
+            f'{{"$schema": "{SARIF_SCHEMA}", "version": "2.1.0", "runs": [{header[:-1]}, "results": [\n'
+        )
+
+    def _write_sarif_result(self, record):
+        with self._lock:
+            if self._closed:
+                return
+            if not self._first:
+                self._stream.write(',\n')
+            self._first = False
+            self._stream.write(json.dumps(record, ensure_ascii=False))
+            self._stream.flush()
+
+    @staticmethod
+    def _location(file_path):
+        return [{'physicalLocation': {'artifactLocation': {'uri': file_path}}}]
+
+    def write_result(self, result):
+        if result.error:
+            with self._lock:
+                self._errors += 1
+        properties = {'reusedFrom': result.reused['path']} if result.reused else {}
+        for finding in result.findings:
+            fingerprint = hashlib.sha256(
+                f"{finding.file}\0{finding.issue_type}\0{finding.text}".encode('utf-8')
+            ).hexdigest()
+            self._write_sarif_result({
+                'ruleId': finding.issue_type,
+                'level': SARIF_LEVELS[finding.severity],
+                'message': {'text': finding.label},
+                'locations': self._location(finding.file),
+                'partialFingerprints': {'gitLlmFinding/v1': fingerprint},
+                'properties': {'severity': finding.severity, **properties},
+            })
+
+    def write_skipped(self, file_path, reason):
+        self._write_sarif_result({
+            'ruleId': 'skipped',
+            'kind': 'notApplicable',
+            'level': 'none',
+            'message': {'text': reason},
+            'locations': self._location(file_path),
+        })
+
+    def _finish(self):
+        invocation = {'executionSuccessful': self._errors == 0}
+        if self._errors:
+            invocation['toolExecutionNotifications'] = [
+                {'level': 'error', 'message': {'text': f"{self._errors} 个文件分析失败"}}
+            ]
+        return f'\n], "invocations": [{json.dumps(invocation, ensure_ascii=False)}]}}]}}\n'
+
+
+class ExporterGroup:
+    """把结果同时交给多个导出器"""
+
+    def __init__(self, exporters):
+        self.exporters = list(exporters)
+
+    def write_result(self, result):
+        for exporter in self.exporters:
+            exporter.write_result(result)
+
+    def write_skipped(self, file_path, reason):
+        for exporter in self.exporters:
+            exporter.write_skipped(file_path, reason)
+
+    def close(self):
+        for exporter in self.exporters:
+            exporter.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
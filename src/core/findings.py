@@ -0,0 +1,108 @@
+"""分析结果的紧凑对象模型。
+
+分析器返回的建议字典在流水线中被立即转换为这些对象，之后直接传给界面，
+不再经过 JSON 序列化，也不再复制成带前缀字符串的嵌套字典。
+所有类都使用 __slots__，大变更集下每条问题只占用一个小对象。
+"""
+from .classifier import TYPE_PREFIXES, iter_findings, extract_changes
+
+# 展示顺序
+SEVERITY_ORDER = ('severe', 'warning', 'suggestion')
+ISSUE_TYPE_ORDER = ('security', 'standard')
+
+
+class Finding:
+    """单个文件中的一条问题"""
+
+    __slots__ = ('file', 'severity', 'issue_type', 'text')
+
+    def __init__(self, file, severity, issue_type, text):
+        self.file = file
+        self.severity = severity
+        self.issue_type = issue_type
+        self.text = text
+
+    @property
+    def label(self):
+        """带类型前缀的展示文本，例如 "[安全] ..." """
+        return f"{TYPE_PREFIXES[self.issue_type]} {self.text}"
+
+
+class Change:
+    """单个文件中的一条变更描述"""
+
+    __slots__ = ('file', 'text')
+
+    def __init__(self, file, text):
+        self.file = file
+        self.text = text
+
+
+class FileResult:
+    """单个文件的分析结果"""
+
+    __slots__ = ('file', 'findings', 'changes', 'error', 'reused')
+
+    def __init__(self, file, findings=(), changes=(), error=None, reused=None):
+        self.file = file
+        self.findings = findings
+        self.changes = changes
+        self.error = error
+        # 复用近似重复差异的结果时为 {'path': 来源文件, 'similarity': 相似度}，
+        # 与本次运行中机械相似的代表文件共享结果时另有 'cluster': 聚类文件数
+        self.reused = reused
+
+    @classmethod
+    def from_suggestions(cls, file_path, suggestions):
+        """从分析器返回的建议字典构建结果。
+
+        Args:
+            file_path (str): 文件路径
+            suggestions (dict): AIAnalyzer 返回的分析结果
+
+        Returns:
+            FileResult: 分类后的结果，不再引用原始字典
+        """
+        findings = tuple(
+            Finding(file_path, severity, issue_type, item)
+            for _, severity, issue_type, item in iter_findings(suggestions)
+        )
+        changes = tuple(Change(file_path, str(item)) for item in extract_changes(suggestions))
+        return cls(file_path, findings, changes, suggestions.get('error'), suggestions.get('reused'))
+
+    def counts(self):
+        """统计各严重程度的问题数量"""
+        counts = dict.fromkeys(SEVERITY_ORDER, 0)
+        for finding in self.findings:
+            counts[finding.severity] += 1
+        return counts
+
+
+class FindingGroup:
+    """跨文件合并后的一组近似重复问题"""
+
+    __slots__ = ('text', 'severity', 'issue_type', 'files')
+
+    def __init__(self, text, severity, issue_type, files):
+        self.text = text
+        self.severity = severity
+        self.issue_type = issue_type
+        self.files = files
+
+    @property
+    def label(self):
+        """展示文本，涉及多个文件时标注文件数"""
+        label = f"{TYPE_PREFIXES[self.issue_type]} {self.text}"
+        if len(self.files) > 1:
+            label += f"（共{len(self.files)}个文件）"
+        return label
+
+
+class ChangeGroup:
+    """跨文件合并后的一组近似重复变更描述"""
+
+    __slots__ = ('text', 'files')
+
+    def __init__(self, text, files):
+        self.text = text
+        self.files = files
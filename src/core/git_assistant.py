@@ -1,27 +1,38 @@
 from git import Repo
 import os
+from .triage import ChangeStat
 from ..utils.config import Config
 from ..utils.logger import Logger
 
 logger = Logger(__name__)
 
 class GitAssistant:
-    def __init__(self, repo_path='.'):
+    def __init__(self, repo_path='.', config=None):
         self.repo = Repo(repo_path)
         self.git = self.repo.git
-        self.config = Config()
+        self.config = config or Config()
 
-    def get_modified_files(self):
+    def get_modified_files(self, staged_only=None):
         """
         获取所有修改的文件列表（排除被忽略的文件）
 
+        Args:
+            staged_only (bool): 只返回已暂存的文件，默认读取配置 GIT_LLM_STAGED_ONLY
+
         Returns:
             list: 修改的文件列表
         """
+        if staged_only is None:
+            staged_only = self.config.staged_only
+
         # 获取所有修改的文件
-        unstaged = [item.a_path for item in self.repo.index.diff(None)]
         staged = [item.a_path for item in self.repo.index.diff('HEAD')]
-        untracked = self.repo.untracked_files
+        if staged_only:
+            unstaged = []
+            untracked = []
+        else:
+            unstaged = [item.a_path for item in self.repo.index.diff(None)]
+            untracked = self.repo.untracked_files
         
         # 合并所有修改的文件并去重
         all_files = list(set(unstaged + staged + untracked))
@@ -35,21 +46,24 @@ class GitAssistant:
         
         return filtered_files
 
-    def get_file_diff(self, file_path):
+    def get_file_diff(self, file_path, staged_only=None):
         """获取指定文件的修改内容
 
         Args:
             file_path (str): 文件路径
+            staged_only (bool): 只包含已暂存的修改，默认读取配置 GIT_LLM_STAGED_ONLY
 
         Returns:
             str: 文件修改内容
         """
+        if staged_only is None:
+            staged_only = self.config.staged_only
         try:
-            if file_path in self.repo.untracked_files:
+            if not staged_only and file_path in self.repo.untracked_files:
                 with open(os.path.join(self.repo.working_dir, file_path), 'r', encoding='utf-8') as f:
                     return f"New file: {file_path}\n" + f.read()
             
-            unstaged_diff = self.git.diff(file_path)
+            unstaged_diff = '' if staged_only else self.git.diff(file_path)
             staged_diff = self.git.diff('--cached', file_path)
             
             combined_diff = ""
@@ -62,6 +76,183 @@ class GitAssistant:
         except Exception as e:
             return f"Error getting diff for {file_path}: {str(e)}"
 
+    def get_change_stats(self, staged_only=None):
+        """不读取差异内容，获取每个变更文件的规模信号。
+
+        跟踪中的文件通过一次 git diff --numstat -z -M 取得相对 HEAD（暂存和未暂存合并）的增删行数、
+        二进制标记和重命名来源（只分析暂存区时取 --cached）；未跟踪的文件只读取文件大小，
+        并检查开头的少量字节判断是否为二进制文件。
+
+        Args:
+            staged_only (bool): 只统计暂存区，默认读取配置 GIT_LLM_STAGED_ONLY
+
+        Returns:
+            dict: {file_path: ChangeStat}
+        """
+        if staged_only is None:
+            staged_only = self.config.staged_only
+
+        if staged_only:
+            outputs = [self.git.diff('--cached', '--numstat', '-z', '-M')]
+        elif self.get_head_commit() is not None:
+            outputs = [self.git.diff('HEAD', '--numstat', '-z', '-M')]
+        else:
+            # 空仓库没有 HEAD，分别统计暂存区与工作区
+            outputs = [self.git.diff('--cached', '--numstat', '-z', '-M'), self.git.diff('--numstat', '-z', '-M')]
+
+        stats = {}
+        for output in outputs:
+            for file_path, added, deleted, old_path in self._parse_numstat(output):
+                stat = stats.get(file_path)
+                if stat is None:
+                    stats[file_path] = ChangeStat(added, deleted, old_path=old_path)
+                elif added is not None and stat.added is not None:
+                    stat.added += added
+                    stat.deleted += deleted
+
+        if not staged_only:
+            for file_path in self.repo.untracked_files:
+                full_path = os.path.join(self.repo.working_dir, file_path)
+                try:
+                    size = os.path.getsize(full_path)
+                    with open(full_path, 'rb') as f:
+                        binary = b'\0' in f.read(8000)
+                except OSError:
+                    continue
+                # 约 40 字节一行
+                lines = None if binary else size // 40 + 1
+                stats[file_path] = ChangeStat(lines, 0 if lines is not None else None, size=size)
+        return stats
+
+    @staticmethod
+    def _parse_numstat(output):
+        """解析 git diff --numstat -z 的输出。
+
+        普通条目为 "增加\\t删除\\t路径\\0"；重命名条目的路径为空，随后是旧路径和新路径两段。
+        二进制文件的行数为 "-"。
+
+        Yields:
+            tuple: (file_path, added, deleted, old_path)
+                二进制文件的 added、deleted 为 None；重命名时 file_path 为新路径，否则 old_path 为 None
+        """
+        fields = output.split('\0')
+        index = 0
+        while index < len(fields):
+            entry = fields[index]
+            index += 1
+            if not entry:
+                continue
+            added, deleted, file_path = entry.split('\t', 2)
+            old_path = None
+            if not file_path:
+                old_path, file_path = fields[index], fields[index + 1]
+                index += 2
+            if added == '-':
+                yield file_path, None, None, old_path
+            else:
+                yield file_path, int(added), int(deleted), old_path
+
+    def get_head_commit(self):
+        """获取 HEAD 提交的 SHA，空仓库返回 None"""
+        try:
+            return self.repo.head.commit.hexsha
+        except ValueError:
+            return None
+
+    def get_index_blobs(self):
+        """获取暂存区中所有文件的 blob 哈希。
+
+        Returns:
+            dict: {file_path: blob_hash}，冲突中的文件取第一个阶段
+        """
+        blobs = {}
+        # 输出格式: <mode> SP <object> SP <stage> TAB <file>
+        for entry in self.git.ls_files('-s', '-z').split('\0'):
+            if '\t' in entry:
+                meta, path = entry.split('\t', 1)
+                blobs.setdefault(path, meta.split()[1])
+        return blobs
+
+    def read_blob(self, blob_hash, max_bytes=None):
+        """读取 blob 内容，超过 max_bytes 或读取失败时返回 None"""
+        try:
+            _, _, size, data = self.git.get_object_data(blob_hash)
+        except Exception as e:
+            logger.debug(f"读取 blob {blob_hash} 失败: {str(e)}")
+            return None
+        if max_bytes is not None and size > max_bytes:
+            return None
+        return data
+
+    def get_blob_hashes(self, file_paths, chunk_size=500, staged_only=None):
+        """批量获取文件在 HEAD 与工作区（或暂存区）中的 blob 哈希。
+
+        两者都未变化时，文件的差异也不会变化，可以据此复用历史分析结果。
+
+        Args:
+            file_paths (list): 文件路径列表
+            chunk_size (int): 每次调用 git 时传入的最大文件数
+            staged_only (bool): 取暂存区而不是工作区的 blob 哈希，默认读取配置 GIT_LLM_STAGED_ONLY
+
+        Returns:
+            dict: {file_path: (base_hash, blob_hash)}，不存在的一侧为 None
+        """
+        if staged_only is None:
+            staged_only = self.config.staged_only
+        hashes = {file_path: (None, None) for file_path in file_paths}
+        has_head = self.get_head_commit() is not None
+
+        for start in range(0, len(file_paths), chunk_size):
+            chunk = file_paths[start:start + chunk_size]
+
+            base_hashes = {}
+            if has_head:
+                # 输出格式: <mode> SP <type> SP <object> TAB <file>
+                output = self.git.ls_tree('-z', 'HEAD', '--', *chunk)
+                for entry in output.split('\0'):
+                    if '\t' in entry:
+                        meta, path = entry.split('\t', 1)
+                        base_hashes[path] = meta.split()[2]
+
+            blob_hashes = {}
+            if staged_only:
+                # 输出格式: <mode> SP <object> SP <stage> TAB <file>
+                output = self.git.ls_files('-s', '-z', '--', *chunk)
+                for entry in output.split('\0'):
+                    if '\t' in entry:
+                        meta, path = entry.split('\t', 1)
+                        blob_hashes[path] = meta.split()[1]
+                existing = []
+            else:
+                existing = [
+                    f for f in chunk if os.path.isfile(os.path.join(self.repo.working_dir, f))
+                ]
+            if existing:
+                output = self.git.hash_object('--', *existing)
+                blob_hashes = dict(zip(existing, output.splitlines()))
+
+            for file_path in chunk:
+                hashes[file_path] = (base_hashes.get(file_path), blob_hashes.get(file_path))
+
+        return hashes
+
+    @staticmethod
+    def parse_diff_blob_hashes(diff_text):
+        """从 git diff --full-index 的 index 行中解析差异两侧的 blob 哈希。
+
+        Returns:
+            tuple: (base_hash, blob_hash)，新增或删除的一侧为 None
+        """
+        for line in diff_text.splitlines():
+            if line.startswith('index '):
+                base_hash, blob_hash = line.split()[1].split('..')
+                null = '0' * len(base_hash)
+                return (None if base_hash == null else base_hash,
+                        None if blob_hash == null else blob_hash)
+            if line.startswith('@@'):
+                break
+        return None, None
+
     def commit_changes(self, commit_message):
         """
         提交更改
@@ -75,5 +266,87 @@ class GitAssistant:
         if not modified_files:
             raise Exception("没有要提交的更改")
         
-        self.repo.index.add(modified_files)
-        self.repo.index.commit(commit_message) 
\ No newline at end of file
+        # 只分析暂存区时按暂存区原样提交，不把工作区的修改加入提交
+        if not self.config.staged_only:
+            self.repo.index.add(modified_files)
+        self.repo.index.commit(commit_message)
+
+    def iter_commit_diffs(self, rev_range):
+        """流式遍历提交范围内的每个提交及其逐文件差异。
+
+        通过一个 git log -p 进程按提交顺序流式读取，无需检出代码，
+        任意时刻只在内存中保留当前提交的差异。
+
+        Args:
+            rev_range (str): 提交范围，例如 "main..feature"
+
+        Yields:
+            tuple: (commit_info, file_diffs)
+                commit_info 为包含 sha、author、timestamp、subject 的字典
+                file_diffs 为 [(file_path, diff_text), ...] 列表
+        """
+        process = self.git(c='core.quotePath=false').log(
+            '--reverse', '--no-color', '--no-ext-diff', '--full-index', '-M', '-p',
+            '--format=%x00%H%x00%an%x00%at%x00%s', rev_range, '--',
+            as_process=True
+        )
+        commit_info = None
+        file_diffs = []
+        file_lines = []
+        try:
+            for raw_line in process.stdout:
+                line = raw_line.decode('utf-8', errors='replace')
+                if line.startswith('\0'):
+                    if file_lines:
+                        file_diffs.append(self._parse_file_diff(file_lines))
+                        file_lines = []
+                    if commit_info is not None:
+                        yield commit_info, file_diffs
+                    sha, author, timestamp, subject = line.rstrip('\n').split('\0')[1:5]
+                    commit_info = {
+                        'sha': sha,
+                        'author': author,
+                        'timestamp': int(timestamp),
+                        'subject': subject
+                    }
+                    file_diffs = []
+                elif line.startswith('diff --git '):
+                    if file_lines:
+                        file_diffs.append(self._parse_file_diff(file_lines))
+                    file_lines = [line]
+                elif file_lines:
+                    file_lines.append(line)
+
+            if file_lines:
+                file_diffs.append(self._parse_file_diff(file_lines))
+            if commit_info is not None:
+                yield commit_info, file_diffs
+        finally:
+            process.stdout.close()
+            process.wait()
+
+    @staticmethod
+    def _parse_file_diff(lines):
+        """从单个文件的差异行中解析文件路径。
+
+        Returns:
+            tuple: (file_path, diff_text)
+        """
+        file_path = None
+        for line in lines[1:]:
+            if line.startswith('+++ ') and not line.startswith('+++ /dev/null'):
+                file_path = line[4:].rstrip('\n').rstrip('\t')
+                break
+            if line.startswith('--- ') and not line.startswith('--- /dev/null'):
+                file_path = line[4:].rstrip('\n').rstrip('\t')
+            elif line.startswith('rename to '):
+                file_path = 'b/' + line[len('rename to '):].rstrip('\n')
+            elif line.startswith('@@'):
+                break
+
+        if file_path is None:
+            # 二进制文件或仅权限变更：从 diff --git 头部解析
+            file_path = lines[0].rstrip('\n').rsplit(' b/', 1)[-1]
+        elif file_path[:2] in ('a/', 'b/'):
+            file_path = file_path[2:]
+        return file_path, ''.join(lines)
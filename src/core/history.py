@@ -0,0 +1,159 @@
+from .classifier import (
+    SEVERITY_NAMES, TYPE_NAMES, empty_stats, classify_suggestions, count_issues, add_to_stats
+)
+from .pipeline import analyze_concurrently
+from .scheduler import PRIORITY_BACKGROUND
+from ..utils.logger import Logger
+
+logger = Logger(__name__)
+
+"""提交范围审查器，对 base..head 范围内的历史提交进行代码审查。
+
+此类复用与工作区分析相同的分析和分类流程，提供：
+1. 流式读取提交及其逐文件差异，无需检出代码
+2. 有界并发地分析各文件差异
+3. 逐提交报告和整体汇总报告
+
+只有尚在分析中的提交会保留在内存中，处理数千个提交时内存占用保持平稳。
+"""
+class HistoryReviewer:
+    def __init__(self, git_assistant, ai_analyzer, max_workers=None, result_store=None):
+        """初始化提交范围审查器。
+
+        Args:
+            git_assistant (GitAssistant): Git 操作助手
+            ai_analyzer: AIAnalyzer 或兼容接口的对象
+            max_workers (int): 最大并发请求数，默认读取配置
+            result_store (ResultStore): 结果存储，提供时复用并保存分析结果
+        """
+        self.git_assistant = git_assistant
+        self.ai_analyzer = ai_analyzer
+        self.max_workers = max_workers or git_assistant.config.max_workers
+        self.result_store = result_store
+
+    def review(self, rev_range, on_commit=None):
+        """审查提交范围。
+
+        Args:
+            rev_range (str): 提交范围，例如 "main..feature"
+            on_commit (callable): 每个提交分析完成后调用，参数为提交报告字典
+
+        Returns:
+            dict: 整体汇总报告
+        """
+        logger.info(f"开始审查提交范围: {rev_range}")
+        aggregate = {
+            'range': rev_range,
+            'commits': 0,
+            'files': 0,
+            'errors': 0,
+            'commits_with_severe': 0,
+            'stats': empty_stats()
+        }
+        open_reports = {}
+
+        def finish(report):
+            aggregate['commits'] += 1
+            aggregate['files'] += len(report['files'])
+            if sum(report['stats']['severe'].values()) > 0:
+                aggregate['commits_with_severe'] += 1
+            for severity, type_stats in report['stats'].items():
+                for issue_type, count in type_stats.items():
+                    aggregate['stats'][severity][issue_type] += count
+            if on_commit is not None:
+                on_commit(report)
+
+        def handle(sha, file_path, suggestions):
+            report = open_reports[sha]
+            if 'error' in suggestions:
+                aggregate['errors'] += 1
+            file_data, _ = classify_suggestions(suggestions)
+            add_to_stats(report['stats'], file_data)
+            report['files'][file_path] = {
+                'issues': count_issues(file_data),
+                'severe': file_data['severe']['security'] + file_data['severe']['standard'],
+                'error': suggestions.get('error')
+            }
+            report['pending'] -= 1
+            if report['pending'] == 0:
+                finish(open_reports.pop(sha))
+
+        def jobs():
+            for index, (commit_info, file_diffs) in enumerate(self.git_assistant.iter_commit_diffs(rev_range), 1):
+                file_diffs = [
+                    (file_path, diff_text) for file_path, diff_text in file_diffs
+                    if not self.git_assistant.config.should_ignore(file_path)
+                ]
+                sha = commit_info['sha']
+                report = dict(commit_info, index=index, files={}, stats=empty_stats(), pending=len(file_diffs))
+                if not file_diffs:
+                    finish(report)
+                    continue
+                open_reports[sha] = report
+                for file_path, diff_text in file_diffs:
+                    base_hash, blob_hash = self.git_assistant.parse_diff_blob_hashes(diff_text)
+                    if self.result_store is not None and self.git_assistant.config.reuse_results:
+                        cached = self.result_store.lookup(file_path, base_hash, blob_hash, model)
+                        if cached is not None:
+                            self.result_store.record(
+                                run_id, file_path, cached, model,
+                                base_hash=base_hash, blob_hash=blob_hash, commit_sha=sha, reused=True
+                            )
+                            handle(sha, file_path, cached)
+                            continue
+                    yield (sha, base_hash, blob_hash), file_path, diff_text
+
+        model = self.git_assistant.config.model
+        run_id = None
+        if self.result_store is not None:
+            run_id = self.result_store.start_run(self.git_assistant.repo.working_dir, rev_range, model, mode='history')
+
+        for (sha, base_hash, blob_hash), file_path, suggestions in analyze_concurrently(
+                self.ai_analyzer, jobs(), self.max_workers, priority=PRIORITY_BACKGROUND):
+            if self.result_store is not None:
+                self.result_store.record(
+                    run_id, file_path, suggestions, model,
+                    base_hash=base_hash, blob_hash=blob_hash, commit_sha=sha
+                )
+            handle(sha, file_path, suggestions)
+
+        logger.info(f"提交范围审查完成: {aggregate['commits']} 个提交, {aggregate['files']} 个文件")
+        return aggregate
+
+
+def format_commit_report(report):
+    """将单个提交报告格式化为文本"""
+    lines = [f"[{report['index']}] {report['sha'][:10]} {report['subject']} ({report['author']})"]
+    for file_path, file_report in sorted(report['files'].items()):
+        if file_report['error']:
+            lines.append(f"    {file_path}: 分析失败 - {file_report['error']}")
+            continue
+        parts = [
+            f"{SEVERITY_NAMES[severity]}:{count}"
+            for severity, count in file_report['issues'].items() if count > 0
+        ]
+        lines.append(f"    {file_path}: {', '.join(parts) if parts else '未发现问题'}")
+        for item in file_report['severe']:
+            lines.append(f"        ⚠️ {item}")
+    return "\n".join(lines)
+
+
+def format_aggregate_report(aggregate):
+    """将整体汇总报告格式化为文本"""
+    lines = [
+        f"【提交范围汇总】{aggregate['range']}",
+        f"• 提交数：{aggregate['commits']}个",
+        f"• 涉及文件数：{aggregate['files']}个",
+    ]
+    if aggregate['errors']:
+        lines.append(f"• 分析失败：{aggregate['errors']}个文件")
+    for severity, type_stats in aggregate['stats'].items():
+        total = sum(type_stats.values())
+        if total > 0:
+            detail = ', '.join(
+                f"{TYPE_NAMES[issue_type]}{count}个" for issue_type, count in type_stats.items() if count > 0
+            )
+            lines.append(f"• {SEVERITY_NAMES[severity]}：{total}个（{detail}）")
+    if aggregate['commits_with_severe']:
+        lines.append(f"• ⚠️ {aggregate['commits_with_severe']}个提交包含严重问题")
+    return "\n".join(lines)
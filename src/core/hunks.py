@@ -0,0 +1,169 @@
+"""差异块（hunk）级别的拆分、指纹与结果合并。
+
+文件级缓存在文件任意一行变化时整体失效。此模块把单个文件的差异拆分为多个差异块，
+按去除行号后的内容计算指纹，使未改动的差异块在其他位置增删代码后仍能命中缓存，
+只有新增或变化的差异块需要发送给模型（同一文件的这些差异块合并为一次请求）。
+请求中的差异块带有编号，模型按编号标注每条建议，结果据此拆分后逐个差异块保存，
+最后再把复用的结果与新的结果合并为文件级结果。
+"""
+import re
+import hashlib
+
+_HUNK_HEADER_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@ ?')
+
+# 请求中差异块的编号，模型在只涉及单个差异块的建议开头原样标注
+HUNK_TAG = '[差异块 {}]'
+_HUNK_TAG_RE = re.compile(r'^\s*\[差异块\s*(\d+)\]\s*')
+
+
+def split_hunks(diff_text):
+    """将单个文件的差异拆分为文件头和差异块。
+
+    Args:
+        diff_text (str): 单个文件的差异，可包含多段（如 get_file_diff 返回的暂存与未暂存两段）
+
+    Returns:
+        tuple: (header, hunks)
+            header 为第一个差异块之前的文件头（diff --git、index、---/+++ 等行）
+            hunks 为差异块文本列表，每个以 @@ 行开头；二进制等没有差异块的情况下为整个差异
+    """
+    header_lines = []
+    hunks = []
+    current = None
+
+    def close(lines):
+        while lines and not lines[-1]:
+            lines.pop()
+        hunks.append('\n'.join(lines))
+
+    for line in diff_text.splitlines():
+        if line.startswith('@@'):
+            if current is not None:
+                close(current)
+            current = [line]
+        elif current is not None and line and line[0] not in ' +-\\':
+            # 下一段差异的文件头（diff --git、"Unstaged changes in ..." 等），不属于当前差异块
+            close(current)
+            current = None
+        elif current is not None:
+            current.append(line)
+        elif not hunks:
+            header_lines.append(line)
+    if current is not None:
+        close(current)
+
+    header = '\n'.join(header_lines)
+    if not hunks and diff_text.strip():
+        return header, [diff_text]
+    return header, hunks
+
+
+def hunk_fingerprint(file_path, hunk, model):
+    """计算与行号无关的差异块指纹。
+
+    去掉 @@ 行中的行号和每行行尾空白，因此同一段修改在文件中上下移动时指纹不变。
+    """
+    digest = hashlib.sha256(f"{model}\0{file_path}\0".encode('utf-8'))
+    for line in hunk.splitlines():
+        if line.startswith('@@'):
+            line = _HUNK_HEADER_RE.sub('@@ ', line)
+        digest.update(line.rstrip().encode('utf-8', errors='replace'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def join_hunks(header, hunks, numbered=False):
+    """把文件头和差异块重新拼接为一份差异，numbered 时在每个差异块前加上 HUNK_TAG 编号（从 1 开始）"""
+    parts = [header] if header else []
+    for index, hunk in enumerate(hunks, 1):
+        if numbered:
+            parts.append(HUNK_TAG.format(index))
+        parts.append(hunk)
+    return '\n'.join(parts)
+
+
+def split_tagged_suggestions(suggestions, count):
+    """按差异块编号拆分分析结果。
+
+    带编号的条目只归入对应的差异块；没有编号的条目（涉及整个文件或多个差异块）归入每个差异块，
+    合并时按文本去重。
+
+    Args:
+        suggestions (dict): 对 join_hunks(numbered=True) 生成的差异的分析结果
+        count (int): 差异块数量
+
+    Returns:
+        tuple: (parts, stripped)，parts 为每个差异块的结果列表，stripped 为去掉编号后的完整结果
+    """
+    def route(values):
+        if not isinstance(values, list):
+            return values, [values] * count
+        stripped = []
+        owned = [[] for _ in range(count)]
+        for value in values:
+            match = _HUNK_TAG_RE.match(value) if isinstance(value, str) else None
+            index = int(match.group(1)) - 1 if match else -1
+            if match:
+                value = value[match.end():]
+            stripped.append(value)
+            for owner in (owned[index],) if 0 <= index < count else owned:
+                owner.append(value)
+        return stripped, owned
+
+    parts = [{} for _ in range(count)]
+    stripped = {}
+    for category, content in suggestions.items():
+        if isinstance(content, dict):
+            stripped[category] = {}
+            for part in parts:
+                part[category] = {}
+            for key, values in content.items():
+                stripped[category][key], owned = route(values)
+                for part, value in zip(parts, owned):
+                    if value or not isinstance(value, list):
+                        part[category][key] = value
+        else:
+            stripped[category], owned = route(content)
+            for part, value in zip(parts, owned):
+                part[category] = value
+    return parts, stripped
+
+
+def merge_suggestions(results):
+    """合并同一文件多个差异块的分析结果。
+
+    列表按顺序拼接并去除完全相同的条目；任一差异块失败时保留 error 字段。
+
+    Args:
+        results (list): AIAnalyzer 返回的分析结果列表
+
+    Returns:
+        dict: 合并后的文件级分析结果
+    """
+    merged = {}
+    seen = {}
+
+    def extend(target, key, values, path):
+        if not isinstance(values, list):
+            values = [values]
+        items = target.setdefault(key, [])
+        known = seen.setdefault(path, set())
+        for value in values:
+            marker = value if isinstance(value, str) else repr(value)
+            if marker not in known:
+                known.add(marker)
+                items.append(value)
+
+    for suggestions in results:
+        for category, content in suggestions.items():
+            if category == 'error':
+                merged.setdefault('error', content)
+            elif isinstance(content, dict):
+                target = merged.setdefault(category, {})
+                if not isinstance(target, dict):
+                    continue
+                for key, values in content.items():
+                    extend(target, key, values, (category, key))
+            elif isinstance(merged.get(category, []), list):
+                extend(merged, category, content, (category,))
+    return merged
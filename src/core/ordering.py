@@ -0,0 +1,47 @@
+"""分析队列的排序策略。
+
+线程池按提交顺序执行任务，因此文件的提交顺序决定了结果到达的先后。
+排序只依赖事先计算好的廉价信号（numstat 变更行数、路径模式），不读取差异内容：
+- small-first: 变更小的文件优先，尽快看到第一批结果
+- risk-first: 命中高风险路径模式的文件优先，尽早发现严重问题，同等风险时小文件优先
+- longest-first: 变更大的文件优先，并发时缩短整体完成时间
+- none: 保持输入顺序
+"""
+from fnmatch import fnmatch
+
+ORDER_POLICIES = ('small-first', 'risk-first', 'longest-first', 'none')
+
+# 默认的高风险路径模式（不区分大小写）
+DEFAULT_RISK_PATTERNS = (
+    '*auth*', '*login*', '*passw*', '*secret*', '*token*', '*credential*',
+    '*crypt*', '*security*', '*permission*', '*acl*', '*session*',
+    '*sql*', '*migration*', '*.env*', '*config*', '*settings*',
+    '*dockerfile*', '*.sh', '*deploy*', '*payment*',
+)
+
+
+def risk_score(file_path, patterns=DEFAULT_RISK_PATTERNS):
+    """路径命中的高风险模式数量，越大越优先"""
+    path = file_path.lower()
+    return sum(1 for pattern in patterns if fnmatch(path, pattern.lower()))
+
+
+def order_files(file_paths, sizes, policy='small-first', patterns=DEFAULT_RISK_PATTERNS):
+    """按策略对待分析文件排序。
+
+    Args:
+        file_paths (list): 文件路径列表
+        sizes (dict): {file_path: 变更行数}，缺失的文件按 0 处理
+        policy (str): 排序策略，见 ORDER_POLICIES
+        patterns (iterable): 高风险路径模式
+
+    Returns:
+        list: 排序后的文件路径列表（排序稳定，同等条件下保持输入顺序）
+    """
+    if policy == 'small-first':
+        return sorted(file_paths, key=lambda path: sizes.get(path, 0))
+    if policy == 'longest-first':
+        return sorted(file_paths, key=lambda path: -sizes.get(path, 0))
+    if policy == 'risk-first':
+        return sorted(file_paths, key=lambda path: (-risk_score(path, patterns), sizes.get(path, 0)))
+    return list(file_paths)
@@ -0,0 +1,653 @@
+import json
+import queue
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .budget import BudgetGovernor, SAMPLED_REASON, SUMMARY_DIFF_TOKENS, diff_token_counts
+from .cancellation import AnalysisCancelled, CancelToken
+from .classifier import SEVERITY_NAMES
+from .findings import FileResult
+from .hunks import hunk_fingerprint, join_hunks, merge_suggestions, split_hunks, split_tagged_suggestions
+from .remote_cache import remote_cache_key
+from .secret_scan import SecretScanner
+from .similar import cluster_diffs, diff_literals, diff_signature, mechanical_signature
+from .ordering import ORDER_POLICIES, DEFAULT_RISK_PATTERNS, order_files, risk_score
+from .triage import DEFAULT_GENERATED_PATTERNS, triage_files
+from .scheduler import PRIORITY_NORMAL
+from ..utils.metrics import metrics
+from ..utils.profiling import stage
+from ..utils.tokens import estimate_tokens, truncate_tokens
+from ..utils.logger import Logger
+
+logger = Logger(__name__)
+
+# 等待任务完成时检查取消状态的间隔（秒）
+_POLL_INTERVAL = 0.2
+
+
+def analyze_concurrently(ai_analyzer, jobs, max_workers=4, cancel_token=None, priority=PRIORITY_NORMAL):
+    """以有界并发的方式分析一系列文件差异。
+
+    jobs 会被惰性消费：同一时刻最多只有 max_workers * 2 个任务在队列中，
+    差异文本在提交给分析器后即被释放，因此处理任意长的任务流时内存保持平稳。
+
+    Args:
+        ai_analyzer: AIAnalyzer 或兼容接口的对象（如 DaemonClient）
+        jobs (iterable): (key, file_path, diff_content) 元组的可迭代对象
+        max_workers (int): 最大并发请求数
+        cancel_token (CancelToken): 取消令牌，取消后不再提交新任务并停止产出
+        priority (int): 请求调度的优先级通道
+
+    Yields:
+        tuple: (key, file_path, suggestions)，按完成顺序产出
+    """
+    max_pending = max_workers * 2
+    jobs = iter(jobs)
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='git-llm-analyze') as executor:
+        def submit_next():
+            if cancel_token is not None and cancel_token.cancelled:
+                return False
+            try:
+                key, file_path, diff_content = next(jobs)
+            except StopIteration:
+                return False
+            future = executor.submit(
+                ai_analyzer.analyze_changes, file_path, diff_content, cancel_token=cancel_token, priority=priority
+            )
+            pending[future] = (key, file_path)
+            return True
+
+        while len(pending) < max_pending and submit_next():
+            pass
+
+        while pending:
+            done, _ = wait(pending, timeout=_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            if cancel_token is not None and cancel_token.cancelled:
+                executor.shutdown(wait=False, cancel_futures=True)
+                return
+            for future in done:
+                key, file_path = pending.pop(future)
+                try:
+                    suggestions = future.result()
+                except AnalysisCancelled:
+                    continue
+                except Exception as e:
+                    logger.error(f"分析文件 {file_path} 时发生错误: {str(e)}")
+                    suggestions = {'error': str(e)}
+                yield key, file_path, suggestions
+                submit_next()
+
+
+"""工作区变更分析流水线。
+
+此类负责一次工作区分析运行中的逐文件处理：
+1. 读取差异前按 numstat 分拣，跳过二进制、仅重命名、过大和生成的文件
+2. 按配置的策略（小文件优先、高风险优先等）排列分析顺序，获取文件差异
+3. 复用结果存储中内容未变化文件的历史结果，本地未命中时一次批量查询团队共享的远程缓存
+4. 文件有变化时复用近似重复差异（挑选到其他分支、变基后的修改）的历史结果，
+   否则按差异块复用，只把新增或变化的差异块合并为一次请求发送给分析器
+5. 以有界并发调用分析器，并保存新的分析结果
+6. 支持取消和整体截止时间，到期时返回已完成的部分结果
+7. 按运行预算预估用量，超出时降级分析或抽样跳过低风险文件，实际用量达到上限时停止
+8. 与模型分析并行地在本地扫描新增行中的密钥和凭证，发现后立即回调，不等待网络请求
+9. 本次运行中机械相似的差异（批量重命名、导入改写等）聚类后每组只分析一个代表文件，结果共享给其余成员
+"""
+class AnalysisPipeline:
+    def __init__(self, git_assistant, ai_analyzer, result_store=None, max_workers=None, symbol_index=None,
+                 remote_cache=None, secret_scanner=None):
+        """初始化分析流水线。
+
+        Args:
+            git_assistant (GitAssistant): Git 操作助手
+            ai_analyzer: AIAnalyzer 或兼容接口的对象
+            result_store (ResultStore): 结果存储，可选
+            max_workers (int): 最大并发请求数，默认读取配置
+            symbol_index (SymbolIndex): 符号索引，可选，提供时为差异附加所在函数和调用的定义
+            remote_cache (RemoteCacheClient): 团队共享的远程结果缓存，可选
+            secret_scanner (SecretScanner): 本地密钥扫描器，默认按配置创建
+        """
+        self.git_assistant = git_assistant
+        self.ai_analyzer = ai_analyzer
+        self.result_store = result_store
+        self.max_workers = max_workers or git_assistant.config.max_workers
+        self.symbol_index = symbol_index
+        self.remote_cache = remote_cache
+        self.secret_scanner = secret_scanner or SecretScanner.from_config(git_assistant.config)
+
+    def refresh_symbols(self, modified_files):
+        """增量更新符号索引，返回可用于本次运行的索引，失败或未启用时返回 None"""
+        if self.symbol_index is None or self.git_assistant.config.context_tokens <= 0:
+            return None
+        try:
+            self.symbol_index.refresh(self.git_assistant, modified_files)
+        except Exception as e:
+            logger.warning(f"更新符号索引失败，本次不附加上下文: {str(e)}")
+            return None
+        return self.symbol_index
+
+    def triage(self, modified_files):
+        """读取差异之前分拣变更文件。
+
+        只调用一次 numstat 并扫描未跟踪文件的大小，二进制、仅重命名、变更过大和生成的文件
+        不会获取差异，也不会发送给模型。获取 numstat 失败时所有文件都按需要审查处理。
+
+        Returns:
+            tuple: (reviewable, skipped, sizes)
+                reviewable 为需要审查的文件列表，skipped 为 [(文件路径, 原因), ...]，
+                sizes 为 {文件路径: 变更行数}，供排序使用
+        """
+        config = self.git_assistant.config
+        try:
+            stats = self.git_assistant.get_change_stats()
+        except Exception as e:
+            logger.warning(f"获取变更行数失败，跳过分拣: {str(e)}")
+            return list(modified_files), [], {}
+
+        reviewable, skipped = triage_files(
+            modified_files, stats, config.max_diff_lines, config.generated_patterns or DEFAULT_GENERATED_PATTERNS
+        )
+        if skipped:
+            logger.info(f"分拣跳过 {len(skipped)} 个文件: {', '.join(f'{path}({reason})' for path, reason in skipped)}")
+        return reviewable, skipped, {file_path: stat.lines for file_path, stat in stats.items()}
+
+    def order(self, modified_files, sizes):
+        """按配置的排序策略排列待分析的文件。
+
+        策略只依赖 numstat 行数和路径模式。
+        """
+        config = self.git_assistant.config
+        policy = config.order_policy
+        if policy not in ORDER_POLICIES:
+            logger.warning(f"未知的排序策略: {policy}，保持原顺序")
+            return list(modified_files)
+        return order_files(modified_files, sizes, policy, config.risk_patterns or DEFAULT_RISK_PATTERNS)
+
+    def run(self, modified_files, cancel_token=None, on_progress=None, on_result=None, on_skipped=None,
+            on_commit_message=None, keep_results=True, on_estimate=None, on_secret_findings=None):
+        """分析一组变更文件。
+
+        Args:
+            modified_files (list): 变更文件列表
+            cancel_token (CancelToken): 取消令牌
+            on_progress (callable): 每个文件完成时调用，参数为 (已完成数, 总数, 文件路径)
+            on_result (callable): 每个文件完成时以其 FileResult 调用，按完成顺序，便于逐个展示
+            on_skipped (callable): 分拣完成后对每个跳过的文件调用，参数为 (文件路径, 原因)
+            on_commit_message (callable): 提供时，差异收集完成后立即与逐文件分析并发生成提交信息，
+                生成后以提交信息调用；开启 GIT_LLM_REFINE_COMMIT_MESSAGE 时，分析完成后结合审查结论
+                再生成一次并再次调用
+            keep_results (bool): 为 False 时结果只交给 on_result 而不保留，返回的 results 为空列表，
+                流式导出大量文件时内存占用保持平稳
+            on_estimate (callable): 分拣完成、开始分析前以预算计划（BudgetPlan）调用，用于展示预估用量
+            on_secret_findings (callable): 本地密钥扫描发现问题时立即以只含这些问题的 FileResult 调用，
+                不等待该文件的模型分析；文件完成时 on_result 收到的结果同样包含这些问题
+
+        Returns:
+            dict: {
+                'results': [FileResult, ...]（按分析顺序）,
+                'diffs': ["File: 路径\\n差异", ...]，只在提供 on_commit_message 时收集，使用后应尽快释放,
+                'unfinished': [未完成的文件路径, ...],
+                'skipped': [(跳过的文件路径, 原因), ...],
+                'commit_message': 生成的提交信息，未请求或未完成时为 None,
+                'cancelled': 取消原因，未取消时为 None（运行预算用尽时为 'budget'）,
+                'budget': {'plan': BudgetPlan, 'actual': 实际用量 RunEstimate}
+            }
+        """
+        config = self.git_assistant.config
+        model = config.model
+
+        # 预算估算、聚类或密钥扫描先于分析读取的差异压缩后暂存，分析该文件时取出，每个文件的差异只读取一次
+        diffs, diff_index = [], {}
+        diff_cache = {}
+
+        def read_diff(file_path):
+            if file_path in diff_index:
+                return diffs[diff_index[file_path]][len(f"File: {file_path}\n"):]
+            cached = diff_cache.pop(file_path, None)
+            if cached is not None:
+                return zlib.decompress(cached).decode('utf-8')
+            return self.git_assistant.get_file_diff(file_path)
+
+        def prefetch_diff(file_path):
+            diff_content = read_diff(file_path)
+            if file_path not in diff_index:
+                diff_cache[file_path] = zlib.compress(diff_content.encode('utf-8'))
+            return diff_content
+
+        with stage('triage'):
+            modified_files, skipped, sizes = self.triage(modified_files)
+            if on_skipped is not None:
+                for file_path, reason in skipped:
+                    on_skipped(file_path, reason)
+            modified_files = self.order(modified_files, sizes)
+
+            head_commit = self.git_assistant.get_head_commit()
+            blob_hashes = {}
+            run_id = None
+            if self.result_store is not None or self.remote_cache is not None:
+                blob_hashes = self.git_assistant.get_blob_hashes(modified_files)
+            if self.result_store is not None:
+                run_id = self.result_store.start_run(self.git_assistant.repo.working_dir, head_commit, model)
+
+            # 远程缓存一次批量查询全部文件，命中的文件不计入预算
+            remote_keys = {}
+            remote_hits = {}
+            if self.remote_cache is not None:
+                for file_path in modified_files:
+                    key = remote_cache_key(file_path, *blob_hashes.get(file_path, (None, None)), model)
+                    if key is not None:
+                        remote_keys[file_path] = key
+            if remote_keys and config.reuse_results:
+                remote_hits = self.remote_cache.get_many(remote_keys.values())
+                if remote_hits:
+                    logger.info(f"远程缓存命中 {len(remote_hits)}/{len(modified_files)} 个文件")
+
+            # 设置了上限时按差异文本预估，超出时降级，抽样跳过的文件与分拣跳过的文件一样处理；
+            # 未设置上限时预估只用于展示，按 numstat 行数近似，不提前读取差异
+            governor = BudgetGovernor.from_config(config, self.max_workers)
+            risk_patterns = config.risk_patterns or DEFAULT_RISK_PATTERNS
+            to_analyze = [path for path in modified_files if remote_keys.get(path) not in remote_hits]
+            if governor.enabled:
+                diff_tokens = dict(self._map_files(lambda path: estimate_tokens(prefetch_diff(path)), to_analyze))
+            else:
+                diff_tokens = diff_token_counts(to_analyze, sizes)
+            plan = governor.plan(
+                diff_tokens,
+                {file_path: risk_score(file_path, risk_patterns) for file_path in to_analyze},
+                commit_message=on_commit_message is not None
+            )
+            if plan.sampled:
+                logger.info(f"超出运行预算，抽样跳过 {len(plan.sampled)} 个低风险文件")
+                sampled = [(file_path, SAMPLED_REASON) for file_path in plan.sampled]
+                skipped = skipped + sampled
+                if on_skipped is not None:
+                    for file_path, reason in sampled:
+                        on_skipped(file_path, reason)
+                for file_path in plan.sampled:
+                    diff_cache.pop(file_path, None)
+                sampled_set = set(plan.sampled)
+                modified_files = [file_path for file_path in modified_files if file_path not in sampled_set]
+            if plan.degraded:
+                logger.info(f"运行预算: {plan.describe()}")
+            if on_estimate is not None:
+                on_estimate(plan)
+            detail = plan.detail
+            # 调用方未提供取消令牌时自行创建，预算用尽时据此停止，时间上限由其截止时间负责
+            owns_token = cancel_token is None and governor.enabled
+            if owns_token:
+                cancel_token = CancelToken(deadline=config.run_timeout or None)
+
+        # 需要提交信息时先并行收集全部差异，提交信息请求无需等待逐文件分析；
+        # 否则由各工作线程按需读取差异，用后即释放
+        if on_commit_message is not None:
+            with stage('diffing'):
+                diffs, diff_index = self._collect_diffs(modified_files, read_diff)
+                # 跳过的文件只向提交信息提供一行说明
+                diffs.extend(f"File: {file_path}\n[{reason}，未包含差异内容]" for file_path, reason in skipped)
+
+        # 本地密钥扫描的结果经队列交给轮询线程，立即通过 on_secret_findings 展示
+        secret_queue = queue.SimpleQueue()
+        secret_hits = {}
+
+        def scan_file(file_path, diff_content=None):
+            if cancel_token is not None and cancel_token.cancelled:
+                return ()
+            try:
+                if diff_content is None:
+                    diff_content = prefetch_diff(file_path)
+                findings = self.secret_scanner.scan(file_path, diff_content)
+            except Exception as e:
+                logger.warning(f"扫描文件 {file_path} 的密钥失败: {str(e)}")
+                return ()
+            if findings:
+                secret_hits[file_path] = findings
+                metrics.increment('secrets.found', len(findings))
+                logger.warning(f"本地扫描发现 {len(findings)} 处疑似凭证泄露: {file_path}")
+                secret_queue.put(FileResult(file_path, findings))
+            return findings
+
+        # 机械相似的差异（批量重命名、导入改写等）每组只分析代表文件，代表文件完成后把结果共享给其余成员；
+        # 计算签名时读取的差异同时完成密钥扫描
+        followers = {}
+        prescanned = False
+        if config.cluster_threshold > 0 and len(modified_files) > 1:
+            def signature_diff(file_path):
+                diff_content = prefetch_diff(file_path)
+                if self.secret_scanner is not None:
+                    scan_file(file_path, diff_content)
+                return diff_content
+
+            with stage('clustering'):
+                followers = cluster_diffs(
+                    self._map_files(lambda path: mechanical_signature(path, signature_diff(path)), modified_files),
+                    config.cluster_threshold
+                )
+            prescanned = True
+            if followers:
+                shared_count = sum(len(members) for members in followers.values())
+                metrics.increment('cluster.shared', shared_count)
+                logger.info(f"{len(followers)} 组机械相似的差异只分析代表文件，{shared_count} 个文件共享结果")
+        follower_files = {member for members in followers.values() for member, _ in members}
+        cluster_results = {}
+
+        commit_executor = None
+        commit_future = None
+        if on_commit_message is not None and diffs:
+            commit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='git-llm-commit')
+            commit_future = commit_executor.submit(
+                self.ai_analyzer.generate_commit_message, diffs, cancel_token=cancel_token
+            )
+            commit_future.add_done_callback(
+                lambda future: self._deliver_commit_message(future, cancel_token, on_commit_message)
+            )
+
+        with stage('indexing'):
+            symbol_index = self.refresh_symbols(modified_files)
+
+        def context_for(file_path, diff_text):
+            if symbol_index is None:
+                return None
+            return symbol_index.context_for(file_path, diff_text, config.context_tokens) or None
+
+        def analyze(file_path, diff_content, tag_hunks=False):
+            if detail == 'summary':
+                diff_content = truncate_tokens(diff_content, SUMMARY_DIFF_TOKENS)
+            suggestions = self.ai_analyzer.analyze_changes(
+                file_path, diff_content, cancel_token=cancel_token, context=context_for(file_path, diff_content),
+                detail=detail, tag_hunks=tag_hunks
+            )
+            # 确保suggestions是JSON格式
+            if isinstance(suggestions, str):
+                try:
+                    suggestions = json.loads(suggestions)
+                except json.JSONDecodeError:
+                    suggestions = {'analysis': suggestions}
+            return suggestions
+
+        # 降级分析的结果不写入结果存储，以免之后的完整分析复用不完整的结果
+        record_results = self.result_store is not None and not plan.degraded
+        use_hunks = self.result_store is not None and config.hunk_cache
+        use_similar = self.result_store is not None and config.reuse_results and config.similar_threshold > 0
+
+        def analyze_hunks(file_path, header, hunks, fingerprints):
+            """按差异块分析文件。
+
+            复用命中历史结果的差异块，其余差异块合并为一次请求。请求中的差异块带有编号，
+            模型按编号标注建议，结果拆分后逐个差异块保存，之后只改动其中一部分时其余差异块仍可复用。
+            """
+            groups = self.result_store.lookup_hunk_groups(fingerprints, model) if config.reuse_results else []
+            covered = set().union(*(members for members, _ in groups))
+            pending = [(hunk, fingerprint) for hunk, fingerprint in zip(hunks, fingerprints) if fingerprint not in covered]
+            results = [result for _, result in groups]
+            if pending:
+                numbered = len(pending) > 1
+                result = analyze(file_path, join_hunks(header, [hunk for hunk, _ in pending], numbered), numbered)
+                parts = [result]
+                if numbered:
+                    parts, result = split_tagged_suggestions(result, len(pending))
+                if record_results:
+                    for (_, fingerprint), part in zip(pending, parts):
+                        self.result_store.record_hunk_group([fingerprint], file_path, part, model)
+                results.append(result)
+
+            if groups:
+                metrics.increment('hunks.reused', len(hunks) - len(pending))
+                metrics.increment('hunks.analyzed', len(pending))
+                logger.info(f"复用 {len(hunks) - len(pending)}/{len(hunks)} 个未变化的差异块: {file_path}")
+            return results[0] if len(results) == 1 else merge_suggestions(results)
+
+        # 聚类时没有扫描的，由单独的线程按分析顺序扫描，不等待模型请求，
+        # 读取的差异暂存给之后分析该文件的工作线程
+        scan_futures = {}
+        scan_executor = None
+
+        def read_and_scan(file_path):
+            """读取差异并取得该文件的密钥扫描结果；扫描线程尚未处理到该文件时直接在当前线程扫描"""
+            if self.secret_scanner is None:
+                return read_diff(file_path), ()
+            if prescanned:
+                return read_diff(file_path), secret_hits.get(file_path, ())
+            future = scan_futures.get(file_path)
+            if future is not None and not future.cancel():
+                # 扫描线程已读取或正在读取该文件，等待其暂存的差异
+                secrets = future.result()
+                return read_diff(file_path), secrets
+            diff_content = read_diff(file_path)
+            return diff_content, scan_file(file_path, diff_content)
+
+        def analyze_file(file_path, shared=None):
+            """分析单个文件；shared 为 (代表文件, 代表文件的分析结果, 相似度, 聚类大小) 时共享代表文件的结果"""
+            diff_content, secrets = read_and_scan(file_path)
+            base_hash, blob_hash = blob_hashes.get(file_path, (None, None))
+
+            suggestions = None
+            if self.result_store is not None and config.reuse_results:
+                suggestions = self.result_store.lookup(file_path, base_hash, blob_hash, model)
+                if suggestions is not None:
+                    logger.info(f"文件未变化，复用历史分析结果: {file_path}")
+            reused = suggestions is not None
+
+            remote_key = remote_keys.get(file_path)
+            if suggestions is None and remote_key in remote_hits:
+                suggestions = remote_hits.pop(remote_key)
+                logger.info(f"复用远程缓存中的分析结果: {file_path}")
+            from_remote = suggestions is not None and not reused
+
+            if suggestions is None and shared is not None:
+                source, source_suggestions, score, size = shared
+                suggestions = dict(source_suggestions)
+                suggestions['reused'] = {'path': source, 'similarity': round(score, 2), 'cluster': size}
+
+            signature = None
+            if suggestions is None and use_similar:
+                signature = diff_signature(diff_content)
+                if signature is not None:
+                    match = self.result_store.lookup_similar(
+                        signature, diff_literals(diff_content), model, config.similar_threshold
+                    )
+                    if match is not None:
+                        suggestions, source, score = match
+                        suggestions['reused'] = {'path': source, 'similarity': round(score, 2)}
+                        metrics.increment('similar.reused')
+                        logger.info(f"复用相似变更的分析结果: {file_path} <- {source}（相似度 {score:.0%}）")
+            # 来自相似差异（历史结果或本次的代表文件）的结果不再写入相似索引和远程缓存
+            from_similar = suggestions is not None and not reused and not from_remote
+
+            if suggestions is None and use_hunks:
+                header, hunks = split_hunks(diff_content)
+                if hunks:
+                    fingerprints = [hunk_fingerprint(file_path, hunk, model) for hunk in hunks]
+                    suggestions = analyze_hunks(file_path, header, hunks, fingerprints)
+
+            if suggestions is None:
+                suggestions = analyze(file_path, diff_content)
+
+            # 复用的结果同样记入本次运行，运行记录包含全部已分析的文件
+            if reused or record_results or (from_remote and self.result_store is not None):
+                self.result_store.record(
+                    run_id, file_path, suggestions, model,
+                    base_hash=base_hash, blob_hash=blob_hash, commit_sha=head_commit, reused=reused
+                )
+            if not (reused or from_remote or from_similar) and not plan.degraded:
+                if remote_key is not None:
+                    self.remote_cache.put(remote_key, suggestions)
+                if use_similar:
+                    signature = signature or diff_signature(diff_content)
+                    if signature is not None:
+                        self.result_store.record_similar(
+                            file_path, signature, diff_literals(diff_content), suggestions, model
+                        )
+            if file_path in followers and 'error' not in suggestions:
+                cluster_results[file_path] = suggestions
+            # 建议字典在此转换为紧凑对象后即可释放
+            result = FileResult.from_suggestions(file_path, suggestions)
+            if secrets:
+                result.findings = secrets + result.findings
+            return result
+
+        completed = {}
+        total = len(modified_files)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='git-llm-analyze')
+        if self.secret_scanner is not None and not prescanned:
+            scan_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='git-llm-secrets')
+            scan_futures = {file_path: scan_executor.submit(scan_file, file_path) for file_path in modified_files}
+        governor.start()
+        with stage('analysis'):
+            try:
+                pending = {
+                    executor.submit(analyze_file, file_path): file_path
+                    for file_path in modified_files if file_path not in follower_files
+                }
+                while pending:
+                    if cancel_token is not None and cancel_token.cancelled:
+                        break
+                    if governor.exceeded():
+                        logger.warning(f"运行预算已用尽，停止分析: {governor.actual().describe()}")
+                        cancel_token.cancel('budget')
+                        break
+                    done, _ = wait(pending, timeout=_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                    while not secret_queue.empty():
+                        partial = secret_queue.get()
+                        if on_secret_findings is not None and partial.file not in completed:
+                            on_secret_findings(partial)
+                    for future in done:
+                        file_path = pending.pop(future)
+                        # 代表文件完成后提交聚类成员；代表文件失败时成员各自分析
+                        members = followers.get(file_path, ())
+                        source_suggestions = cluster_results.pop(file_path, None)
+                        for member, score in members:
+                            shared = None
+                            if source_suggestions is not None:
+                                shared = (file_path, source_suggestions, score, len(members) + 1)
+                            pending[executor.submit(analyze_file, member, shared)] = member
+                        try:
+                            result = future.result()
+                        except AnalysisCancelled:
+                            continue
+                        except Exception as e:
+                            logger.error(f"分析文件 {file_path} 时发生错误: {str(e)}")
+                            result = FileResult.from_suggestions(file_path, {'error': str(e)})
+                            result.findings = secret_hits.get(file_path, ())
+                        completed[file_path] = result if keep_results else None
+                        if on_result is not None:
+                            on_result(result)
+                        del result
+                        if on_progress is not None:
+                            on_progress(len(completed), total, file_path)
+            finally:
+                # 取消时不等待进行中的任务，未开始的任务直接丢弃
+                executor.shutdown(wait=False, cancel_futures=True)
+                if scan_executor is not None:
+                    scan_executor.shutdown(wait=False, cancel_futures=True)
+
+        results = []
+        unfinished = []
+        for file_path in modified_files:
+            if file_path not in completed:
+                unfinished.append(file_path)
+                continue
+            result = completed.pop(file_path)
+            if result is not None:
+                results.append(result)
+
+        commit_message = None
+        with stage('commit'):
+            try:
+                if commit_future is not None:
+                    commit_message = self._wait_commit_message(commit_future, cancel_token)
+                    if commit_message is not None and config.refine_commit_message and results:
+                        refined = self._refine_commit_message(diffs, results, cancel_token)
+                        if refined is not None:
+                            commit_message = refined
+                            on_commit_message(refined)
+            finally:
+                if commit_executor is not None:
+                    commit_executor.shutdown(wait=False, cancel_futures=True)
+
+        cancelled = cancel_token.reason if cancel_token is not None and cancel_token.cancelled else None
+        if owns_token:
+            cancel_token.close()
+        if unfinished:
+            logger.warning(f"{len(unfinished)} 个文件未完成分析 ({cancelled})")
+        logger.info(f"运行指标: {metrics.summary()}")
+        return {
+            'results': results, 'diffs': diffs, 'unfinished': unfinished, 'skipped': skipped,
+            'commit_message': commit_message, 'cancelled': cancelled,
+            'budget': {'plan': plan, 'actual': governor.actual()}
+        }
+
+    def _collect_diffs(self, file_paths, read_diff):
+        """并行获取所有文件的差异，read_diff(文件路径) 返回单个文件的差异。
+
+        Returns:
+            tuple: (diffs, index)，diffs 为 ["File: 路径\\n差异", ...]，index 为 {文件路径: 下标}
+        """
+        if not file_paths:
+            return [], {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='git-llm-diff') as executor:
+            contents = list(executor.map(read_diff, file_paths))
+        diffs = [f"File: {file_path}\n{content}" for file_path, content in zip(file_paths, contents)]
+        return diffs, {file_path: index for index, file_path in enumerate(file_paths)}
+
+    def _map_files(self, func, file_paths):
+        """在差异读取线程池中对每个文件并行调用 func(文件路径)，只保留返回值（如签名、token 数）。
+
+        Returns:
+            list: [(文件路径, 返回值), ...]，按 file_paths 的顺序
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='git-llm-diff') as executor:
+            return list(zip(file_paths, executor.map(func, file_paths)))
+
+    @staticmethod
+    def _deliver_commit_message(future, cancel_token, on_commit_message):
+        """提交信息请求完成后立即回调，失败或已取消时不回调"""
+        if future.cancelled() or (cancel_token is not None and cancel_token.cancelled):
+            return
+        try:
+            message = future.result()
+        except Exception as e:
+            logger.error(f"生成提交信息时发生错误: {str(e)}")
+            return
+        if message.startswith('error:'):
+            return
+        on_commit_message(message)
+
+    def _wait_commit_message(self, future, cancel_token):
+        """等待并发生成的提交信息，取消时不再等待"""
+        while True:
+            if cancel_token is not None and cancel_token.cancelled:
+                return None
+            done, _ = wait([future], timeout=_POLL_INTERVAL)
+            if done:
+                break
+        try:
+            message = future.result()
+        except Exception:
+            return None
+        return None if message.startswith('error:') else message
+
+    def _refine_commit_message(self, diffs, results, cancel_token):
+        """结合逐文件审查结论重新生成提交信息，失败时返回 None"""
+        notes = review_notes(results)
+        if not notes:
+            return None
+        try:
+            message = self.ai_analyzer.generate_commit_message(diffs, cancel_token=cancel_token, review_notes=notes)
+        except AnalysisCancelled:
+            return None
+        return None if message.startswith('error:') else message
+
+
+def review_notes(results, limit=20):
+    """把审查结果整理为提交信息生成时参考的简短说明。
+
+    只列出严重问题和警告，最多 limit 条；没有值得说明的问题时返回空字符串。
+    """
+    lines = []
+    for result in results:
+        for finding in result.findings:
+            if finding.severity in ('severe', 'warning'):
+                lines.append(f"- {finding.file}: {SEVERITY_NAMES[finding.severity]} {finding.label}")
+    if len(lines) > limit:
+        lines = lines[:limit] + [f"- ... 等共 {len(lines)} 条"]
+    return '\n'.join(lines)
@@ -0,0 +1,308 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ..utils.metrics import metrics
+from ..utils.logger import Logger
+
+logger = Logger(__name__)
+
+"""团队共享的远程结果缓存。
+
+开发者本地、CI 和审查者会反复分析相同的文件内容。远程缓存是本地结果存储之后的第二层：
+结果按内容寻址，键由路径、变更前后的 blob 哈希、模型和提示版本计算，可部署在内网。
+
+HTTP 接口（JSON）：
+- GET  /v1/results/<key>      命中返回 200 和分析结果，未命中返回 404
+- PUT  /v1/results/<key>      写入分析结果，返回 204
+- POST /v1/results:batch      请求体 {"keys": [...]}，返回 {"results": {key: 分析结果}}，只包含命中的键
+配置了令牌时请求需携带 Authorization: Bearer <令牌>。
+"""
+
+# 分析提示的版本，修改 AIAnalyzer.analyze_changes 的提示时递增，使共享缓存中的旧结果失效
+PROMPT_VERSION = 1
+
+# 批量查询时每次请求的最大键数，500 个文件只需一次往返
+BATCH_SIZE = 1000
+
+# 单个结果的最大字节数，防止误写入过大的内容
+MAX_BODY_BYTES = 1024 * 1024
+
+_KEY_RE = re.compile(r'^[0-9a-f]{64}$')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    result TEXT NOT NULL
+);
+'''
+
+
+def remote_cache_key(file_path, base_hash, blob_hash, model, prompt_version=PROMPT_VERSION):
+    """计算远程缓存键，blob 哈希都为空（无法确定内容）时返回 None"""
+    if base_hash is None and blob_hash is None:
+        return None
+    digest = hashlib.sha256()
+    for part in (str(prompt_version), model, file_path, base_hash or '', blob_hash or ''):
+        digest.update(part.encode('utf-8', errors='replace'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class RemoteCacheStore:
+    """缓存服务端的 SQLite 存储"""
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+
+    def get_many(self, keys):
+        """返回 {key: 结果 JSON 文本}，只包含存在的键"""
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            # SQLite 默认最多 999 个参数
+            for start in range(0, len(keys), 900):
+                chunk = keys[start:start + 900]
+                rows = self._conn.execute(
+                    f"SELECT key, result FROM results WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put(self, key, result_text):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO results (key, created_at, result) VALUES (?, ?, ?)',
+                (key, time.time(), result_text)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _CacheHandler(BaseHTTPRequestHandler):
+    server_version = 'git-llm-cache/1'
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status, payload=None):
+        body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        if payload is not None:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        token = self.server.token
+        if not token or self.headers.get('Authorization') == f"Bearer {token}":
+            return True
+        self._send_json(401, {'error': 'unauthorized'})
+        return False
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {'error': 'body too large'})
+            return None
+        return self.rfile.read(length)
+
+    def _key(self):
+        prefix = '/v1/results/'
+        if not self.path.startswith(prefix):
+            return None
+        key = self.path[len(prefix):]
+        return key if _KEY_RE.match(key) else None
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        key = self._key()
+        if key is None:
+            self._send_json(404, {'error': 'not found'})
+            return
+        found = self.server.store.get_many([key])
+        if key not in found:
+            self._send_json(404, {'error': 'not found'})
+            return
+        body = found[key].encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        if not self._authorized():
+            return
+        key = self._key()
+        if key is None:
+            self._send_json(400, {'error': 'invalid key'})
+            return
+        body = self._read_body()
+        if body is None:
+            return
+        try:
+            result = json.loads(body.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            self._send_json(400, {'error': 'invalid json'})
+            return
+        if not isinstance(result, dict) or 'error' in result:
+            self._send_json(400, {'error': 'result must be a successful analysis object'})
+            return
+        self.server.store.put(key, json.dumps(result, ensure_ascii=False))
+        self._send_json(204)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path != '/v1/results:batch':
+            self._send_json(404, {'error': 'not found'})
+            return
+        body = self._read_body()
+        if body is None:
+            return
+        try:
+            keys = json.loads(body.decode('utf-8')).get('keys', [])
+        except (UnicodeDecodeError, json.JSONDecodeError, AttributeError):
+            self._send_json(400, {'error': 'invalid json'})
+            return
+        keys = [key for key in keys[:BATCH_SIZE] if isinstance(key, str) and _KEY_RE.match(key)]
+        found = self.server.store.get_many(keys)
+        self._send_json(200, {'results': {key: json.loads(text) for key, text in found.items()}})
+
+
+class RemoteCacheServer:
+    def __init__(self, db_path, host='127.0.0.1', port=8765, token=None):
+        """初始化缓存服务。
+
+        Args:
+            db_path (str): SQLite 数据库路径
+            host (str): 监听地址
+            port (int): 监听端口
+            token (str): 访问令牌，为空时不校验
+        """
+        self.store = RemoteCacheStore(db_path)
+        self._server = ThreadingHTTPServer((host, port), _CacheHandler)
+        self._server.daemon_threads = True
+        self._server.store = self.store
+        self._server.token = token
+
+    @property
+    def address(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        logger.info(f"远程结果缓存已启动: {self.address}，数据库: {self.store.db_path}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self.store.close()
+
+    def shutdown(self):
+        self._server.shutdown()
+
+
+class RemoteCacheClient:
+    def __init__(self, url, token=None, timeout=5.0, write=True):
+        """初始化缓存客户端。
+
+        缓存服务不可用时只记录一次警告并在本次进程中停用，分析照常进行。
+
+        Args:
+            url (str): 服务地址，例如 http://cache.internal:8765
+            token (str): 访问令牌
+            timeout (float): 单次请求超时（秒）
+            write (bool): 是否写回新的分析结果（例如只允许 CI 写入时，开发者设为 False）
+        """
+        self.url = url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+        self.write = write
+        self._disabled = False
+
+    @classmethod
+    def from_config(cls, config):
+        """按配置创建客户端，未配置 GIT_LLM_REMOTE_CACHE_URL 时返回 None"""
+        if not config.remote_cache_url:
+            return None
+        return cls(
+            config.remote_cache_url, config.remote_cache_token, config.remote_cache_timeout,
+            config.remote_cache_write
+        )
+
+    def _request(self, method, path, payload=None):
+        if self._disabled:
+            return None
+        data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.url + path, data=data, method=method)
+        if data is not None:
+            request.add_header('Content-Type', 'application/json; charset=utf-8')
+        if self.token:
+            request.add_header('Authorization', f"Bearer {self.token}")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+            # 代理或网关返回的错误页等非 JSON 响应与网络错误同样处理
+            result = json.loads(body.decode('utf-8')) if body else {}
+            if not isinstance(result, dict):
+                raise ValueError("响应不是 JSON 对象")
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                # 认证失败、服务端错误等通常会持续出现，不再逐个文件重试
+                logger.warning(f"远程结果缓存请求失败（HTTP {e.code}），本次不再使用")
+                metrics.increment('remote_cache.errors')
+                self._disabled = True
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"远程结果缓存不可用，本次不再使用: {str(e)}")
+            metrics.increment('remote_cache.errors')
+            self._disabled = True
+            return None
+        return result
+
+    def get(self, key):
+        """查询单个结果，未命中或失败时返回 None"""
+        return self._request('GET', f"/v1/results/{key}")
+
+    def get_many(self, keys):
+        """批量查询，每 BATCH_SIZE 个键一次往返。
+
+        Returns:
+            dict: {key: 分析结果}，只包含命中的键
+        """
+        keys = [key for key in dict.fromkeys(keys) if key]
+        found = {}
+        for start in range(0, len(keys), BATCH_SIZE):
+            response = self._request('POST', '/v1/results:batch', {'keys': keys[start:start + BATCH_SIZE]})
+            if response is None:
+                break
+            found.update(response.get('results', {}))
+        metrics.increment('remote_cache.hits', len(found))
+        metrics.increment('remote_cache.misses', len(keys) - len(found))
+        return found
+
+    def put(self, key, suggestions):
+        """写回成功的分析结果，失败的结果和只读客户端不写入"""
+        if not self.write or not key or 'error' in suggestions:
+            return
+        if self._request('PUT', f"/v1/results/{key}", suggestions) is not None:
+            metrics.increment('remote_cache.writes')
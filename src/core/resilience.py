@@ -0,0 +1,194 @@
+import time
+import queue
+import threading
+from collections import deque
+from ..utils.metrics import metrics
+from ..utils.logger import Logger
+
+logger = Logger(__name__)
+
+"""尾延迟对冲与熔断。
+
+- LatencyTracker: 最近请求耗时的滑动窗口，提供百分位数，作为对冲的触发阈值
+- hedged_call: 请求超过阈值仍未返回时发出一个重复请求，先成功返回的结果生效
+- CircuitBreaker: 接口错误率超过阈值时熔断，剩余请求立即失败，冷却后放行单个探测请求
+"""
+
+# 估算百分位数前需要的最少样本数
+MIN_LATENCY_SAMPLES = 10
+
+
+class CircuitOpenError(Exception):
+    """熔断期间拒绝发送请求时抛出"""
+
+
+class LatencyTracker:
+    """最近 window 个请求耗时的滑动窗口"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p):
+        """第 p 百分位（0~100）的耗时，样本不足时返回 None"""
+        with self._lock:
+            if len(self._samples) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(len(ordered) * p / 100)))
+        return ordered[index]
+
+
+def hedged_call(func, delay, hedge=None, name='git-llm-request', allow=None):
+    """执行 func，超过 delay 秒仍未返回时再并发执行一次，返回先成功的结果。
+
+    落后的请求不会被中断，在其自身超时或完成后结束，结果被丢弃。
+    两次都失败时抛出先发出的请求的异常。
+
+    Args:
+        func (callable): 无参数的请求函数
+        delay (float): 发出对冲请求前等待的秒数，None 表示不对冲
+        hedge (callable): 对冲请求函数，默认与 func 相同
+        name (str): 请求线程名前缀
+        allow (callable): 到达 delay 时调用，返回 False 则不发出对冲请求、继续等待 func
+            （例如限流额度不足时）
+
+    Returns:
+        tuple: (结果, 是否发出了对冲请求, 是否由对冲请求返回)
+    """
+    if delay is None:
+        return func(), False, False
+
+    outcomes = queue.Queue()
+
+    def run(is_hedge):
+        try:
+            outcomes.put((is_hedge, True, (hedge if is_hedge else func)()))
+        except BaseException as e:
+            outcomes.put((is_hedge, False, e))
+
+    hedge = hedge or func
+    threading.Thread(target=run, args=(False,), name=name, daemon=True).start()
+    try:
+        first = outcomes.get(timeout=delay)
+    except queue.Empty:
+        first = None
+    if first is not None:
+        # 对冲前已有结果时直接返回，失败交给调用方的重试逻辑
+        _, ok, value = first
+        if ok:
+            return value, False, False
+        raise value
+
+    if allow is not None and not allow():
+        metrics.increment('hedge.skipped')
+        _, ok, value = outcomes.get()
+        if ok:
+            return value, False, False
+        raise value
+
+    metrics.increment('hedge.fired')
+    threading.Thread(target=run, args=(True,), name=f"{name}-hedge", daemon=True).start()
+    errors = {}
+    for _ in range(2):
+        is_hedge, ok, value = outcomes.get()
+        if ok:
+            if is_hedge:
+                metrics.increment('hedge.won')
+            return value, True, is_hedge
+        errors[is_hedge] = value
+    raise errors[False]
+
+
+"""熔断器。
+
+状态：
+1. closed: 正常放行，记录最近 window 个请求的成败
+2. open: 错误率达到阈值后熔断，cooldown 秒内拒绝所有请求
+3. half_open: 冷却结束后只放行一个探测请求，成功则恢复，失败则重新熔断
+"""
+class CircuitBreaker:
+    def __init__(self, threshold=0.5, window=20, min_requests=5, cooldown=30.0):
+        """
+        Args:
+            threshold (float): 触发熔断的错误率（0~1），0 表示不熔断
+            window (int): 统计错误率的最近请求数
+            min_requests (int): 窗口内至少有这么多请求时才计算错误率
+            cooldown (float): 熔断后等待多少秒再探测
+        """
+        self.threshold = threshold
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def retry_in(self):
+        """距离下一次探测的秒数"""
+        with self._lock:
+            return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def allow(self):
+        """是否放行一个请求；半开状态下同一时刻只放行一个探测请求"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    metrics.increment('circuit.rejected')
+                    return False
+                self.state = 'half_open'
+                self._probing = False
+            # 探测请求以不计成败的方式结束（如被限流、取消）时，冷却时间后再放行一个
+            if self._probing and time.monotonic() - self._probe_started < self.cooldown:
+                metrics.increment('circuit.rejected')
+                return False
+            self._probing = True
+            self._probe_started = time.monotonic()
+            metrics.increment('circuit.probes')
+            return True
+
+    def record_success(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state == 'half_open':
+                logger.info("探测请求成功，熔断恢复")
+                self.state = 'closed'
+                self._probing = False
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state == 'half_open':
+                self._open()
+                return
+            if self.state == 'open':
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_requests and failures / len(self._outcomes) >= self.threshold:
+                self._open()
+
+    def _open(self):
+        self.state = 'open'
+        self._opened_at = time.monotonic()
+        self._probing = False
+        metrics.increment('circuit.opened')
+        logger.warning(f"接口错误率过高，熔断 {self.cooldown:.0f} 秒，期间剩余请求立即失败")
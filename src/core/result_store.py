@@ -0,0 +1,349 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from .classifier import iter_findings
+from .similar import best_match, pack_signature, signature_bands, unpack_signature
+from ..utils.logger import Logger
+
+logger = Logger(__name__)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    repo TEXT NOT NULL,
+    commit_sha TEXT,
+    model TEXT NOT NULL,
+    mode TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    path TEXT NOT NULL,
+    base_hash TEXT,
+    blob_hash TEXT,
+    model TEXT NOT NULL,
+    commit_sha TEXT,
+    created_at REAL NOT NULL,
+    failed INTEGER NOT NULL DEFAULT 0,
+    reused INTEGER NOT NULL DEFAULT 0,
+    result TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    path TEXT NOT NULL,
+    commit_sha TEXT,
+    created_at REAL NOT NULL,
+    severity TEXT NOT NULL,
+    issue_type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS hunk_groups (
+    group_key TEXT NOT NULL,
+    model TEXT NOT NULL,
+    members TEXT NOT NULL,
+    path TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (group_key, model)
+);
+
+CREATE TABLE IF NOT EXISTS hunk_members (
+    fingerprint TEXT NOT NULL,
+    model TEXT NOT NULL,
+    group_key TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS similar_diffs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model TEXT NOT NULL,
+    path TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    signature BLOB NOT NULL,
+    literals TEXT NOT NULL,
+    result TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS similar_diff_bands (
+    band INTEGER NOT NULL,
+    key BLOB NOT NULL,
+    similar_id INTEGER NOT NULL REFERENCES similar_diffs(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_hunk_members ON hunk_members(fingerprint, model);
+CREATE INDEX IF NOT EXISTS idx_similar_diff_bands ON similar_diff_bands(band, key);
+CREATE INDEX IF NOT EXISTS idx_files_lookup ON files(path, blob_hash, model);
+CREATE INDEX IF NOT EXISTS idx_findings_path ON findings(path);
+CREATE INDEX IF NOT EXISTS idx_findings_severity ON findings(severity, issue_type, path, created_at);
+CREATE INDEX IF NOT EXISTS idx_findings_commit ON findings(commit_sha);
+CREATE INDEX IF NOT EXISTS idx_findings_created ON findings(created_at);
+'''
+
+"""基于 SQLite 的分析结果存储。
+
+此类持久化保存每次分析的运行记录、文件结果和分类后的问题，提供：
+1. 按文件路径与 blob 哈希查找历史结果，未变化的文件无需重新分析
+2. 按差异块指纹查找历史结果，文件局部修改时同一次请求分析过的差异块都未变化时无需重新分析
+3. 按差异的 MinHash 签名通过 LSH 分桶查找近似重复差异的历史结果（挑选到其他分支、变基后的修改）
+4. 按路径、严重程度、类型、提交和时间范围查询问题
+"""
+class ResultStore:
+    def __init__(self, db_path):
+        """打开（必要时创建）结果数据库。
+
+        Args:
+            db_path (str): 数据库文件路径
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(files)')}
+        if 'reused' not in columns:
+            # 旧版本创建的数据库
+            self._conn.execute('ALTER TABLE files ADD COLUMN reused INTEGER NOT NULL DEFAULT 0')
+        logger.debug(f"已打开结果数据库: {db_path}")
+
+    @classmethod
+    def for_repo(cls, git_assistant):
+        """打开指定仓库对应的结果数据库。
+
+        默认存放在仓库的 .git/git-llm/results.db，可通过 GIT_LLM_RESULT_STORE 覆盖。
+        """
+        db_path = git_assistant.config.result_store_path
+        if not db_path:
+            db_path = os.path.join(git_assistant.repo.git_dir, 'git-llm', 'results.db')
+        return cls(db_path)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def start_run(self, repo, commit_sha, model, mode='worktree'):
+        """记录一次新的分析运行。
+
+        Args:
+            repo (str): 仓库路径
+            commit_sha (str): 分析时的 HEAD 提交，或历史模式下的范围
+            model (str): 使用的模型
+            mode (str): 运行模式，worktree 或 history
+
+        Returns:
+            int: 运行 ID
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO runs (started_at, repo, commit_sha, model, mode) VALUES (?, ?, ?, ?, ?)',
+                (time.time(), repo, commit_sha, model, mode)
+            )
+            return cursor.lastrowid
+
+    def record(self, run_id, file_path, suggestions, model, base_hash=None, blob_hash=None, commit_sha=None,
+               reused=False):
+        """保存单个文件的分析结果及其分类后的问题。
+
+        Args:
+            run_id (int): 运行 ID
+            file_path (str): 文件路径
+            suggestions (dict): AIAnalyzer 返回的分析结果
+            model (str): 使用的模型
+            base_hash (str): 变更前的 blob 哈希
+            blob_hash (str): 变更后的 blob 哈希
+            commit_sha (str): 所属提交
+            reused (bool): 结果复用自内容相同的历史记录；只记录该运行包含此文件，
+                问题已随原记录保存，不再重复写入
+        """
+        now = time.time()
+        failed = 1 if 'error' in suggestions else 0
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO files (run_id, path, base_hash, blob_hash, model, commit_sha, created_at, failed, reused, '
+                'result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (run_id, file_path, base_hash, blob_hash, model, commit_sha, now, failed, int(reused),
+                 json.dumps(suggestions, ensure_ascii=False))
+            )
+            file_id = cursor.lastrowid
+            if not failed and not reused:
+                self._conn.executemany(
+                    'INSERT INTO findings (file_id, run_id, path, commit_sha, created_at, severity, issue_type, category, message) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [
+                        (file_id, run_id, file_path, commit_sha, now, severity, issue_type, category, item)
+                        for category, severity, issue_type, item in iter_findings(suggestions)
+                    ]
+                )
+
+    def lookup(self, file_path, base_hash, blob_hash, model):
+        """查找文件在相同内容下的最近一次成功分析结果。
+
+        Returns:
+            dict: 分析结果，未找到时返回 None
+        """
+        if base_hash is None and blob_hash is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT result FROM files WHERE path = ? AND blob_hash IS ? AND base_hash IS ? AND model = ? '
+                'AND failed = 0 ORDER BY id DESC LIMIT 1',
+                (file_path, blob_hash, base_hash, model)
+            ).fetchone()
+        return json.loads(row['result']) if row else None
+
+    def record_hunk_group(self, fingerprints, file_path, suggestions, model):
+        """保存同一次请求分析的一组差异块的结果，失败的结果不保存。
+
+        结果覆盖整组差异块，之后只有组内差异块全部未变化时才能复用。
+
+        Args:
+            fingerprints (list): 差异块指纹
+            file_path (str): 文件路径
+            suggestions (dict): 分析结果
+            model (str): 使用的模型
+        """
+        if 'error' in suggestions or not fingerprints:
+            return
+        members = sorted(set(fingerprints))
+        group_key = hashlib.sha256(','.join(members).encode('utf-8')).hexdigest()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO hunk_groups (group_key, model, members, path, created_at, result) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (group_key, model, ','.join(members), file_path, time.time(),
+                 json.dumps(suggestions, ensure_ascii=False))
+            )
+            if cursor.rowcount:
+                self._conn.executemany(
+                    'INSERT INTO hunk_members (fingerprint, model, group_key) VALUES (?, ?, ?)',
+                    [(fingerprint, model, group_key) for fingerprint in members]
+                )
+
+    def lookup_hunk_groups(self, fingerprints, model):
+        """查找组内差异块全部包含在 fingerprints 中的历史结果。
+
+        多个组覆盖同一差异块时优先使用最近的组，返回的各组互不重叠。
+
+        Returns:
+            list: [(组内差异块指纹集合, 分析结果), ...]
+        """
+        current = set(fingerprints)
+        if not current:
+            return []
+        placeholders = ','.join('?' * len(current))
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT DISTINCT g.members, g.result, g.created_at FROM hunk_members m '
+                f'JOIN hunk_groups g ON g.group_key = m.group_key AND g.model = m.model '
+                f'WHERE m.model = ? AND m.fingerprint IN ({placeholders}) ORDER BY g.created_at DESC',
+                [model, *current]
+            ).fetchall()
+        covered = set()
+        groups = []
+        for row in rows:
+            members = set(row['members'].split(','))
+            if members <= current and not members & covered:
+                covered |= members
+                groups.append((members, json.loads(row['result'])))
+        return groups
+
+    def record_similar(self, file_path, sig, literals, suggestions, model):
+        """保存差异签名、运算符和数字字面量摘要与分析结果，失败的结果和复用得到的结果不保存"""
+        if 'error' in suggestions or 'reused' in suggestions:
+            return
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO similar_diffs (model, path, created_at, signature, literals, result) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (model, file_path, time.time(), pack_signature(sig), literals,
+                 json.dumps(suggestions, ensure_ascii=False))
+            )
+            self._conn.executemany(
+                'INSERT INTO similar_diff_bands (band, key, similar_id) VALUES (?, ?, ?)',
+                [(band, key, cursor.lastrowid) for band, key in signature_bands(sig)]
+            )
+
+    def lookup_similar(self, sig, literals, model, threshold, max_candidates=200):
+        """查找差异签名相似度不低于阈值、运算符和数字字面量摘要相同的最近历史结果。
+
+        先按 LSH 分桶取候选（任一分桶相同），再按签名估计的相似度筛选。
+
+        Returns:
+            tuple: (分析结果, 来源文件路径, 相似度)，未找到时返回 None
+        """
+        bands = signature_bands(sig)
+        where = ' OR '.join(['(b.band = ? AND b.key = ?)'] * len(bands))
+        params = [value for band in bands for value in band]
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT DISTINCT s.id, s.path, s.signature FROM similar_diff_bands b '
+                f'JOIN similar_diffs s ON s.id = b.similar_id '
+                f'WHERE ({where}) AND s.model = ? AND s.literals = ? ORDER BY s.id DESC LIMIT ?',
+                params + [model, literals, max_candidates]
+            ).fetchall()
+            paths = {row['id']: row['path'] for row in rows}
+            match = best_match(sig, [(row['id'], unpack_signature(row['signature'])) for row in rows], threshold)
+            if match is None:
+                return None
+            row = self._conn.execute('SELECT result FROM similar_diffs WHERE id = ?', (match[0],)).fetchone()
+        return json.loads(row['result']), paths[match[0]], match[1]
+
+    def query_findings(self, severity=None, issue_type=None, path_prefix=None, commit_sha=None,
+                       since_days=None, limit=1000):
+        """查询历史问题。
+
+        例如查询最近 30 天 src/auth 下的严重安全问题::
+
+            store.query_findings(severity='severe', issue_type='security',
+                                 path_prefix='src/auth', since_days=30)
+
+        Args:
+            severity (str): 严重程度，severe / warning / suggestion
+            issue_type (str): 问题类型，security / standard
+            path_prefix (str): 目录或文件路径
+            commit_sha (str): 所属提交
+            since_days (float): 只返回最近若干天内的问题
+            limit (int): 最大返回条数
+
+        Returns:
+            list: 问题字典列表，按时间倒序
+        """
+        clauses = []
+        params = []
+        if severity:
+            clauses.append('severity = ?')
+            params.append(severity)
+        if issue_type:
+            clauses.append('issue_type = ?')
+            params.append(issue_type)
+        if path_prefix:
+            # 使用范围条件代替 LIKE，以便命中路径索引
+            path_prefix = path_prefix.rstrip('/')
+            clauses.append('(path = ? OR (path >= ? AND path < ?))')
+            params.extend([path_prefix, path_prefix + '/', path_prefix + chr(ord('/') + 1)])
+        if commit_sha:
+            clauses.append('commit_sha = ?')
+            params.append(commit_sha)
+        if since_days is not None:
+            clauses.append('created_at >= ?')
+            params.append(time.time() - since_days * 86400)
+
+        sql = 'SELECT path, commit_sha, created_at, severity, issue_type, category, message FROM findings'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(limit)
+
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
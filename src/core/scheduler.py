@@ -0,0 +1,165 @@
+import time
+import heapq
+import itertools
+import threading
+from .cancellation import AnalysisCancelled
+from ..utils.metrics import metrics
+from ..utils.logger import Logger
+
+logger = Logger(__name__)
+
+# 优先级通道：数值越小越先执行
+PRIORITY_INTERACTIVE = 0  # 提交信息等用户正在等待的请求
+PRIORITY_NORMAL = 1       # 工作区的逐文件分析
+PRIORITY_BACKGROUND = 2   # 历史审查等后台任务
+
+_LANE_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_NORMAL: 'normal', PRIORITY_BACKGROUND: 'background'}
+
+# 等待期间检查取消状态的最长间隔（秒）
+_MAX_WAIT = 0.5
+
+
+class TokenBucket:
+    """令牌桶：容量为每分钟限额，按秒匀速补充"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount, now):
+        """距离可以消耗 amount 个令牌还需等待的秒数"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount):
+        """按实际用量修正（正数为补扣，负数为返还）"""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+"""请求调度器，在每次调用 OpenAI 之前按 RPM/TPM 限额放行请求。
+
+此类提供：
+1. 每分钟请求数（RPM）和每分钟 token 数（TPM）两个令牌桶
+2. 优先级通道：提交信息等交互请求优先于后台分析
+3. 收到限流响应时整体暂停，避免连续触发限流
+4. 排队等待时间统计
+"""
+class RequestScheduler:
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        """初始化调度器。
+
+        Args:
+            requests_per_minute (int): 每分钟请求数上限，0 表示不限制
+            tokens_per_minute (int): 每分钟 token 数上限，0 表示不限制
+        """
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._condition = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+
+    def acquire(self, estimated_tokens, priority=PRIORITY_NORMAL, cancel_token=None):
+        """等待直到请求可以发送。
+
+        Args:
+            estimated_tokens (int): 本次请求预估的 token 数（提示词 + 预期输出）
+            priority (int): 优先级通道
+            cancel_token (CancelToken): 取消令牌
+
+        Returns:
+            float: 排队等待的秒数
+
+        Raises:
+            AnalysisCancelled: 等待期间运行被取消
+        """
+        started = time.monotonic()
+        ticket = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    if cancel_token is not None and cancel_token.cancelled:
+                        raise AnalysisCancelled(cancel_token.reason)
+                    now = time.monotonic()
+                    delay = None
+                    if self._queue[0] == ticket:
+                        delay = self._delay(estimated_tokens, now)
+                        if delay <= 0:
+                            if self.request_bucket is not None:
+                                self.request_bucket.consume(1, now)
+                            if self.token_bucket is not None:
+                                self.token_bucket.consume(estimated_tokens, now)
+                            break
+                    self._condition.wait(min(delay, _MAX_WAIT) if delay is not None else _MAX_WAIT)
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+
+        waited = time.monotonic() - started
+        lane = _LANE_NAMES.get(priority, str(priority))
+        metrics.observe(f'scheduler.queue_wait.{lane}', waited)
+        if waited >= 1:
+            logger.info(f"请求在 {lane} 通道排队 {waited:.1f} 秒")
+        return waited
+
+    def try_acquire(self, estimated_tokens, priority=PRIORITY_NORMAL):
+        """不等待地尝试放行请求，用于对冲等可以放弃的请求。
+
+        有同级或更高优先级的请求在排队、处于限流暂停或令牌不足时不放行。
+
+        Args:
+            estimated_tokens (int): 本次请求预估的 token 数
+            priority (int): 优先级通道
+
+        Returns:
+            bool: 是否已放行（已占用限流额度）
+        """
+        with self._condition:
+            if any(ticket[0] <= priority for ticket in self._queue):
+                return False
+            now = time.monotonic()
+            if self._delay(estimated_tokens, now) > 0:
+                return False
+            if self.request_bucket is not None:
+                self.request_bucket.consume(1, now)
+            if self.token_bucket is not None:
+                self.token_bucket.consume(estimated_tokens, now)
+            return True
+
+    def _delay(self, estimated_tokens, now):
+        delay = max(0.0, self._paused_until - now)
+        if self.request_bucket is not None:
+            delay = max(delay, self.request_bucket.time_until(1, now))
+        if self.token_bucket is not None:
+            delay = max(delay, self.token_bucket.time_until(estimated_tokens, now))
+        return delay
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """用实际 token 用量修正预估值"""
+        if self.token_bucket is None or actual_tokens is None:
+            return
+        with self._condition:
+            self.token_bucket.adjust(actual_tokens - estimated_tokens)
+            self._condition.notify_all()
+
+    def pause(self, seconds):
+        """收到限流响应后暂停所有通道"""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        metrics.increment('scheduler.rate_limited')
+        logger.warning(f"触发限流，暂停发送请求 {seconds:.1f} 秒")
@@ -0,0 +1,174 @@
+import re
+import bisect
+import fnmatch
+from .findings import SEVERITY_ORDER, ISSUE_TYPE_ORDER
+
+"""分析结果的倒排索引。
+
+随结果到达逐文件建立索引，按关键字、严重程度、问题类型和路径通配符筛选文件，
+每次查询只访问命中的倒排表，数万条问题时也能在输入过程中即时更新列表：
+- 关键字: 英文和数字按词切分，支持前缀匹配（输入 "pass" 即可匹配 "password"）；
+  中文按单字和相邻两字建立索引，多字关键字按两字片段求交集。多个关键字之间为"且"
+- 严重程度 / 类型: 文件中存在对应严重程度（和类型）的问题
+- 路径: fnmatch 通配符，不区分大小写；不含通配符时按子串匹配
+文件路径本身也参与关键字索引。
+"""
+
+_WORD_RE = re.compile(r'[a-z0-9_]+')
+_CJK_RE = re.compile(r'[㐀-鿿]+')
+
+
+def _keyword_terms(text):
+    """把关键字切分为查询词：(英文词列表, 中文片段列表)"""
+    text = text.lower()
+    words = _WORD_RE.findall(text)
+    pieces = []
+    for run in _CJK_RE.findall(text):
+        if len(run) == 1:
+            pieces.append(run)
+        else:
+            pieces.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return words, pieces
+
+
+def _index_tokens(text):
+    """文本在索引中的词：英文词、中文单字和两字片段"""
+    text = text.lower()
+    tokens = set(_WORD_RE.findall(text))
+    for run in _CJK_RE.findall(text):
+        tokens.update(run)
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class FilterQuery:
+    """一次筛选条件，空条件匹配全部文件"""
+
+    __slots__ = ('keyword', 'severity', 'issue_type', 'path')
+
+    def __init__(self, keyword='', severity=None, issue_type=None, path=''):
+        self.keyword = keyword.strip()
+        self.severity = severity
+        self.issue_type = issue_type
+        self.path = path.strip()
+
+    @property
+    def empty(self):
+        return not (self.keyword or self.severity or self.issue_type or self.path)
+
+
+class FindingIndex:
+    def __init__(self):
+        self._postings = {}      # 词 -> {文件}
+        self._vocabulary = []    # 排序后的英文词，用于前缀查找
+        self._facets = {}        # (严重程度, 类型) -> {文件}
+        self._documents = {}     # 文件 -> (词集合, (严重程度, 类型)集合)
+        self._order = {}         # 文件 -> 加入顺序
+
+    def __len__(self):
+        return len(self._documents)
+
+    def update(self, file_path, labels=(), facets=()):
+        """加入或重建一个文件的索引。
+
+        Args:
+            file_path (str): 文件路径
+            labels (iterable): 该文件问题的展示文本
+            facets (iterable): 该文件问题的 (严重程度, 类型)
+        """
+        self.remove(file_path)
+        tokens = _index_tokens(file_path)
+        for label in labels:
+            tokens |= _index_tokens(label)
+        facets = set(facets)
+        for token in tokens:
+            files = self._postings.get(token)
+            if files is None:
+                files = self._postings[token] = set()
+                if _WORD_RE.fullmatch(token):
+                    bisect.insort(self._vocabulary, token)
+            files.add(file_path)
+        for facet in facets:
+            self._facets.setdefault(facet, set()).add(file_path)
+        self._documents[file_path] = (tokens, facets)
+        self._order.setdefault(file_path, len(self._order))
+
+    def remove(self, file_path):
+        document = self._documents.pop(file_path, None)
+        if document is None:
+            return
+        tokens, facets = document
+        for token in tokens:
+            self._postings[token].discard(file_path)
+        for facet in facets:
+            self._facets[facet].discard(file_path)
+
+    def _word_files(self, word):
+        """以 word 为前缀的所有英文词的文件并集"""
+        start = bisect.bisect_left(self._vocabulary, word)
+        files = set()
+        for token in self._vocabulary[start:]:
+            if not token.startswith(word):
+                break
+            files |= self._postings[token]
+        return files
+
+    def _facet_files(self, severity, issue_type):
+        files = set()
+        for facet_severity in ([severity] if severity else SEVERITY_ORDER):
+            for facet_type in ([issue_type] if issue_type else ISSUE_TYPE_ORDER):
+                files |= self._facets.get((facet_severity, facet_type), set())
+        return files
+
+    def search(self, query):
+        """返回匹配的文件列表，按加入索引的顺序排列"""
+        candidates = None
+        if query.keyword:
+            words, pieces = _keyword_terms(query.keyword)
+            # 先用最小的倒排表缩小范围
+            postings = sorted(
+                [self._postings.get(piece, set()) for piece in pieces] + [self._word_files(word) for word in words],
+                key=len
+            )
+            for files in postings:
+                candidates = set(files) if candidates is None else candidates & files
+                if not candidates:
+                    return []
+        if query.severity or query.issue_type:
+            files = self._facet_files(query.severity, query.issue_type)
+            candidates = files if candidates is None else candidates & files
+        if candidates is None:
+            candidates = self._documents.keys()
+        if query.path:
+            match = _path_matcher(query.path)
+            candidates = [file_path for file_path in candidates if match(file_path)]
+        return sorted(candidates, key=self._order.__getitem__)
+
+    def matches(self, file_path, query):
+        """单个文件是否满足条件，用于结果到达时判断是否显示"""
+        document = self._documents.get(file_path)
+        if document is None:
+            return False
+        tokens, facets = document
+        if query.keyword:
+            words, pieces = _keyword_terms(query.keyword)
+            if any(piece not in tokens for piece in pieces):
+                return False
+            if any(not any(token.startswith(word) for token in tokens) for word in words):
+                return False
+        if query.severity or query.issue_type:
+            if not any(
+                (not query.severity or severity == query.severity)
+                and (not query.issue_type or issue_type == query.issue_type)
+                for severity, issue_type in facets
+            ):
+                return False
+        return not query.path or _path_matcher(query.path)(file_path)
+
+
+def _path_matcher(pattern):
+    pattern = pattern.lower()
+    if not any(char in pattern for char in '*?['):
+        return lambda file_path: pattern in file_path.lower()
+    regex = re.compile(fnmatch.translate(pattern))
+    return lambda file_path: regex.match(file_path.lower()) is not None
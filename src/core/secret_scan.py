@@ -0,0 +1,195 @@
+import re
+import math
+from collections import Counter
+from .findings import Finding
+from ..utils.logger import Logger
+
+logger = Logger(__name__)
+
+"""本地密钥与凭证扫描。
+
+只扫描差异中新增的行（未跟踪的新文件扫描全部内容），不经过网络，随差异读取后立即给出结果：
+- 规则: 已编译的正则，匹配常见云服务密钥、私钥、访问令牌和带密码的连接串
+- 熵检查: 赋值给 secret / token / password 等名称的长字符串，香农熵达到阈值时视为疑似凭证
+规则可以通过 register_secret_pattern() 在代码中注册，或在 GIT_LLM_SECRET_PATTERNS_FILE 指定的文件中
+逐行配置 "名称: 正则"。包含 "git-llm: allow-secret" 的行不会报告。
+"""
+
+# 行内豁免标记
+ALLOW_MARKER = 'git-llm: allow-secret'
+
+# 规则: (名称, 正则)
+DEFAULT_SECRET_PATTERNS = [
+    ('AWS 访问密钥', r'\b(?:AKIA|ASIA)[0-9A-Z]{16}\b'),
+    ('私钥', r'-----BEGIN (?:RSA |EC |DSA |OPENSSH |PGP |ENCRYPTED )?PRIVATE KEY(?: BLOCK)?-----'),
+    ('GitHub 令牌', r'\b(?:gh[pousr]_[A-Za-z0-9]{36,}|github_pat_[A-Za-z0-9_]{22,})'),
+    ('GitLab 令牌', r'\bglpat-[A-Za-z0-9_-]{20,}'),
+    ('Slack 令牌', r'\bxox[abposr]-[A-Za-z0-9-]{10,}'),
+    ('Google API 密钥', r'\bAIza[0-9A-Za-z_-]{35}\b'),
+    ('Stripe 密钥', r'\b[rs]k_live_[0-9A-Za-z]{24,}'),
+    ('API 密钥', r'\bsk-(?:proj-|ant-)?[A-Za-z0-9_-]{32,}'),
+    ('JWT', r'\beyJ[A-Za-z0-9_-]{10,}\.eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}'),
+    ('连接串中的密码', r'\b[a-z][a-z0-9+.-]*://[^\s:/@]+:[^\s:/@]{3,}@[^\s/]+'),
+]
+
+# 熵检查的候选：赋值给敏感名称的字符串
+_ASSIGNMENT_RE = re.compile(
+    r'(?i)(?:secret|token|passw(?:or)?d|pwd|api[_-]?key|access[_-]?key|private[_-]?key|credential|auth)'
+    r'[\w.-]*["\']?\s*[:=]\s*["\']([A-Za-z0-9+/=_.~-]{16,})["\']'
+)
+_HEX_RE = re.compile(r'[0-9a-fA-F]+')
+
+# get_file_diff 对未跟踪文件返回的内容头
+NEW_FILE_HEADER = 'New file: '
+
+# 差异块头中新文件的起始行号
+_HUNK_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)')
+
+# 通过 register_secret_pattern() 注册的规则
+_registered_patterns = []
+
+
+def register_secret_pattern(name, pattern):
+    """注册一条额外的扫描规则，之后创建的扫描器都会使用。
+
+    Args:
+        name (str): 规则名称，显示在问题描述中
+        pattern (str): 正则表达式
+    """
+    re.compile(pattern)
+    _registered_patterns.append((name, pattern))
+
+
+def load_pattern_file(path):
+    """读取规则文件，每行 "名称: 正则"，忽略空行和 # 开头的注释。
+
+    Returns:
+        list: [(名称, 正则), ...]，无效的行记录警告后跳过
+    """
+    patterns = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            name, sep, pattern = line.partition(':')
+            try:
+                if not sep or not name.strip():
+                    raise re.error('缺少 "名称:" 前缀')
+                re.compile(pattern.strip())
+            except re.error as e:
+                logger.warning(f"忽略无效的密钥扫描规则 {path}:{number}: {e}")
+                continue
+            patterns.append((name.strip(), pattern.strip()))
+    return patterns
+
+
+def shannon_entropy(text):
+    """每个字符的香农熵（比特）"""
+    if not text:
+        return 0.0
+    length = len(text)
+    return -sum(count / length * math.log2(count / length) for count in Counter(text).values())
+
+
+def _mask(secret):
+    """只保留开头几个字符，问题描述和导出结果中不出现完整的密钥"""
+    return secret[:4] + '…' if len(secret) > 8 else '…'
+
+
+class SecretScanner:
+    def __init__(self, patterns=None, entropy_threshold=4.5):
+        """
+        Args:
+            patterns (list): [(名称, 正则), ...]，默认使用内置规则和已注册的规则
+            entropy_threshold (float): 熵检查的阈值（比特/字符，按 base64 字符集计），0 表示关闭熵检查；
+                十六进制字符串按字符集大小等比例降低阈值
+        """
+        if patterns is None:
+            patterns = DEFAULT_SECRET_PATTERNS + _registered_patterns
+        self._patterns = [(name, re.compile(pattern)) for name, pattern in patterns]
+        self.entropy_threshold = entropy_threshold
+
+    @classmethod
+    def from_config(cls, config):
+        """根据配置创建扫描器，关闭扫描时返回 None"""
+        if not config.secret_scan:
+            return None
+        patterns = DEFAULT_SECRET_PATTERNS + _registered_patterns
+        if config.secret_patterns_file:
+            try:
+                patterns = patterns + load_pattern_file(config.secret_patterns_file)
+            except OSError as e:
+                logger.warning(f"无法读取密钥扫描规则文件: {e}")
+        return cls(patterns, config.secret_entropy)
+
+    def _high_entropy(self, value):
+        if self.entropy_threshold <= 0:
+            return False
+        threshold = self.entropy_threshold
+        if _HEX_RE.fullmatch(value):
+            threshold *= math.log2(16) / math.log2(64)
+        return shannon_entropy(value) >= threshold
+
+    def scan_line(self, line):
+        """扫描一行文本。
+
+        Returns:
+            list: [(规则名称, 匹配的文本), ...]
+        """
+        if ALLOW_MARKER in line:
+            return []
+        hits = []
+        for name, regex in self._patterns:
+            for match in regex.finditer(line):
+                hits.append((name, match.group(0)))
+        if not hits:
+            for match in _ASSIGNMENT_RE.finditer(line):
+                value = match.group(1)
+                if self._high_entropy(value):
+                    hits.append(('高熵凭证', value))
+        return hits
+
+    def scan(self, file_path, diff_text):
+        """扫描差异中新增的行。
+
+        Args:
+            file_path (str): 文件路径
+            diff_text (str): 统一差异格式的文本，或 get_file_diff 对未跟踪文件返回的 "New file: 路径" 加文件内容
+
+        Returns:
+            tuple: 严重的安全问题 (Finding, ...)，同一文件中相同的密钥只报告一次
+        """
+        findings = []
+        seen = set()
+        line_number = None
+        lines = diff_text.splitlines()
+        # 未跟踪的新文件没有差异格式，"New file:" 头之后的每一行都是新增内容
+        new_file = bool(lines) and lines[0].startswith(NEW_FILE_HEADER)
+        if new_file:
+            lines = lines[1:]
+            line_number = 1
+        for line in lines:
+            if new_file:
+                added = line
+            else:
+                header = _HUNK_RE.match(line)
+                if header:
+                    line_number = int(header.group(1))
+                    continue
+                if line.startswith('+++'):
+                    continue
+                added = line[1:] if line.startswith('+') else None
+            if added is not None:
+                for name, secret in self.scan_line(added):
+                    if secret in seen:
+                        continue
+                    seen.add(secret)
+                    location = f"第 {line_number} 行" if line_number is not None else "新增内容"
+                    findings.append(Finding(
+                        file_path, 'severe', 'security',
+                        f"疑似凭证泄露：{location}包含{name}（{_mask(secret)}），请移除并轮换该凭证"
+                    ))
+            if line_number is not None and (new_file or not line.startswith(('-', '\\'))):
+                line_number += 1
+        return tuple(findings)
@@ -0,0 +1,179 @@
+"""近似重复差异的识别。
+
+精确缓存（按 blob 哈希或差异块指纹）无法命中常见的重复：同一修复被挑选到多个发布分支、
+变基后行号移动并带有少量改动等。此模块把差异归一化后计算 MinHash 签名，
+结果存储通过 LSH 分桶查找相似度不低于阈值、且运算符和数字字面量完全相同的历史分析结果并直接复用。
+"""
+import os
+import re
+import hashlib
+import struct
+from ..utils.minhash import NUM_PERM, band_keys, cluster, shingles, signature, similarity
+
+# 字符 n-gram 长度；代码文本的字符种类少，过短的 n-gram 会让不相关的差异也很相似
+SHINGLE_SIZE = 5
+
+# 归一化后少于该长度的差异不参与相似复用，单行改动各自分析的代价很低
+MIN_NORMALIZED_LENGTH = 40
+
+# 参与签名计算的最大字符数，超长差异只取前面部分
+MAX_SIGNATURE_CHARS = 20000
+
+_PACK = struct.Struct(f'<{NUM_PERM}H')
+_WHITESPACE_RE = re.compile(r'\s+')
+_LITERAL_RE = re.compile(r'(?<![A-Za-z0-9_])\d+(?:\.\d+)?|[^\sA-Za-z0-9_]+')
+
+
+def normalize_diff(diff_text):
+    """只保留增删行的内容并去掉空白，文件头和差异块头（行号）不参与比较。
+
+    运算符、数字字面量和大小写保留原样，"==" 改为 "!="、2048 改为 512 之类的修改不会被视为相同。
+    增加与删除分别带有不同前缀，"删除 X" 与 "增加 X" 不会被视为相同。
+    """
+    parts = []
+    for line in diff_text.splitlines():
+        if line.startswith(('+++', '---')) or line[:1] not in ('+', '-'):
+            continue
+        content = _WHITESPACE_RE.sub('', line[1:])
+        if content:
+            parts.append(('p' if line[0] == '+' else 'm') + content)
+    return ' '.join(parts)[:MAX_SIGNATURE_CHARS]
+
+
+def diff_signature(diff_text):
+    """计算差异的 MinHash 签名，差异过小时返回 None"""
+    normalized = normalize_diff(diff_text)
+    if len(normalized) < MIN_NORMALIZED_LENGTH:
+        return None
+    return signature(shingles(normalized, SHINGLE_SIZE))
+
+
+def diff_literals(diff_text):
+    """增删行中运算符和数字字面量序列的摘要。
+
+    MinHash 相似度只反映整体重合程度，长差异中只改了一个运算符或数字时仍然很高；
+    相似复用额外要求两者的摘要相同。
+    """
+    digest = hashlib.sha1()
+    for line in diff_text[:MAX_SIGNATURE_CHARS].splitlines():
+        if line.startswith(('+++', '---')) or line[:1] not in ('+', '-'):
+            continue
+        digest.update((line[0] + ' '.join(_LITERAL_RE.findall(line[1:])) + '\n').encode('utf-8'))
+    return digest.hexdigest()
+
+
+def pack_signature(sig):
+    return _PACK.pack(*sig)
+
+
+def unpack_signature(data):
+    return _PACK.unpack(data)
+
+
+def signature_bands(sig):
+    """LSH 分桶：[(分桶序号, 分桶键字节), ...]"""
+    return [(band, struct.pack(f'<{len(values)}H', *values)) for band, values in band_keys(sig)]
+
+
+def best_match(sig, candidates, threshold):
+    """从候选 [(标识, 签名), ...] 中选出相似度最高且不低于阈值的一个。
+
+    Returns:
+        tuple: (标识, 相似度)，没有满足阈值的候选时返回 None
+    """
+    best = None
+    for key, candidate in candidates:
+        score = similarity(sig, candidate)
+        if score >= threshold and (best is None or score > best[1]):
+            best = (key, score)
+    return best
+
+
+"""本次运行内机械相似差异的聚类。
+
+批量重命名、导入改写和代码改写工具（codemod）会产生大量几乎相同的差异。
+聚类前把差异中的增删行切分为词法单元并归一化：
+- 数字统一为 0，差异块头（行号）不参与比较
+- 与文件路径的组成部分（目录名、不带扩展名的文件名）相同的标识符替换为同一个占位符
+- 在增删两侧都出现的标识符是各文件自己的上下文（局部变量名等），按首次出现的顺序重命名为 v0, v1, ...；
+  只出现在一侧的标识符是这次修改本身（旧名称和新名称），保留原文
+没有任何标识符变化的差异（例如只改了数字）不参与聚类。
+"""
+
+_TOKEN_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|\d+|[^\sA-Za-z0-9_]')
+_IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+# 聚类签名使用的词法单元 n-gram 长度
+CLUSTER_SHINGLE_SIZE = 3
+
+
+def mechanical_tokens(file_path, diff_text):
+    """把差异归一化为词法单元列表，没有标识符变化时返回 None"""
+    path_parts = {os.path.splitext(part)[0] for part in re.split(r'[\\/]', file_path) if part}
+    sides = []
+    for line in diff_text.splitlines():
+        if line.startswith(('+++', '---')) or line[:1] not in ('+', '-'):
+            continue
+        sides.append((line[0], _TOKEN_RE.findall(line[1:])))
+
+    removed = {token for side, tokens in sides if side == '-' for token in tokens}
+    added = {token for side, tokens in sides if side == '+' for token in tokens}
+    changed = {token for token in removed ^ added if _IDENTIFIER_RE.fullmatch(token)} - path_parts
+    if not changed:
+        return None
+
+    aliases = {}
+    normalized = []
+    for side, tokens in sides:
+        normalized.append(side)
+        for token in tokens:
+            if token.isdigit():
+                token = '0'
+            elif token in path_parts:
+                token = '<path>'
+            elif token not in changed and _IDENTIFIER_RE.fullmatch(token):
+                token = aliases.setdefault(token, f"v{len(aliases)}")
+            normalized.append(token)
+    return normalized
+
+
+def mechanical_signature(file_path, diff_text):
+    """机械相似聚类使用的 MinHash 签名，不参与聚类的差异返回 None"""
+    tokens = mechanical_tokens(file_path, diff_text[:MAX_SIGNATURE_CHARS])
+    if tokens is None:
+        return None
+    size = CLUSTER_SHINGLE_SIZE
+    return signature({' '.join(tokens[i:i + size]) for i in range(max(1, len(tokens) - size + 1))})
+
+
+def cluster_diffs(items, threshold):
+    """按机械相似度对本次运行的差异聚类，复杂度近似线性。
+
+    只需要签名而不需要差异本身，调用方可以边读取差异边计算签名，不必把全部差异留在内存中。
+
+    Args:
+        items (list): [(文件路径, mechanical_signature() 返回的签名), ...]，按分析顺序排列，签名为 None 的文件不参与聚类
+        threshold (float): 相似度阈值（0~1）
+
+    Returns:
+        dict: {代表文件: [(成员文件, 与代表文件的相似度), ...]}，只包含两个及以上文件的聚类，
+            代表文件是聚类中排在最前面的文件
+    """
+    paths, signatures = [], []
+    for file_path, sig in items:
+        if sig is not None:
+            paths.append(file_path)
+            signatures.append(sig)
+
+    clusters = {}
+    for members in cluster(signatures, threshold):
+        leader = members[0]
+        # 聚类按传递关系合并，只保留与代表文件本身足够相似的成员
+        shared = []
+        for index in members[1:]:
+            score = similarity(signatures[leader], signatures[index])
+            if score >= threshold:
+                shared.append((paths[index], score))
+        if shared:
+            clusters[paths[leader]] = shared
+    return clusters
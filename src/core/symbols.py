@@ -0,0 +1,476 @@
+"""增量维护的轻量符号索引，为差异块补充有限的上下文。
+
+只看差异时，模型往往不知道修改位于哪个函数、调用的函数定义是什么样子；
+粘贴整个文件又慢又贵。此模块为仓库中每个源文件提取定义（函数、类、方法）及其
+行号范围和签名，按 blob 哈希缓存在 .git/git-llm/symbols.db 中：
+内容不变的文件不会重新解析，重新索引只涉及 blob 变化的文件。
+
+分析差异块时，根据 @@ 行号找到所在的函数签名，并在差异中出现的调用里查找
+被调用函数的签名，在 token 预算内附加给模型。
+"""
+import os
+import re
+import ast
+import json
+import hashlib
+import sqlite3
+import threading
+from ..utils.metrics import metrics
+from ..utils.tokens import estimate_tokens
+from ..utils.logger import Logger
+
+logger = Logger(__name__)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS symbols (
+    blob TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+'''
+
+# 超过此大小的文件不建立索引（多为生成代码或数据）
+MAX_INDEX_BYTES = 512 * 1024
+
+_PYTHON_EXTENSIONS = ('.py', '.pyi')
+_BRACE_EXTENSIONS = (
+    '.js', '.jsx', '.ts', '.tsx', '.mjs', '.cjs', '.java', '.kt', '.kts', '.scala', '.go', '.rs',
+    '.c', '.h', '.cc', '.cpp', '.cxx', '.hpp', '.cs', '.php', '.swift', '.dart',
+)
+_INDENT_EXTENSIONS = ('.rb',)
+INDEXED_EXTENSIONS = _PYTHON_EXTENSIONS + _BRACE_EXTENSIONS + _INDENT_EXTENSIONS
+
+# 非 Python 语言的定义识别规则：(类型, 正则)，名称在 name 分组
+_DEFINITION_PATTERNS = (
+    ('class', re.compile(
+        r'^\s*(?:export\s+)?(?:default\s+)?(?:public\s+|private\s+|protected\s+|internal\s+)?'
+        r'(?:abstract\s+|final\s+|static\s+|sealed\s+|data\s+)*'
+        r'(?:class|interface|struct|trait|enum|impl|module)\s+(?P<name>[A-Za-z_]\w*)'
+    )),
+    ('function', re.compile(
+        r'^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*(?P<name>[A-Za-z_$][\w$]*)\s*\('
+    )),
+    ('function', re.compile(r'^\s*func\s+(?:\([^)]*\)\s*)?(?P<name>[A-Za-z_]\w*)\s*[(\[]')),
+    ('function', re.compile(r'^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?(?:unsafe\s+)?fn\s+(?P<name>[A-Za-z_]\w*)')),
+    ('function', re.compile(r'^\s*def\s+(?:self\.)?(?P<name>[A-Za-z_]\w*[?!]?)')),
+    ('function', re.compile(r'^\s*(?:fun|func)\s+(?:<[^>]*>\s*)?(?:[\w.]+\.)?(?P<name>[A-Za-z_]\w*)\s*\(')),
+    ('function', re.compile(
+        r'^\s*(?:export\s+)?(?:const|let|var)\s+(?P<name>[A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?'
+        r'(?:function\b|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)'
+    )),
+    # C 系语言的函数和方法：返回类型 名称(参数) {，排除控制语句
+    ('function', re.compile(
+        r'^\s*(?:[\w<>\[\],*&:.?]+\s+)+\**(?P<name>(?!if\b|for\b|while\b|switch\b|catch\b|return\b|else\b|new\b)'
+        r'[A-Za-z_]\w*)\s*\([^;]*\)\s*(?:const\s*)?(?:throws\s+[\w.,\s]+)?\s*\{?\s*$'
+    )),
+)
+
+_CALL_RE = re.compile(r'(?<![\w.$])(?:[A-Za-z_$][\w$]*\.)*(?P<name>[A-Za-z_$][\w$]*)\s*\(')
+_HUNK_RANGE_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+# 调用识别时忽略的关键字和常见内置函数
+_IGNORED_CALLS = frozenset((
+    'if', 'for', 'while', 'switch', 'catch', 'return', 'function', 'def', 'class', 'print', 'len', 'str',
+    'int', 'float', 'list', 'dict', 'set', 'tuple', 'range', 'isinstance', 'super', 'sizeof', 'typeof',
+    'new', 'not', 'and', 'or', 'in', 'elif', 'with', 'assert', 'lambda', 'yield', 'await', 'fn', 'func',
+))
+
+
+class Symbol:
+    """一个定义及其所在行范围"""
+
+    __slots__ = ('name', 'kind', 'start', 'end', 'signature', 'parent')
+
+    def __init__(self, name, kind, start, end, signature, parent=None):
+        self.name = name
+        self.kind = kind            # function 或 class
+        self.start = start          # 起始行（从 1 开始）
+        self.end = end              # 结束行（含）
+        self.signature = signature  # 定义行（多行签名合并为一行）
+        self.parent = parent        # 外层定义的名称
+
+    def to_list(self):
+        return [self.name, self.kind, self.start, self.end, self.signature, self.parent]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values)
+
+
+def _python_signature(lines, node):
+    """取定义从 def/class 到冒号的部分，合并为一行"""
+    start = node.lineno - 1
+    parts = []
+    for line in lines[start:start + 10]:
+        parts.append(line.strip())
+        if line.rstrip().endswith(':'):
+            break
+    return ' '.join(parts)[:200]
+
+
+def _extract_python(text):
+    tree = ast.parse(text)
+    lines = text.splitlines()
+    symbols = []
+
+    def visit(node, parent):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                kind = 'class' if isinstance(child, ast.ClassDef) else 'function'
+                symbols.append(Symbol(
+                    child.name, kind, child.lineno, child.end_lineno or child.lineno,
+                    _python_signature(lines, child), parent
+                ))
+                visit(child, child.name)
+            else:
+                visit(child, parent)
+
+    visit(tree, None)
+    return symbols
+
+
+def _brace_end(lines, start):
+    """从定义行开始匹配花括号，返回结束行号；找不到时返回 None"""
+    depth = 0
+    opened = False
+    for index in range(start, min(len(lines), start + 2000)):
+        line = lines[index]
+        depth += line.count('{') - line.count('}')
+        if '{' in line:
+            opened = True
+        if opened and depth <= 0:
+            return index + 1
+        if not opened and index > start + 3:
+            return None
+    return None
+
+
+def _indent_end(lines, start):
+    """按缩进判断定义的结束行"""
+    indent = len(lines[start]) - len(lines[start].lstrip())
+    end = start
+    for index in range(start + 1, len(lines)):
+        line = lines[index]
+        if not line.strip():
+            continue
+        if len(line) - len(line.lstrip()) <= indent:
+            # Ruby 的 end 属于该定义
+            return index + 1 if line.strip() == 'end' else end + 1
+        end = index
+    return end + 1
+
+
+def _extract_generic(text, brace):
+    lines = text.splitlines()
+    symbols = []
+    stack = []  # 包含当前行的外层定义
+    for index, line in enumerate(lines):
+        if len(line) > 400:
+            continue
+        for kind, pattern in _DEFINITION_PATTERNS:
+            match = pattern.match(line)
+            if match:
+                break
+        else:
+            continue
+        end = _brace_end(lines, index) if brace else _indent_end(lines, index)
+        if end is None:
+            # 只有声明没有函数体
+            continue
+        while stack and stack[-1].end < index + 1:
+            stack.pop()
+        symbol = Symbol(
+            match.group('name'), kind, index + 1, end, line.strip().rstrip('{').strip()[:200],
+            stack[-1].name if stack else None
+        )
+        symbols.append(symbol)
+        stack.append(symbol)
+    return symbols
+
+
+def extract_symbols(file_path, text):
+    """提取文件中的定义。
+
+    Python 使用 ast 精确解析（语法错误时回退到按缩进识别），其他语言按正则识别定义行，
+    再按花括号或缩进确定结束行。
+
+    Args:
+        file_path (str): 文件路径，用于按扩展名选择识别方式
+        text (str): 文件内容
+
+    Returns:
+        list: Symbol 列表，按起始行排序
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in _PYTHON_EXTENSIONS:
+        try:
+            return _extract_python(text)
+        except (SyntaxError, ValueError, RecursionError):
+            return _extract_generic(text, brace=False)
+    if extension in _BRACE_EXTENSIONS:
+        return _extract_generic(text, brace=True)
+    if extension in _INDENT_EXTENSIONS:
+        return _extract_generic(text, brace=False)
+    return []
+
+
+def blob_hash(data):
+    """计算与 git hash-object 相同的 blob 哈希"""
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def changed_line_range(hunk):
+    """差异块中实际修改的行在新文件中的范围 (起始, 结束)，不含上下文行；没有 @@ 行时返回 None"""
+    match = _HUNK_RANGE_RE.match(hunk)
+    if not match:
+        return None
+    line_number = int(match.group(1))
+    first = last = None
+    for line in hunk.splitlines()[1:]:
+        if line.startswith('+'):
+            first = line_number if first is None else first
+            last = line_number
+            line_number += 1
+        elif line.startswith('-'):
+            # 删除的行位于新文件当前行之前
+            first = line_number if first is None else first
+            last = max(last or line_number, line_number)
+        elif not line.startswith('\\'):
+            line_number += 1
+    if first is None:
+        return None
+    return first, last
+
+
+def called_names(hunk):
+    """差异块中新增和上下文行里出现的调用名称（按出现顺序去重）"""
+    names = []
+    seen = set()
+    for line in hunk.splitlines():
+        if line.startswith(('@@', '-')):
+            continue
+        # 定义行中的名称不是调用
+        if any(pattern.match(line[1:]) for _, pattern in _DEFINITION_PATTERNS):
+            continue
+        for match in _CALL_RE.finditer(line):
+            name = match.group('name')
+            if name not in seen and name not in _IGNORED_CALLS:
+                seen.add(name)
+                names.append(name)
+    return names
+
+
+"""增量符号索引。
+
+此类维护仓库当前内容（工作区或暂存区）的符号表，提供：
+1. refresh: 按 blob 哈希增量建立索引，内容未变化的文件直接复用缓存
+2. enclosing: 查找某个行范围所在的定义
+3. context_for: 在 token 预算内为一段差异构建上下文说明
+"""
+class SymbolIndex:
+    def __init__(self, db_path):
+        """打开（必要时创建）符号缓存数据库。
+
+        Args:
+            db_path (str): 数据库文件路径
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._paths = {}        # 文件路径 -> blob 哈希
+        self._symbols = {}      # blob 哈希 -> [Symbol]，按需加载
+        self._definitions = None  # 名称 -> [(文件路径, Symbol)]，首次查找时构建
+
+    @classmethod
+    def for_repo(cls, git_assistant):
+        """打开仓库对应的符号缓存，存放在 .git/git-llm/symbols.db"""
+        return cls(os.path.join(git_assistant.repo.git_dir, 'git-llm', 'symbols.db'))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def refresh(self, git_assistant, changed_files=(), staged_only=None):
+        """按仓库当前内容更新索引。
+
+        已跟踪文件取暂存区中的 blob；工作区模式下变更文件改为读取工作区内容。
+        只有缓存中不存在的 blob 才会读取和解析。
+
+        Args:
+            git_assistant (GitAssistant): Git 助手
+            changed_files (iterable): 本次变更的文件
+            staged_only (bool): 只使用暂存区内容，默认读取配置 GIT_LLM_STAGED_ONLY
+
+        Returns:
+            int: 新解析的文件数
+        """
+        if staged_only is None:
+            staged_only = git_assistant.config.staged_only
+        paths = {
+            path: blob for path, blob in git_assistant.get_index_blobs().items()
+            if path.lower().endswith(INDEXED_EXTENSIONS)
+        }
+        contents = {}
+        if not staged_only:
+            for path in changed_files:
+                if not path.lower().endswith(INDEXED_EXTENSIONS):
+                    continue
+                full_path = os.path.join(git_assistant.repo.working_dir, path)
+                try:
+                    if os.path.getsize(full_path) > MAX_INDEX_BYTES:
+                        continue
+                    with open(full_path, 'rb') as f:
+                        data = f.read()
+                except OSError:
+                    # 工作区中已删除
+                    paths.pop(path, None)
+                    continue
+                paths[path] = blob_hash(data)
+                contents[paths[path]] = (path, data)
+
+        known = self._known_blobs(set(paths.values()))
+        missing = {blob: path for path, blob in paths.items() if blob not in known}
+        parsed = 0
+        rows = []
+        for blob, path in missing.items():
+            if blob in contents:
+                data = contents[blob][1]
+            else:
+                data = git_assistant.read_blob(blob, MAX_INDEX_BYTES)
+                if data is None:
+                    continue
+            symbols = extract_symbols(path, data.decode('utf-8', errors='replace'))
+            rows.append((blob, json.dumps([symbol.to_list() for symbol in symbols], ensure_ascii=False)))
+            self._symbols[blob] = symbols
+            parsed += 1
+            if len(rows) >= 500:
+                self._store(rows)
+                rows = []
+        self._store(rows)
+
+        self._paths = paths
+        self._definitions = None
+        metrics.increment('symbols.parsed', parsed)
+        metrics.increment('symbols.reused', len(paths) - parsed)
+        logger.info(f"符号索引: {len(paths)} 个文件，新解析 {parsed} 个")
+        return parsed
+
+    def _known_blobs(self, blobs):
+        known = set()
+        blobs = list(blobs)
+        with self._lock:
+            for start in range(0, len(blobs), 500):
+                chunk = blobs[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                known.update(
+                    row[0] for row in self._conn.execute(
+                        f'SELECT blob FROM symbols WHERE blob IN ({placeholders})', chunk
+                    )
+                )
+        return known
+
+    def _store(self, rows):
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO symbols (blob, data) VALUES (?, ?)', rows)
+            self._conn.commit()
+
+    def symbols_for(self, file_path):
+        """文件当前内容中的定义列表"""
+        blob = self._paths.get(file_path)
+        if blob is None:
+            return []
+        symbols = self._symbols.get(blob)
+        if symbols is None:
+            with self._lock:
+                row = self._conn.execute('SELECT data FROM symbols WHERE blob = ?', (blob,)).fetchone()
+            symbols = [Symbol.from_list(values) for values in json.loads(row[0])] if row else []
+            self._symbols[blob] = symbols
+        return symbols
+
+    def enclosing(self, file_path, start, end):
+        """与 [start, end] 行范围有交集的定义，从外到内排列"""
+        return [
+            symbol for symbol in self.symbols_for(file_path)
+            if symbol.start <= end and start <= symbol.end
+        ]
+
+    def definitions(self, name):
+        """按名称查找定义，返回 [(文件路径, Symbol)]"""
+        if self._definitions is None:
+            definitions = {}
+            for file_path in self._paths:
+                for symbol in self.symbols_for(file_path):
+                    definitions.setdefault(symbol.name, []).append((file_path, symbol))
+            self._definitions = definitions
+        return self._definitions.get(name, [])
+
+    def context_for(self, file_path, diff_text, budget):
+        """为一段差异（一个或多个差异块）构建上下文说明。
+
+        先列出各差异块所在的函数签名，再列出差异中调用的定义签名（同一文件优先，
+        同名定义过多时视为无法确定而跳过），直到用完 token 预算。
+
+        Args:
+            file_path (str): 文件路径
+            diff_text (str): 差异文本
+            budget (int): token 预算
+
+        Returns:
+            str: 上下文说明，没有可用信息时为空字符串
+        """
+        if budget <= 0 or file_path not in self._paths:
+            return ''
+        lines = []
+        used = 0
+        seen = set()
+
+        def add(line):
+            nonlocal used
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                return False
+            used += cost
+            lines.append(line)
+            return True
+
+        hunks = [hunk for hunk in re.split(r'(?m)^(?=@@ )', diff_text) if hunk.startswith('@@')]
+        if not hunks:
+            # 新文件的完整内容已经在差异中
+            return ''
+        enclosing = []
+        for hunk in hunks:
+            line_range = changed_line_range(hunk)
+            if line_range is None:
+                continue
+            for symbol in self.enclosing(file_path, *line_range):
+                if (file_path, symbol.start) not in seen:
+                    seen.add((file_path, symbol.start))
+                    enclosing.append(symbol)
+        if enclosing and add("所在定义:"):
+            for symbol in enclosing:
+                if not add(f"- {file_path}:{symbol.start}  {symbol.signature}"):
+                    break
+
+        called = []
+        for name in called_names(diff_text):
+            candidates = self.definitions(name)
+            local = [(path, symbol) for path, symbol in candidates if path == file_path]
+            candidates = local or candidates
+            if not candidates or len(candidates) > 3:
+                continue
+            for path, symbol in candidates:
+                if (path, symbol.start) not in seen:
+                    seen.add((path, symbol.start))
+                    called.append((path, symbol))
+        if called and add("调用的定义:"):
+            for path, symbol in called:
+                if not add(f"- {path}:{symbol.start}  {symbol.signature}"):
+                    break
+
+        metrics.observe('symbols.context_tokens', used)
+        return '\n'.join(lines) if len(lines) > 1 else ''
@@ -0,0 +1,101 @@
+"""分析前的廉价分拣。
+
+在读取任何差异内容之前，只根据 numstat 行数、二进制标记、重命名信息和路径模式
+把变更文件分为五类，只有 reviewable 的文件才会获取差异并发送给模型：
+- binary: 二进制文件
+- renamed: 仅重命名，内容没有变化
+- oversized: 变更行数超过上限（如整体引入的第三方代码）
+- generated: 锁文件、压缩产物、生成代码等
+- reviewable: 需要审查
+"""
+from fnmatch import fnmatch
+
+REVIEWABLE = 'reviewable'
+
+SKIP_REASONS = {
+    'binary': '二进制文件',
+    'renamed': '仅重命名',
+    'oversized': '变更过大',
+    'generated': '生成的文件',
+}
+
+# 默认的生成文件模式（不区分大小写）
+DEFAULT_GENERATED_PATTERNS = (
+    '*.lock', '*package-lock.json', '*pnpm-lock.yaml', '*go.sum',
+    '*.min.js', '*.min.css', '*.map', '*.bundle.js',
+    '*_pb2.py', '*_pb2_grpc.py', '*.pb.go', '*.generated.*', '*.g.dart',
+    'vendor/*', '*/vendor/*', 'node_modules/*', '*/node_modules/*',
+    'dist/*', 'build/*',
+)
+
+
+class ChangeStat:
+    """单个变更文件的规模信号，不含差异内容"""
+
+    __slots__ = ('added', 'deleted', 'old_path', 'size')
+
+    def __init__(self, added, deleted, old_path=None, size=None):
+        self.added = added        # 二进制文件为 None
+        self.deleted = deleted
+        self.old_path = old_path  # 重命名前的路径
+        self.size = size          # 未跟踪文件的字节数
+
+    @property
+    def binary(self):
+        return self.added is None
+
+    @property
+    def lines(self):
+        """增删行数之和，二进制文件为 0"""
+        return 0 if self.added is None else self.added + self.deleted
+
+
+def classify_change(file_path, stat, max_lines=0, generated_patterns=DEFAULT_GENERATED_PATTERNS):
+    """对单个文件分拣。
+
+    Args:
+        file_path (str): 文件路径
+        stat (ChangeStat): 规模信号，没有信号时为 None（按 reviewable 处理）
+        max_lines (int): 变更行数上限，0 表示不限制
+        generated_patterns (iterable): 生成文件的路径模式
+
+    Returns:
+        tuple: (类别, 原因说明)，reviewable 的原因为 None
+    """
+    path = file_path.lower()
+    if any(fnmatch(path, pattern.lower()) for pattern in generated_patterns):
+        return 'generated', SKIP_REASONS['generated']
+    if stat is None:
+        return REVIEWABLE, None
+    if stat.binary:
+        return 'binary', SKIP_REASONS['binary']
+    if stat.old_path is not None and stat.lines == 0:
+        return 'renamed', f"{SKIP_REASONS['renamed']}（原路径 {stat.old_path}）"
+    if max_lines and stat.lines > max_lines:
+        return 'oversized', f"{SKIP_REASONS['oversized']}（{stat.lines} 行）"
+    return REVIEWABLE, None
+
+
+def triage_files(file_paths, stats, max_lines=0, generated_patterns=DEFAULT_GENERATED_PATTERNS):
+    """分拣一组变更文件。
+
+    Args:
+        file_paths (list): 文件路径列表
+        stats (dict): {file_path: ChangeStat}
+        max_lines (int): 变更行数上限，0 表示不限制
+        generated_patterns (iterable): 生成文件的路径模式
+
+    Returns:
+        tuple: (reviewable, skipped)
+            reviewable 为需要审查的文件路径列表（保持输入顺序）
+            skipped 为 [(file_path, 原因说明), ...]
+    """
+    reviewable = []
+    skipped = []
+    for file_path in file_paths:
+        category, reason = classify_change(file_path, stats.get(file_path), max_lines, generated_patterns)
+        if category == REVIEWABLE:
+            reviewable.append(file_path)
+        else:
+            skipped.append((file_path, reason))
+    return reviewable, skipped
@@ -1,13 +1,36 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+import queue
 import threading
-import json
+import time
 from ..core.git_assistant import GitAssistant
 from ..core.ai_analyzer import AIAnalyzer
+from ..core.daemon import DaemonClient
+from ..core.result_store import ResultStore
+from ..core.remote_cache import RemoteCacheClient
+from ..core.pipeline import AnalysisPipeline
+from ..core.symbols import SymbolIndex
+from ..core.cancellation import CancelToken
+from ..core.classifier import SEVERITY_NAMES, TYPE_NAMES, TYPE_PREFIXES, empty_stats
+from ..core.findings import FileResult, SEVERITY_ORDER, ISSUE_TYPE_ORDER
+from ..core.consolidation import IncrementalConsolidator, files_label
+from ..core.search import FilterQuery, FindingIndex
+from ..utils.metrics import metrics
+from ..utils.profiling import stage
 from ..utils.logger import Logger
 
 logger = Logger(__name__)
 
+# 分析进行中刷新变更总结的最短间隔（秒）
+SUMMARY_REFRESH_INTERVAL = 0.5
+
+# Tk 主线程检查后台线程界面更新队列的间隔（毫秒）
+UI_POLL_INTERVAL = 50
+
+# 筛选栏下拉框的选项
+SEVERITY_FILTERS = {'全部级别': None, **{name: severity for severity, name in SEVERITY_NAMES.items()}}
+TYPE_FILTERS = {'全部类型': None, **{prefix: issue_type for issue_type, prefix in TYPE_PREFIXES.items()}}
+
 """主窗口类，提供AI Git Assistant的主要操作界面。
 
 此类提供了一个图形界面，用于：
@@ -32,13 +55,49 @@ class MainWindow:
         
         try:
             self.git_assistant = GitAssistant(repo_path)
-            self.ai_analyzer = AIAnalyzer()
+            # 守护进程可用时作为轻量客户端，复用其连接和缓存
+            self.ai_analyzer = DaemonClient.try_connect()
+            if self.ai_analyzer is not None:
+                logger.info("已连接到后台守护进程")
+            else:
+                self.ai_analyzer = AIAnalyzer()
+            self.result_store = self._open_result_store()
+            self.analysis_data = {}
+            self.unfinished_files = set()
+            self.skipped_files = {}
+            self.reused_files = {}
+            self.active_filter = FilterQuery()
+            self.pipeline = AnalysisPipeline(
+                self.git_assistant, self.ai_analyzer, self.result_store, symbol_index=self._open_symbol_index(),
+                remote_cache=RemoteCacheClient.from_config(self.git_assistant.config)
+            )
+            self.root.protocol("WM_DELETE_WINDOW", self.cancel_analysis)
             self.setup_ui()
+            self._ui_queue = queue.Queue()
+            self._drain_ui_queue()
             logger.info("主窗口初始化完成")
         except Exception as e:
             logger.exception("主窗口初始化失败")
             raise
 
+    def _open_result_store(self):
+        """打开结果存储，失败时仅记录警告，不影响分析"""
+        try:
+            return ResultStore.for_repo(self.git_assistant)
+        except Exception as e:
+            logger.warning(f"无法打开结果存储，将不保存分析历史: {str(e)}")
+            return None
+
+    def _open_symbol_index(self):
+        """打开符号索引缓存，失败或未启用时不附加上下文"""
+        if self.git_assistant.config.context_tokens <= 0:
+            return None
+        try:
+            return SymbolIndex.for_repo(self.git_assistant)
+        except Exception as e:
+            logger.warning(f"无法打开符号索引，将不附加上下文: {str(e)}")
+            return None
+
     def setup_ui(self):
         """设置用户界面布局。
         
@@ -107,11 +166,13 @@ class MainWindow:
         # 左侧文件列表
         list_frame = ttk.LabelFrame(content_frame, text="变更文件", padding=(5, 5, 5, 5))
         list_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(5, 2.5))
+        self.list_frame = list_frame
+        self.create_filter_bar(list_frame)
         
         self.file_list = tk.Listbox(list_frame, font=('Arial', 10), selectmode=tk.SINGLE)
-        self.file_list.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.file_list.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         list_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.file_list.yview)
-        list_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        list_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
         self.file_list.configure(yscrollcommand=list_scrollbar.set)
         
         # 右侧详细信息
@@ -132,7 +193,7 @@ class MainWindow:
         content_frame.columnconfigure(1, weight=2)
         content_frame.rowconfigure(0, weight=1)
         list_frame.columnconfigure(0, weight=1)
-        list_frame.rowconfigure(0, weight=1)
+        list_frame.rowconfigure(1, weight=1)
         detail_frame.columnconfigure(0, weight=1)
         detail_frame.rowconfigure(0, weight=1)
         summary_frame.columnconfigure(0, weight=1)
@@ -146,17 +207,113 @@ class MainWindow:
         self.detail_menu.add_command(label="全选", command=self.select_all_detail)
         self.detail_text.bind("<Button-3>", self.show_detail_menu)
 
+    def create_filter_bar(self, parent):
+        """创建文件列表上方的搜索筛选栏：关键字、严重程度、类型和路径通配符，输入时即时筛选"""
+        bar = ttk.Frame(parent)
+        bar.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+
+        self.filter_keyword = tk.StringVar()
+        self.filter_severity = tk.StringVar(value='全部级别')
+        self.filter_type = tk.StringVar(value='全部类型')
+        self.filter_path = tk.StringVar()
+
+        ttk.Label(bar, text="搜索:").grid(row=0, column=0, sticky=tk.W)
+        ttk.Entry(bar, textvariable=self.filter_keyword).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(2, 5))
+        ttk.Combobox(
+            bar, textvariable=self.filter_severity, values=list(SEVERITY_FILTERS), state='readonly', width=8
+        ).grid(row=0, column=2, padx=(0, 5))
+        ttk.Combobox(
+            bar, textvariable=self.filter_type, values=list(TYPE_FILTERS), state='readonly', width=8
+        ).grid(row=0, column=3)
+        ttk.Label(bar, text="路径:").grid(row=1, column=0, sticky=tk.W, pady=(3, 0))
+        ttk.Entry(bar, textvariable=self.filter_path).grid(
+            row=1, column=1, columnspan=3, sticky=(tk.W, tk.E), padx=(2, 0), pady=(3, 0)
+        )
+        bar.columnconfigure(1, weight=1)
+
+        for variable in (self.filter_keyword, self.filter_severity, self.filter_type, self.filter_path):
+            variable.trace_add('write', lambda *args: self.apply_filter())
+
+    def apply_filter(self):
+        """按筛选栏的条件通过倒排索引重建文件列表"""
+        self.active_filter = FilterQuery(
+            self.filter_keyword.get(), SEVERITY_FILTERS.get(self.filter_severity.get()),
+            TYPE_FILTERS.get(self.filter_type.get()), self.filter_path.get()
+        )
+        if not hasattr(self, 'finding_index'):
+            return
+        started = time.perf_counter()
+        if self.active_filter.empty:
+            visible = self.file_order
+        else:
+            visible = self.finding_index.search(self.active_filter)
+
+        self.file_list.delete(0, tk.END)
+        self.file_rows = {file_path: row for row, file_path in enumerate(visible)}
+        self.row_files = list(visible)
+        if visible:
+            self.file_list.insert(tk.END, *(self.file_labels[file_path][0] for file_path in visible))
+        for file_path in visible:
+            color = self.file_labels[file_path][1]
+            if color is not None:
+                self.file_list.itemconfig(self.file_rows[file_path], foreground=color)
+        self._update_list_title()
+        metrics.observe('gui.filter_seconds', time.perf_counter() - started)
+
+    def clear_filter(self):
+        for variable, value in ((self.filter_keyword, ''), (self.filter_severity, '全部级别'),
+                                (self.filter_type, '全部类型'), (self.filter_path, '')):
+            variable.set(value)
+
+    def _update_list_title(self):
+        list_frame = getattr(self, 'list_frame', None)
+        if list_frame is None:
+            return
+        if self.active_filter.empty:
+            list_frame.configure(text="变更文件")
+        else:
+            list_frame.configure(text=f"变更文件（筛选后 {len(self.file_rows)}/{len(self.file_order)}）")
+
+    def _add_row(self, file_path, text, color=None):
+        """把文件加入列表模型，满足当前筛选条件时显示"""
+        self.file_labels[file_path] = (text, color)
+        self.file_order.append(file_path)
+        if not self.active_filter.empty and not self.finding_index.matches(file_path, self.active_filter):
+            self._update_list_title()
+            return
+        self.file_rows[file_path] = self.file_list.size()
+        self.row_files.append(file_path)
+        self.file_list.insert(tk.END, text)
+        if color is not None:
+            self.file_list.itemconfig(tk.END, foreground=color)
+        if not self.active_filter.empty:
+            self._update_list_title()
+
+    def _refresh_row(self, file_path, text, color=None):
+        """更新已显示文件的文本（例如共享问题组的严重程度变化后），color 为 None 时保持原颜色"""
+        color = color or self.file_labels[file_path][1]
+        self.file_labels[file_path] = (text, color)
+        row = self.file_rows.get(file_path)
+        if row is not None:
+            self.file_list.delete(row)
+            self.file_list.insert(row, text)
+            if color is not None:
+                self.file_list.itemconfig(row, foreground=color)
+
+    def _index_file(self, file_path):
+        groups = self.analysis_data.get(file_path, ())
+        self.finding_index.update(
+            file_path, [group.label for group in groups], [(group.severity, group.issue_type) for group in groups]
+        )
+
     def show_file_detail(self, event):
         """显示选中文件的详细信息"""
         selection = self.file_list.curselection()
         if not selection:
             return
         
-        index = selection[0]
-        display_text = self.file_list.get(index)
-        
-        # 从显示文本中提取文件路径（去除问题统计部分）
-        file_path = display_text.split("  (")[0] if "  (" in display_text else display_text
+        # 按行号取文件路径，显示文本中可能带有问题统计或复用标记
+        file_path = self.row_files[selection[0]]
         
         # 清空并显示新内容
         self.detail_text.delete('1.0', tk.END)
@@ -169,33 +326,168 @@ class MainWindow:
         self.detail_text.tag_configure('warning', font=('Arial', 10), foreground='orange')
         self.detail_text.tag_configure('suggestion', font=('Arial', 10), foreground='blue')
         
-        if file_path in self.analysis_data:
-            data = self.analysis_data[file_path]
+        if file_path in self.skipped_files:
+            self.detail_text.insert(tk.END, "【文件路径】\n", 'header')
+            self.detail_text.insert(tk.END, f"{file_path}\n\n", 'content')
+            self.detail_text.insert(tk.END, "【已跳过】\n", 'subheader')
+            self.detail_text.insert(tk.END, f"{self.skipped_files[file_path]}，未发送给模型分析。\n", 'content')
+        elif file_path in self.unfinished_files:
+            self.detail_text.insert(tk.END, "【文件路径】\n", 'header')
+            self.detail_text.insert(tk.END, f"{file_path}\n\n", 'content')
+            self.detail_text.insert(tk.END, "【未完成】\n", 'subheader')
+            self.detail_text.insert(tk.END, "分析在截止时间前未完成或已被取消，暂无结果。\n", 'warning')
+        elif file_path in self.analysis_data:
+            groups = self.analysis_data[file_path]
             
             # 显示文件路径
             self.detail_text.insert(tk.END, "【文件路径】\n", 'header')
             self.detail_text.insert(tk.END, f"{file_path}\n\n", 'content')
+
+            reused = self.reused_files.get(file_path)
+            if reused and 'cluster' in reused:
+                self.detail_text.insert(tk.END, "【共享】\n", 'subheader')
+                self.detail_text.insert(
+                    tk.END,
+                    f"本次 {reused['cluster']} 个文件的修改机械相似，只分析了 {reused['path']}，"
+                    f"以下结果与其共享（相似度 {reused['similarity']:.0%}），请留意两者的差别。\n\n",
+                    'warning'
+                )
+            elif reused:
+                self.detail_text.insert(tk.END, "【复用】\n", 'subheader')
+                self.detail_text.insert(
+                    tk.END,
+                    f"未重新分析，复用 {reused['path']} 相似变更的审查结果（相似度 {reused['similarity']:.0%}），请留意两者的差别。\n\n",
+                    'warning'
+                )
             
-            # 显示分析结果
-            severity_names = {
-                'severe': '严重问题',
-                'warning': '警告',
-                'suggestion': '建议'
-            }
-            
-            for severity, type_data in data.items():
-                all_items = []
-                for items in type_data.values():
-                    all_items.extend(items)
+            # 显示分析结果（安全问题排在规范问题之前）
+            for severity in SEVERITY_ORDER:
+                all_items = [
+                    group for issue_type in ISSUE_TYPE_ORDER for group in groups
+                    if group.severity == severity and group.issue_type == issue_type
+                ]
                     
                 if all_items:
-                    self.detail_text.insert(tk.END, f"【{severity_names[severity]}】\n", 'subheader')
-                    for item in all_items:
-                        self.detail_text.insert(tk.END, f"• {item}\n", severity)
+                    self.detail_text.insert(tk.END, f"【{SEVERITY_NAMES[severity]}】\n", 'subheader')
+                    for group in all_items:
+                        self.detail_text.insert(tk.END, f"• {group.label}\n", severity)
                     self.detail_text.insert(tk.END, "\n")
 
-    def show_analysis_result(self, results):
-        """显示代码分析结果。
+    def reset_results(self, total_files=0):
+        """清空结果区域，准备随分析进度逐个接收文件结果。
+
+        Args:
+            total_files (int): 本次需要分析的文件总数，用于总结中的进度显示
+        """
+        self.file_list.delete(0, tk.END)
+        # 存储分析数据：文件路径 -> 该文件涉及的合并问题组（多个文件共享同一组对象）
+        self.analysis_data = {}
+        self.unfinished_files = set()
+        self.skipped_files = {}
+        self.reused_files = {}  # 文件路径 -> 复用来源 {'path': 来源文件, 'similarity': 相似度}
+        self.file_rows = {}  # 文件路径 -> 文件列表中的行号（只包含满足筛选条件的文件）
+        self.row_files = []  # 文件列表中的行号 -> 文件路径，与 file_rows 对应
+        self.file_order = []  # 全部文件，按加入顺序
+        self.file_labels = {}  # 文件路径 -> (显示文本, 颜色)
+        self.finding_index = FindingIndex()
+        self.stats_data = empty_stats()
+        self.change_groups = []
+        self.total_files = total_files
+        self.consolidator = IncrementalConsolidator(self.git_assistant.config.dedup_threshold)
+        self.ai_commit_message = None
+        self._summary_rendered_at = 0.0
+        self.summary_text.delete('1.0', tk.END)
+
+    def add_file_result(self, result):
+        """加入一个已完成文件的分析结果。
+
+        立即合并该文件的问题和变更描述、插入文件列表并增量更新统计，
+        无需等待其他文件完成，选中后即可查看详情。
+
+        Args:
+            result (FileResult): 文件分析结果
+        """
+        groups = self.analysis_data.setdefault(result.file, [])
+        if result.reused:
+            self.reused_files[result.file] = result.reused
+        affected = set()
+        for finding in result.findings:
+            group, previous = self.consolidator.add_finding(finding)
+            if not any(existing is group for existing in groups):
+                groups.append(group)
+            # 合并问题每组只计一次；组内出现更严重的条目时调整统计
+            if previous is None:
+                self.stats_data[group.severity][group.issue_type] += 1
+            elif previous != group.severity:
+                self.stats_data[previous][group.issue_type] -= 1
+                self.stats_data[group.severity][group.issue_type] += 1
+                affected.update(group.files)
+
+        for change in result.changes:
+            group, created = self.consolidator.add_change(change)
+            if created:
+                self.change_groups.append(group)
+
+        # 共享问题组的严重程度变化时，同步更新其他文件的索引和问题统计
+        for file_path in affected | {result.file}:
+            self._index_file(file_path)
+        if result.file in self.file_labels:
+            affected.add(result.file)
+        else:
+            self._add_row(result.file, self._file_display_text(result.file))
+        for file_path in affected:
+            self._refresh_row(file_path, self._file_display_text(file_path))
+
+        self._render_summary()
+
+    def add_secret_findings(self, result):
+        """在模型分析完成前以红色标出本地扫描到疑似凭证泄露的文件。
+
+        Args:
+            result (FileResult): 只包含本地扫描问题的结果，文件完成后完整结果中的相同问题会被合并
+        """
+        self.add_file_result(result)
+        self._refresh_row(result.file, self._file_display_text(result.file), 'red')
+
+    def add_skipped_file(self, file_path, reason):
+        """以灰色显示分拣阶段跳过的文件及原因"""
+        self.skipped_files[file_path] = reason
+        self.finding_index.update(file_path)
+        self._add_row(file_path, f"{file_path}  (已跳过: {reason})", 'gray')
+
+    def finish_results(self, unfinished=None):
+        """全部文件处理完毕后标记未完成的文件，并生成最终总结和本地提交信息。
+
+        Args:
+            unfinished (list): 因取消或超时未完成分析的文件列表
+        """
+        self.unfinished_files = set(unfinished or [])
+
+        # 未完成的文件以灰色标记在列表末尾
+        for file_path in unfinished or []:
+            self.finding_index.update(file_path)
+            self._add_row(file_path, f"{file_path}  (未完成)", 'gray')
+
+        self._render_summary(final=True)
+
+        # 模型已生成提交信息时不再用本地摘要覆盖
+        if self.ai_commit_message is None:
+            commit_message = self.generate_commit_message(self._all_changes(), self.stats_data)
+            self.commit_message.delete('1.0', tk.END)
+            self.commit_message.insert('1.0', commit_message)
+
+    def show_ai_commit_message(self, commit_message):
+        """填入模型生成的提交信息。
+
+        提交信息与逐文件分析并发生成，通常在分析完成前就会到达；
+        开启 GIT_LLM_REFINE_COMMIT_MESSAGE 时，分析完成后会以完善后的版本再次调用。
+        """
+        self.ai_commit_message = commit_message
+        self.commit_message.delete('1.0', tk.END)
+        self.commit_message.insert('1.0', commit_message)
+
+    def show_analysis_result(self, results, unfinished=None):
+        """一次性显示一组代码分析结果。
         
         处理并展示AI分析器返回的分析结果，包括：
         - 文件变更统计
@@ -204,135 +496,66 @@ class MainWindow:
         - 改进建议
         
         Args:
-            results (list): 分析结果列表，每个元素包含文件路径和分析建议
+            results (list): FileResult 列表
+            unfinished (list): 因取消或超时未完成分析的文件列表
         """
-        # 清除现有的所有项
-        self.file_list.delete(0, tk.END)
-        self.analysis_data = {}  # 存储分析数据
-        
-        # 统计信息
-        stats_data = {
-            'severe': {'security': 0, 'standard': 0},
-            'warning': {'security': 0, 'standard': 0},
-            'suggestion': {'security': 0, 'standard': 0}
-        }
-        
-        # 收集所有变更信息
-        all_changes = []
-        
-        # 处理每个文件的分析结果
+        self.reset_results(len(results))
         for result in results:
-            try:
-                file_path = result['file']
-                suggestions = json.loads(result['suggestions']) if isinstance(result['suggestions'], str) else result['suggestions']
-                
-                # 将分析结果分类
-                file_data = {
-                    'severe': {'security': [], 'standard': []},
-                    'warning': {'security': [], 'standard': []},
-                    'suggestion': {'security': [], 'standard': []}
-                }
-                
-                # 严重问题判断规则
-                severe_keywords = [
-                    '密码泄露', '凭证泄露', '系统崩溃', '严重漏洞', '注入攻击', 
-                    'SQL注入', 'XSS攻击', '远程执行', '权限提升', '拒绝服务',
-                    '未授权访问', '敏感信息泄露'
-                ]
-                
-                # 收集变更信息
-                if 'changes' in suggestions:
-                    changes = suggestions['changes']
-                    if isinstance(changes, dict):
-                        for change_type, details in changes.items():
-                            if isinstance(details, list):
-                                all_changes.extend(f"[{file_path}] {item}" for item in details)
-                            else:
-                                all_changes.append(f"[{file_path}] {details}")
-                    elif isinstance(changes, list):
-                        all_changes.extend(f"[{file_path}] {item}" for item in changes)
-                    elif isinstance(changes, str):
-                        all_changes.append(f"[{file_path}] {changes}")
-                
-                # 处理各类分析结果
-                for category, content in suggestions.items():
-                    if not content or category == 'changes':
-                        continue
-                        
-                    items = []
-                    if isinstance(content, dict):
-                        for _, values in content.items():
-                            if isinstance(values, list):
-                                items.extend(values)
-                            else:
-                                items.append(values)
-                    elif isinstance(content, list):
-                        items.extend(content)
-                    else:
-                        items.append(content)
-                    
-                    for item in items:
-                        if not isinstance(item, str):
-                            continue
-                            
-                        # 跳过"未发现问题"类的信息
-                        if '未发现' in item or '没有发现' in item:
-                            continue
-                            
-                        # 确定问题类型
-                        issue_type = 'security' if category == 'security_issues' else 'standard'
-                        
-                        # 确定严重程度
-                        severity = 'warning'  # 默认为警告级别
-                        if any(keyword in item.lower() for keyword in severe_keywords):
-                            severity = 'severe'
-                        elif '建议' in item or '优化' in item or '改进' in item or category == 'best_practices':
-                            severity = 'suggestion'
-                        
-                        # 添加到对应分类
-                        prefix = '[安全]' if issue_type == 'security' else '[规范]'
-                        file_data[severity][issue_type].append(f"{prefix} {item}")
-                        stats_data[severity][issue_type] += 1
-                
-                # 存储分析数据
-                self.analysis_data[file_path] = file_data
-                
-                # 计算该文件的问题统计
-                file_issues = {
-                    'severe': sum(len(issues) for issues in file_data['severe'].values()),
-                    'warning': sum(len(issues) for issues in file_data['warning'].values()),
-                    'suggestion': sum(len(issues) for issues in file_data['suggestion'].values())
-                }
-                
-                # 构建文件列表显示文本
-                display_text = file_path
-                total_issues = sum(file_issues.values())
-                if total_issues > 0:
-                    issue_parts = []
-                    if file_issues['severe'] > 0:
-                        issue_parts.append(f"严重:{file_issues['severe']}")
-                    if file_issues['warning'] > 0:
-                        issue_parts.append(f"警告:{file_issues['warning']}")
-                    if file_issues['suggestion'] > 0:
-                        issue_parts.append(f"建议:{file_issues['suggestion']}")
-                    display_text += f"  ({', '.join(issue_parts)})"
-                
-                # 添加到列表
-                self.file_list.insert(tk.END, display_text)
-                
-            except Exception as e:
-                logger.error(f"处理分析结果时出错: {str(e)}")
-                self.file_list.insert(tk.END, f"错误: {file_path}")
-                self.analysis_data[f"错误: {file_path}"] = {
-                    'severe': {'security': [str(result.get('suggestions', '解析失败'))], 'standard': []}
-                }
-        
+            self.add_file_result(result)
+        self.finish_results(unfinished)
+
+    def _file_display_text(self, file_path):
+        """构建文件列表中的显示文本（附带问题统计）"""
+        # 计算该文件的问题统计
+        file_issues = dict.fromkeys(SEVERITY_ORDER, 0)
+        for group in self.analysis_data[file_path]:
+            file_issues[group.severity] += 1
+        
+        display_text = file_path
+        total_issues = sum(file_issues.values())
+        if total_issues > 0:
+            issue_parts = []
+            if file_issues['severe'] > 0:
+                issue_parts.append(f"严重:{file_issues['severe']}")
+            if file_issues['warning'] > 0:
+                issue_parts.append(f"警告:{file_issues['warning']}")
+            if file_issues['suggestion'] > 0:
+                issue_parts.append(f"建议:{file_issues['suggestion']}")
+            display_text += f"  ({', '.join(issue_parts)})"
+        if file_path in self.reused_files:
+            display_text += "  [共享]" if 'cluster' in self.reused_files[file_path] else "  [复用]"
+        return display_text
+
+    def _all_changes(self):
+        """合并后的变更描述，形如 "[文件] 描述" """
+        return [f"[{files_label(group.files)}] {group.text}" for group in self.change_groups]
+
+    def _render_summary(self, final=False):
+        """根据当前累计的统计刷新变更总结。
+
+        分析进行中最多每 SUMMARY_REFRESH_INTERVAL 秒刷新一次，避免大量文件时反复重绘。
+        """
+        now = time.monotonic()
+        if not final and now - self._summary_rendered_at < SUMMARY_REFRESH_INTERVAL:
+            return
+        self._summary_rendered_at = now
+        all_changes = self._all_changes()
+
         # 生成变更总结
         summary = "【变更总结】\n\n"
         
         # 1. 总体变更范围
         summary += "变更范围：\n"
-        summary += f"• 涉及文件数：{len(results)}个\n"
+        done_count = len(self.analysis_data)
+        if final or not self.total_files:
+            summary += f"• 涉及文件数：{done_count + len(self.unfinished_files) + len(self.skipped_files)}个\n"
+        else:
+            pending_total = self.total_files - len(self.skipped_files)
+            summary += f"• 已完成分析：{done_count}/{pending_total}个文件（其余文件仍在分析中）\n"
+        if self.skipped_files:
+            summary += f"• 已跳过：{len(self.skipped_files)}个（二进制、仅重命名、变更过大或生成的文件）\n"
+        if self.unfinished_files:
+            summary += f"• ⏳ 未完成分析：{len(self.unfinished_files)}个（已超时或取消，以下结果不完整）\n"
         if all_changes:
             unique_changes = list(set(all_changes))
             summary += f"• 变更操作数：{len(unique_changes)}处\n"
@@ -363,14 +586,12 @@ class MainWindow:
         
         # 3. 问题统计
         summary += "问题统计：\n"
-        severity_names = {'severe': '严重问题', 'warning': '警告', 'suggestion': '建议'}
-        type_names = {'security': '安全', 'standard': '规范'}
         
-        total_issues = sum(sum(type_stats.values()) for type_stats in stats_data.values())
+        total_issues = sum(sum(type_stats.values()) for type_stats in self.stats_data.values())
         if total_issues > 0:
             # 按类型统计
-            security_issues = sum(stats['security'] for stats in stats_data.values())
-            standard_issues = sum(stats['standard'] for stats in stats_data.values())
+            security_issues = sum(stats['security'] for stats in self.stats_data.values())
+            standard_issues = sum(stats['standard'] for stats in self.stats_data.values())
             
             if security_issues > 0:
                 summary += f"• 安全相关：发现{security_issues}个问题\n"
@@ -378,14 +599,14 @@ class MainWindow:
                 summary += f"• 规范相关：发现{standard_issues}个问题\n"
             
             # 按严重程度统计
-            for severity, type_stats in stats_data.items():
+            for severity, type_stats in self.stats_data.items():
                 total = sum(type_stats.values())
                 if total > 0:
-                    severity_name = severity_names[severity]
+                    severity_name = SEVERITY_NAMES[severity]
                     summary += f"• {severity_name}：{total}个\n"
                     for issue_type, count in type_stats.items():
                         if count > 0:
-                            summary += f"    - {type_names[issue_type]}：{count}个\n"
+                            summary += f"    - {TYPE_NAMES[issue_type]}：{count}个\n"
         else:
             summary += "• 未发现潜在问题\n"
         
@@ -398,9 +619,9 @@ class MainWindow:
                 summary += "• 存在代码规范问题，建议遵循最佳实践\n"
             
             # 根据问题严重程度给出建议
-            if stats_data['severe']['security'] > 0:
+            if self.stats_data['severe']['security'] > 0:
                 summary += "• ⚠️ 发现严重安全问题，强烈建议修复后再提交\n"
-            elif stats_data['severe']['standard'] > 0:
+            elif self.stats_data['severe']['standard'] > 0:
                 summary += "• ⚠️ 发现严重规范问题，建议仔细审查\n"
         else:
             summary += "• 代码变更符合规范，未发现潜在风险\n"
@@ -408,11 +629,6 @@ class MainWindow:
         # 更新总结文本
         self.summary_text.delete('1.0', tk.END)
         self.summary_text.insert('1.0', summary)
-        
-        # 生成提交信息
-        commit_message = self.generate_commit_message(all_changes, stats_data)
-        self.commit_message.delete('1.0', tk.END)
-        self.commit_message.insert('1.0', commit_message)
 
     def generate_commit_message(self, all_changes, stats_data):
         """生成Git提交信息"""
@@ -488,7 +704,7 @@ class MainWindow:
         self.commit_button = ttk.Button(button_frame, text="提交", command=self.do_commit)
         self.commit_button.pack(side=tk.LEFT, padx=5)
         
-        ttk.Button(button_frame, text="取消", command=self.root.destroy).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="取消", command=self.cancel_analysis).pack(side=tk.LEFT, padx=5)
 
     def configure_grid(self, frame):
         """配置网格布局权重。
@@ -518,75 +734,152 @@ class MainWindow:
         
         在后台线程中执行以下操作：
         1. 获取变更文件列表
-        2. 分析每个文件的变更
-        3. 生成提交信息建议
-        4. 更新UI显示结果
+        2. 收集差异后立即开始生成提交信息，同时并发分析每个文件的变更，
+           每个文件完成时立即显示其结果
+        3. 更新UI显示最终总结
+        
+        点击"取消"会中止进行中的请求；超过整体截止时间时展示已完成的部分结果。
         """
+        config = self.git_assistant.config
+        self.cancel_token = CancelToken(deadline=config.run_timeout or None)
+        
+        # 分析线程不直接操作控件，所有界面更新经 _on_ui_thread 排队后在 Tk 主线程中按顺序执行
+        ui = self._on_ui_thread
+        set_progress = ui(self.progress_var.set)
+        update_status = ui(self.update_status)
+
+        def finish(run, total_files, cancel_token):
+            with stage('rendering'):
+                self.finish_results(run['unfinished'])
+
+            self.progress_var.set(100)
+            usage = self._budget_note(run['budget'])
+            if cancel_token.cancelled:
+                note = "" if self.ai_commit_message else "，提交信息已使用本地摘要"
+                reason = "运行预算已用尽" if cancel_token.reason == 'budget' else "已超过截止时间"
+                self.update_status(
+                    f"{reason}，显示部分结果（{len(run['unfinished'])}/{total_files} 个文件未完成）{note}{usage}"
+                )
+                return
+            if self.ai_commit_message is None:
+                self.update_status("生成提交信息失败，已使用本地摘要" + self._queue_wait_note() + usage)
+                return
+
+            self.update_status("分析完成！" + self._queue_wait_note() + usage)
+
+        def fail(error):
+            self.update_status(f"错误: {str(error)}")
+            messagebox.showerror("错误", str(error))
+            self.root.destroy()
+
         def analyze():
+            cancel_token = self.cancel_token
             try:
                 logger.info("开始分析代码变更")
-                self.progress_var.set(0)
-                self.update_status("正在检测文件变更...")
+                set_progress(0)
+                update_status("正在检测文件变更...")
                 
-                modified_files = self.git_assistant.get_modified_files()
+                with stage('detection'):
+                    modified_files = self.git_assistant.get_modified_files()
                 
                 if not modified_files:
                     logger.info("没有检测到文件变更")
-                    self.progress_var.set(100)
-                    self.show_analysis_result([{
-                        'file': 'No changes',
-                        'suggestions': json.dumps({'message': '没有检测到任何文件更改。'}, ensure_ascii=False)
-                    }])
+                    set_progress(100)
+                    ui(self.show_analysis_result)([
+                        FileResult.from_suggestions('No changes', {'message': '没有检测到任何文件更改。'})
+                    ])
                     return
 
                 total_files = len(modified_files)
                 logger.info(f"检测到 {total_files} 个变更文件")
-                self.update_status(f"检测到 {total_files} 个文件需要分析")
-                
-                analysis_results = []
-                diffs = []
+                update_status(f"检测到 {total_files} 个文件需要分析")
                 
-                for index, file_path in enumerate(modified_files, 1):
-                    progress = (index / (total_files + 1)) * 100  # +1 为最后的提交消息生成预留进度
-                    self.progress_var.set(progress)
-                    
-                    self.update_status(f"正在分析文件 ({index}/{total_files}): {file_path}")
-                    logger.debug(f"分析文件: {file_path}")
-                    
-                    diff_content = self.git_assistant.get_file_diff(file_path)
-                    diffs.append(f"File: {file_path}\n{diff_content}")
-                    
-                    suggestions = self.ai_analyzer.analyze_changes(file_path, diff_content)
-                    # 确保suggestions是JSON格式
-                    if isinstance(suggestions, str):
-                        try:
-                            suggestions = json.loads(suggestions)
-                        except json.JSONDecodeError:
-                            suggestions = {'analysis': suggestions}
-                    
-                    analysis_results.append({
-                        'file': file_path,
-                        'suggestions': json.dumps(suggestions, ensure_ascii=False)
-                    })
+                estimate = []
+
+                def on_estimate(plan):
+                    estimate.append(plan.describe())
+                    update_status(f"检测到 {total_files} 个文件需要分析\n{estimate[0]}")
 
-                self.update_status("正在生成提交信息...")
-                self.show_analysis_result(analysis_results)
+                def on_progress(done_count, total, file_path):
+                    set_progress((done_count / total) * 100)
+                    status = f"已完成分析 ({done_count}/{total}): {file_path}"
+                    update_status(f"{status}\n{estimate[0]}" if estimate else status)
                 
-                logger.info("生成提交信息")
-                commit_message = self.ai_analyzer.generate_commit_message(diffs)
-                self.commit_message.delete('1.0', tk.END)
-                self.commit_message.insert('1.0', commit_message)
+                # 每个文件完成时立即展示其结果，无需等待最慢的文件；
+                # 提交信息在差异收集完成后即开始生成，到达后立即填入提交信息框
+                ui(self.reset_results)(total_files)
+                run = self.pipeline.run(
+                    modified_files, cancel_token, on_progress=on_progress,
+                    on_result=ui(self.add_file_result), on_skipped=ui(self.add_skipped_file),
+                    on_commit_message=ui(self.show_ai_commit_message), on_estimate=on_estimate,
+                    on_secret_findings=ui(self.add_secret_findings)
+                )
+                if run['cancelled'] and not cancel_token.expired:
+                    # 用户取消，窗口已关闭
+                    return
                 
-                self.progress_var.set(100)
-                self.update_status("分析完成！")
+                # 结果对象和差异文本已逐个交给界面和提交信息请求，不再保留
+                run.pop('diffs')
+                run.pop('results')
+                ui(finish)(run, total_files, cancel_token)
                 
             except Exception as e:
+                if cancel_token.cancelled and not cancel_token.expired:
+                    logger.info("分析已取消")
+                    return
                 logger.exception("分析过程中发生错误")
-                self.update_status(f"错误: {str(e)}")
-                messagebox.showerror("错误", str(e))
-                self.root.destroy()
+                ui(fail)(e)
+            finally:
+                cancel_token.close()
         
-        threading.Thread(target=analyze, daemon=True).start()
+        threading.Thread(target=analyze, name='git-llm-analysis', daemon=True).start()
+
+    def _on_ui_thread(self, func):
+        """包装后台线程使用的回调，调用时只把调用排入队列，由 Tk 主线程按顺序执行。
+
+        Tk 控件和文件列表的行号索引只能在主线程中修改，否则会与筛选等界面操作竞争。
+        """
+        def call(*args, **kwargs):
+            self._ui_queue.put((func, args, kwargs))
+        return call
+
+    def _drain_ui_queue(self):
+        """在 Tk 主线程中执行后台线程排入的界面更新，之后定时再次检查"""
+        try:
+            while True:
+                try:
+                    func, args, kwargs = self._ui_queue.get_nowait()
+                except queue.Empty:
+                    break
+                func(*args, **kwargs)
+        finally:
+            try:
+                self.root.after(UI_POLL_INTERVAL, self._drain_ui_queue)
+            except tk.TclError:
+                # 窗口已关闭
+                pass
+
+    def _queue_wait_note(self):
+        """根据调度器统计生成排队等待说明，没有明显排队时返回空字符串"""
+        observations = metrics.snapshot()['observations']
+        waits = [obs for name, obs in observations.items() if name.startswith('scheduler.queue_wait.')]
+        count = sum(obs['count'] for obs in waits)
+        total = sum(obs['total'] for obs in waits)
+        if not count or total / count < 0.1:
+            return ""
+        return f"（受限流影响，请求平均排队 {total / count:.1f} 秒）"
+
+    @staticmethod
+    def _budget_note(budget):
+        """运行结束后的实际用量与预估对比，作为状态栏第二行"""
+        return f"\n实际 {budget['actual'].describe()}（{budget['plan'].describe()}）"
+
+    def cancel_analysis(self):
+        """取消进行中的分析并关闭窗口"""
+        token = getattr(self, 'cancel_token', None)
+        if token is not None:
+            token.cancel('cancelled')
+        self.root.destroy()
 
     def show_detail_menu(self, event):
         """显示详细信息的右键菜单。
@@ -633,15 +926,14 @@ class MainWindow:
         for tag in tags:
             if tag.startswith("file_"):
                 file_path = tag[5:]  # 移除 "file_" 前缀
-                # 在文件列表中查找并选中对应文件
-                for i in range(self.file_list.size()):
-                    display_text = self.file_list.get(i)
-                    list_file_path = display_text.split("  (")[0] if "  (" in display_text else display_text
-                    if list_file_path == file_path:
-                        self.file_list.selection_clear(0, tk.END)
-                        self.file_list.selection_set(i)
-                        self.file_list.see(i)
-                        # 触发文件详情显示
-                        self.show_file_detail(None)
-                        break
+                # 在文件列表中选中对应文件，被筛选隐藏时先清除筛选
+                if file_path not in self.file_rows and not self.active_filter.empty:
+                    self.clear_filter()
+                row = self.file_rows.get(file_path)
+                if row is not None:
+                    self.file_list.selection_clear(0, tk.END)
+                    self.file_list.selection_set(row)
+                    self.file_list.see(row)
+                    # 触发文件详情显示
+                    self.show_file_detail(None)
                 break 
\ No newline at end of file
@@ -6,6 +6,22 @@ from .logger import Logger
 logger = Logger(__name__)
 
 class Config:
+    # 命令行参数等进程内设置，每次加载 .env 后重新应用，优先于 .env 中的同名变量
+    _overrides = {}
+
+    @classmethod
+    def override(cls, name, value):
+        """设置优先于 .env 的环境变量，之后创建的 Config 都会使用该值。
+
+        .env 以覆盖模式加载，直接修改 os.environ 的值会在创建 Config 时被 .env 覆盖。
+
+        Args:
+            name (str): 环境变量名，例如 'GIT_LLM_STAGED_ONLY'
+            value (str): 变量值
+        """
+        cls._overrides[name] = value
+        os.environ[name] = value
+
     def __init__(self):
         logger.info("初始化配置...")
         self.project_root = self._find_project_root()
@@ -32,12 +48,23 @@ class Config:
                 )
 
         load_dotenv(env_path, override=True)
+        os.environ.update(self._overrides)
         logger.info("已加载环境变量配置")
         
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         self.openai_api_base = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
-        
-        if not self.openai_api_key:
+        self.openai_model = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo-1106')  # 需要支持 JSON 模式
+
+        # 请求后端：openai 直接调用；record 调用并录制到磁带；replay 离线回放磁带
+        self.backend = (os.getenv('GIT_LLM_BACKEND') or 'openai').strip().lower()
+        if self.backend not in ('openai', 'record', 'replay'):
+            logger.warning(f"未知的后端: {self.backend}，使用 openai")
+            self.backend = 'openai'
+        self.cassette_path = os.getenv('GIT_LLM_CASSETTE') or str(self.project_root / 'cassettes' / 'git-llm.jsonl')
+        self.replay_timing = (os.getenv('GIT_LLM_REPLAY_TIMING') or 'instant').strip().lower()
+
+        # 回放模式完全离线，不需要 API Key
+        if not self.openai_api_key and self.backend != 'replay':
             logger.error("未找到 OPENAI_API_KEY")
             raise ValueError(
                 "OPENAI_API_KEY 未在 .env 文件中设置！\n"
@@ -46,6 +73,128 @@ class Config:
         logger.info(f"使用 API KEY： {self.api_key}")
         logger.info(f"使用 API Base URL: {self.openai_api_base}")
 
+        # 后台守护进程与缓存配置
+        self.daemon_socket = os.getenv('GIT_LLM_DAEMON_SOCKET') or self._default_daemon_socket()
+        self.cache_size = self._get_env_int('GIT_LLM_CACHE_SIZE', 256)
+
+        # 并发分析的最大工作线程数
+        self.max_workers = max(1, self._get_env_int('GIT_LLM_MAX_WORKERS', 4))
+
+        # 限流配置：每分钟请求数与 token 数上限，0 表示不限制
+        self.requests_per_minute = self._get_env_int('GIT_LLM_RPM', 0)
+        self.tokens_per_minute = self._get_env_int('GIT_LLM_TPM', 0)
+
+        # 超时配置（秒）：单个请求超时与整次运行的截止时间，0 表示不限制
+        self.request_timeout = self._get_env_float('GIT_LLM_REQUEST_TIMEOUT', 60.0)
+        self.run_timeout = self._get_env_float('GIT_LLM_RUN_TIMEOUT', 0.0)
+
+        # 近似重复建议合并的相似度阈值（0~1），0 表示只合并完全相同的文本
+        self.dedup_threshold = self._get_env_float('GIT_LLM_DEDUP_THRESHOLD', 0.8)
+
+        # 分析结果持久化存储（默认位于仓库的 .git/git-llm/results.db）
+        self.result_store_path = os.getenv('GIT_LLM_RESULT_STORE') or None
+        self.reuse_results = self._get_env_bool('GIT_LLM_REUSE_RESULTS', True)
+
+        # 本次运行内机械相似差异的聚类阈值（0~1），每组只分析一个代表文件，0 表示关闭
+        self.cluster_threshold = self._get_env_float('GIT_LLM_CLUSTER_THRESHOLD', 0.85)
+
+        # 本地密钥与凭证扫描：是否开启、额外规则文件（每行 "名称: 正则"）、熵检查阈值（0 表示关闭熵检查）
+        self.secret_scan = self._get_env_bool('GIT_LLM_SECRET_SCAN', True)
+        self.secret_patterns_file = os.getenv('GIT_LLM_SECRET_PATTERNS_FILE') or None
+        self.secret_entropy = self._get_env_float('GIT_LLM_SECRET_ENTROPY', 4.5)
+
+        # 复用近似重复差异历史结果的相似度阈值（0~1，MinHash 估计），0 表示关闭（需要结果存储）
+        self.similar_threshold = self._get_env_float('GIT_LLM_SIMILAR_THRESHOLD', 0.9)
+
+        # 按差异块缓存分析结果，大文件局部修改时只分析变化的差异块（需要结果存储）
+        self.hunk_cache = self._get_env_bool('GIT_LLM_HUNK_CACHE', True)
+
+        # 只分析和提交暂存区（git diff --cached）中的修改
+        self.staged_only = self._get_env_bool('GIT_LLM_STAGED_ONLY', False)
+
+        # 分拣：变更行数超过上限的文件不发送给模型，0 表示不限制
+        self.max_diff_lines = self._get_env_int('GIT_LLM_MAX_DIFF_LINES', 2000)
+        # 生成文件的路径模式（逗号分隔的通配符），为空时使用内置模式
+        self.generated_patterns = self._get_env_patterns('GIT_LLM_GENERATED_PATTERNS')
+
+        # 分析队列的排序策略：small-first、risk-first、longest-first 或 none
+        self.order_policy = (os.getenv('GIT_LLM_ORDER') or 'small-first').strip().lower()
+        # 高风险路径模式（逗号分隔的通配符，不区分大小写），为空时使用内置模式
+        self.risk_patterns = self._get_env_patterns('GIT_LLM_RISK_PATTERNS')
+
+        # 符号索引为每个差异块附加所在函数签名和调用的定义，单个差异块的上下文 token 预算，0 表示不附加
+        self.context_tokens = self._get_env_int('GIT_LLM_CONTEXT_TOKENS', 300)
+
+        # 提交信息与逐文件分析并发生成；开启后在分析完成时结合审查结论再完善一次
+        self.refine_commit_message = self._get_env_bool('GIT_LLM_REFINE_COMMIT_MESSAGE', False)
+
+        # 单次运行预算：token 与费用上限（0 表示不限制），时间上限即 GIT_LLM_RUN_TIMEOUT
+        self.max_run_tokens = self._get_env_int('GIT_LLM_MAX_RUN_TOKENS', 0)
+        self.max_run_cost = self._get_env_float('GIT_LLM_MAX_RUN_COST', 0.0)
+        # 每 1K 输入/输出 token 的单价（美元），用于费用预估，0 表示不计算费用
+        self.input_price = self._get_env_float('GIT_LLM_PRICE_INPUT', 0.0)
+        self.output_price = self._get_env_float('GIT_LLM_PRICE_OUTPUT', 0.0)
+        # 完整分析单个请求的预计耗时（秒），本进程已有请求时改用实测平均值
+        self.expected_latency = self._get_env_float('GIT_LLM_EXPECTED_LATENCY', 8.0)
+        # 超出预算时允许的降级方式（逗号分隔，按 compact、summary、sample 的顺序尝试）
+        self.budget_steps = self._get_env_patterns('GIT_LLM_BUDGET_STEPS') or ('compact', 'summary', 'sample')
+
+        # 尾延迟对冲：请求耗时超过同类请求的该百分位（如 95）时再发出一个相同请求，0 表示关闭
+        self.hedge_percentile = self._get_env_float('GIT_LLM_HEDGE_PERCENTILE', 0.0)
+        # 发出对冲请求前至少等待的秒数
+        self.hedge_min_delay = self._get_env_float('GIT_LLM_HEDGE_MIN_DELAY', 2.0)
+        # 熔断：最近 GIT_LLM_BREAKER_WINDOW 个请求的错误率达到阈值时，剩余请求立即失败，冷却后探测恢复
+        self.breaker_threshold = self._get_env_float('GIT_LLM_BREAKER_THRESHOLD', 0.5)
+        self.breaker_window = max(1, self._get_env_int('GIT_LLM_BREAKER_WINDOW', 20))
+        self.breaker_cooldown = self._get_env_float('GIT_LLM_BREAKER_COOLDOWN', 30.0)
+
+        # 团队共享的远程结果缓存（python main.py --cache-server 启动），未设置地址时不使用
+        self.remote_cache_url = os.getenv('GIT_LLM_REMOTE_CACHE_URL') or None
+        self.remote_cache_token = os.getenv('GIT_LLM_REMOTE_CACHE_TOKEN') or None
+        self.remote_cache_timeout = self._get_env_float('GIT_LLM_REMOTE_CACHE_TIMEOUT', 5.0)
+        # 是否把新的分析结果写回远程缓存，例如只允许 CI 写入时在开发者机器上关闭
+        self.remote_cache_write = self._get_env_bool('GIT_LLM_REMOTE_CACHE_WRITE', True)
+
+    def _get_env_int(self, name, default):
+        """读取整数类型的环境变量，非法值时回退到默认值"""
+        value = os.getenv(name)
+        if value is None or value.strip() == '':
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            logger.warning(f"环境变量 {name} 的值无效: {value}，使用默认值 {default}")
+            return default
+
+    def _get_env_float(self, name, default):
+        """读取浮点类型的环境变量，非法值时回退到默认值"""
+        value = os.getenv(name)
+        if value is None or value.strip() == '':
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            logger.warning(f"环境变量 {name} 的值无效: {value}，使用默认值 {default}")
+            return default
+
+    def _get_env_bool(self, name, default):
+        """读取布尔类型的环境变量"""
+        value = os.getenv(name)
+        if value is None or value.strip() == '':
+            return default
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+    def _get_env_patterns(self, name):
+        """读取逗号分隔的通配符列表，未设置时返回 None"""
+        value = os.getenv(name, '')
+        return tuple(p.strip() for p in value.split(',') if p.strip()) or None
+
+    def _default_daemon_socket(self):
+        """默认的守护进程套接字路径（按用户区分）"""
+        import tempfile
+        uid = os.getuid() if hasattr(os, 'getuid') else 0
+        return os.path.join(tempfile.gettempdir(), f'git-llm-{uid}.sock')
+
     def _load_ignore_patterns(self):
         """加载忽略文件配置"""
         self.ignore_patterns = set()
@@ -138,4 +287,8 @@ Thumbs.db'''
 
     @property
     def api_base(self):
-        return self.openai_api_base 
\ No newline at end of file
+        return self.openai_api_base
+
+    @property
+    def model(self):
+        return self.openai_model 
\ No newline at end of file
@@ -3,6 +3,11 @@ import sys
 from pathlib import Path
 from datetime import datetime
 
+# 控制台日志输出的流，所有 Logger 共用
+_console_stream = sys.stdout
+_console_handlers = []
+
+
 """日志管理类，提供统一的日志记录功能。
 
 此类封装了Python的logging模块，提供:
@@ -41,8 +46,9 @@ class Logger:
         file_handler.setLevel(logging.DEBUG)
         
         # 控制台处理器 - 只记录INFO及以上级别
-        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler = logging.StreamHandler(_console_stream)
         console_handler.setLevel(logging.INFO)
+        _console_handlers.append(console_handler)
         
         # 设置日志格式
         formatter = logging.Formatter(
@@ -55,6 +61,20 @@ class Logger:
         self.logger.addHandler(file_handler)
         self.logger.addHandler(console_handler)
 
+    @staticmethod
+    def set_console_stream(stream):
+        """切换控制台日志输出的流，已创建和之后创建的日志记录器都会生效。
+
+        标准输出用于写出导出结果等数据时，将控制台日志改到标准错误，避免混入数据。
+
+        Args:
+            stream: 文本流，例如 sys.stderr
+        """
+        global _console_stream
+        _console_stream = stream
+        for handler in _console_handlers:
+            handler.setStream(stream)
+
     def debug(self, msg, *args, **kwargs):
         """记录debug级别日志。
 
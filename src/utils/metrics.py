@@ -0,0 +1,55 @@
+import threading
+
+"""进程内运行指标统计。
+
+此类以线程安全的方式记录计数和耗时，提供：
+1. 计数器（increment）
+2. 耗时/数值观测（observe），汇总次数、总和与最大值
+3. 快照与文本摘要，用于日志和界面展示
+"""
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._observations = {}
+
+    def increment(self, name, value=1):
+        """累加计数器"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        """记录一次观测值（如排队等待秒数）"""
+        with self._lock:
+            count, total, maximum = self._observations.get(name, (0, 0.0, 0.0))
+            self._observations[name] = (count + 1, total + value, max(maximum, value))
+
+    def snapshot(self):
+        """返回当前指标的副本"""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'observations': {
+                    name: {'count': count, 'total': total, 'max': maximum, 'avg': total / count if count else 0.0}
+                    for name, (count, total, maximum) in self._observations.items()
+                }
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+
+    def summary(self):
+        """生成便于记录到日志的单行摘要"""
+        snapshot = self.snapshot()
+        parts = [f"{name}={value}" for name, value in sorted(snapshot['counters'].items())]
+        parts.extend(
+            f"{name}: n={obs['count']} avg={obs['avg']:.3f} max={obs['max']:.3f}"
+            for name, obs in sorted(snapshot['observations'].items())
+        )
+        return ', '.join(parts)
+
+
+# 进程级共享的指标实例
+metrics = Metrics()
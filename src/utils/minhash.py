@@ -0,0 +1,107 @@
+import re
+import struct
+import hashlib
+
+"""MinHash 签名与 LSH 分桶工具，用于在近线性时间内查找近似重复的文本。
+
+签名的每一位来自一次 blake2b 哈希的不同片段，哈希计算和按位取最小值都在 C 层完成，
+在数万条短文本上也能快速完成；签名与进程无关，可以持久化保存。
+"""
+
+NUM_PERM = 32
+BANDS = 16
+
+_UNPACK = struct.Struct(f'<{NUM_PERM}H').unpack
+_PUNCT_RE = re.compile(r'[\s\W_]+', re.UNICODE)
+_DIGIT_RE = re.compile(r'\d+')
+
+
+def normalize_text(text, remove=()):
+    """归一化文本：去除指定片段、空白和标点，数字统一替换为 0"""
+    text = text.lower()
+    for fragment in remove:
+        if fragment:
+            text = text.replace(fragment.lower(), ' ')
+    text = _DIGIT_RE.sub('0', text)
+    return _PUNCT_RE.sub('', text)
+
+
+def shingles(text, size=2):
+    """将文本切分为字符 n-gram 集合（对中文同样有效）"""
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def signature(shingle_set):
+    """计算 MinHash 签名。
+
+    Args:
+        shingle_set (set): 字符串集合
+
+    Returns:
+        tuple: 长度为 NUM_PERM 的整数元组
+    """
+    if not shingle_set:
+        shingle_set = {''}
+    rows = [
+        _UNPACK(hashlib.blake2b(item.encode('utf-8'), digest_size=NUM_PERM * 2).digest())
+        for item in shingle_set
+    ]
+    return tuple(map(min, zip(*rows)))
+
+
+def text_signature(text, remove=(), size=2):
+    """归一化文本并计算其 MinHash 签名"""
+    return signature(shingles(normalize_text(text, remove), size))
+
+
+def similarity(sig_a, sig_b):
+    """根据两个签名估计 Jaccard 相似度"""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def band_keys(sig, bands=BANDS):
+    """将签名切分为 LSH 分桶键，任一分桶相同即为候选对。
+
+    分桶越多（每桶行数越少），低相似度的候选对越容易被召回。
+    """
+    rows = len(sig) // bands
+    return [(band, sig[band * rows:(band + 1) * rows]) for band in range(bands)]
+
+
+def cluster(signatures, threshold, bands=BANDS):
+    """将相似度不低于阈值的签名聚类。
+
+    每个 LSH 分桶只与桶内第一个成员比较，整体复杂度近似线性。
+
+    Args:
+        signatures (list): 签名列表
+        threshold (float): 相似度阈值（0~1）
+        bands (int): LSH 分桶数
+
+    Returns:
+        list: 聚类结果，每个元素为按原始顺序排列的下标列表
+    """
+    parent = list(range(len(signatures)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets = {}
+    for index, sig in enumerate(signatures):
+        for key in band_keys(sig, bands):
+            leader = buckets.setdefault(key, index)
+            if leader == index:
+                continue
+            root_a, root_b = find(leader), find(index)
+            if root_a != root_b and similarity(signatures[leader], sig) >= threshold:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups = {}
+    for index in range(len(signatures)):
+        groups.setdefault(find(index), []).append(index)
+    return sorted(groups.values(), key=lambda members: members[0])
@@ -0,0 +1,306 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+"""按阶段的性能剖析。
+
+流水线在各阶段边界调用 stage(name)（检测 detection、分拣 triage、差异 diffing、
+符号索引 indexing、分析 analysis、提交信息 commit、渲染 rendering）。未启用剖析器时 stage 只是一个空的上下文管理器；
+通过 enable() 注册剖析器后，每个阶段开始和结束时都会通知剖析器：
+1. MemoryProfiler: 记录每个阶段的 tracemalloc 当前/峰值内存、进程 RSS 以及分配最多的调用位置
+2. CpuProfiler: 每个阶段输出 cProfile 的 pstats 文件，以及按线程采样得到的折叠调用栈（可用于火焰图）
+"""
+
+_profilers = []
+_profilers_lock = threading.Lock()
+
+
+def enable(profiler):
+    """注册剖析器，之后的阶段边界都会通知它"""
+    with _profilers_lock:
+        if profiler not in _profilers:
+            _profilers.append(profiler)
+
+
+def disable(profiler):
+    """注销剖析器"""
+    with _profilers_lock:
+        if profiler in _profilers:
+            _profilers.remove(profiler)
+
+
+@contextmanager
+def stage(name):
+    """标记一个阶段，未启用剖析器时没有任何开销"""
+    with _profilers_lock:
+        profilers = list(_profilers)
+    if not profilers:
+        yield
+        return
+    for profiler in profilers:
+        profiler.enter(name)
+    try:
+        yield
+    finally:
+        for profiler in reversed(profilers):
+            profiler.exit(name)
+
+
+def current_rss():
+    """当前进程的常驻内存（字节），无法获取时返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # 没有 /proc 时只能得到峰值 RSS（macOS 单位为字节，Linux 为 KiB）
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if os.uname().sysname == 'Darwin' else maxrss * 1024
+
+
+class StageMemory:
+    """单个阶段的内存记录"""
+
+    __slots__ = ('name', 'seconds', 'current', 'peak', 'rss', 'top')
+
+    def __init__(self, name, seconds, current, peak, rss, top):
+        self.name = name
+        self.seconds = seconds
+        self.current = current  # 阶段结束时 tracemalloc 跟踪的内存
+        self.peak = peak        # 阶段内的峰值
+        self.rss = rss          # 阶段结束时的进程 RSS，无法获取时为 None
+        self.top = top          # [(调用位置, 新增字节数, 新增块数), ...]
+
+    def to_dict(self):
+        return {
+            'name': self.name, 'seconds': self.seconds, 'current': self.current,
+            'peak': self.peak, 'rss': self.rss,
+            'top': [{'site': site, 'size': size, 'count': count} for site, size, count in self.top]
+        }
+
+
+class MemoryProfiler:
+    """在阶段边界记录 tracemalloc 快照和 RSS。
+
+    每个阶段开始时重置 tracemalloc 峰值并保存快照，结束时与开始快照比较，
+    得到该阶段新增内存最多的调用位置。
+    """
+
+    # 不计入调用位置统计的内部帧
+    _IGNORED = (tracemalloc.__file__, '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>')
+
+    def __init__(self, top=10, frames=1):
+        """
+        Args:
+            top (int): 每个阶段保留的调用位置数量
+            frames (int): tracemalloc 保存的调用栈深度，大于 1 时调用位置按完整调用栈统计
+        """
+        self.top = top
+        self.frames = frames
+        self.stages = []
+        self._started_tracing = False
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        enable(self)
+
+    def stop(self):
+        disable(self)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def enter(self, name):
+        traced = tracemalloc.get_traced_memory()[0]
+        before = self._snapshot()
+        # 快照本身在阶段内一直占用内存，结束时从当前值和峰值中扣除
+        overhead = tracemalloc.get_traced_memory()[0] - traced
+        tracemalloc.reset_peak()
+        with self._lock:
+            self._open[name] = (time.perf_counter(), before, overhead)
+
+    def exit(self, name):
+        ended_at = time.perf_counter()
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            started_at, before, overhead = self._open.pop(name, (None, None, 0))
+        current -= overhead
+        peak -= overhead
+        after = self._snapshot()
+        top = []
+        if before is not None:
+            key_type = 'traceback' if self.frames > 1 else 'lineno'
+            for stat in after.compare_to(before, key_type)[:self.top]:
+                if stat.size_diff <= 0:
+                    break
+                site = ' <- '.join(f"{frame.filename}:{frame.lineno}" for frame in stat.traceback)
+                top.append((site, stat.size_diff, stat.count_diff))
+        seconds = ended_at - started_at if started_at is not None else 0.0
+        with self._lock:
+            self.stages.append(StageMemory(name, seconds, current, peak, current_rss(), top))
+
+    def _snapshot(self):
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces([tracemalloc.Filter(False, pattern) for pattern in self._IGNORED])
+
+    def report(self):
+        """生成文本报告"""
+        lines = [f"{'阶段':<12}{'耗时(s)':>10}{'当前(MiB)':>12}{'峰值(MiB)':>12}{'RSS(MiB)':>12}"]
+        for record in self.stages:
+            rss = f"{record.rss / 1048576:.1f}" if record.rss is not None else '-'
+            lines.append(
+                f"{record.name:<12}{record.seconds:>10.2f}{record.current / 1048576:>12.1f}"
+                f"{record.peak / 1048576:>12.1f}{rss:>12}"
+            )
+        for record in self.stages:
+            if not record.top:
+                continue
+            lines.append("")
+            lines.append(f"[{record.name}] 新增内存最多的调用位置:")
+            lines.extend(
+                f"  {size / 1024:10.1f} KiB {count:>8} 块  {site}" for site, size, count in record.top
+            )
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {'stages': [record.to_dict() for record in self.stages]}
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class CpuProfiler:
+    """按阶段记录 CPU 时间分布。
+
+    每个阶段在进入它的线程上运行 cProfile，结束时写出 <序号>-<阶段>.pstats；
+    解释器支持 sys._current_frames 时，另有一个采样线程定期采集所有线程的调用栈，
+    以线程名为根节点写出 <阶段>.collapsed（每行 "帧;帧;... 次数"，可直接交给
+    flamegraph.pl 或 speedscope），覆盖线程池中工作线程的耗时。
+    """
+
+    def __init__(self, output_dir, interval=0.005, sampling=None):
+        """
+        Args:
+            output_dir (str): 输出目录，不存在时自动创建
+            interval (float): 采样间隔（秒）
+            sampling (bool): 是否启用采样，默认在解释器支持时启用
+        """
+        self.output_dir = output_dir
+        self.interval = interval
+        self.sampling = hasattr(sys, '_current_frames') if sampling is None else sampling
+        self.files = []
+        self._timings = []
+        self._active = []  # [(阶段, cProfile.Profile 或 None, 开始时间)]
+        self._samples = {}  # 阶段 -> Counter(折叠调用栈 -> 次数)
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.sampling:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, name='git-llm-profiler', daemon=True)
+            self._sampler.start()
+        enable(self)
+
+    def stop(self):
+        """停止剖析并写出采样结果，返回生成的文件列表"""
+        disable(self)
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        with self._lock:
+            samples, self._samples = self._samples, {}
+        for name, counter in samples.items():
+            path = os.path.join(self.output_dir, f"{name}.collapsed")
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in counter.most_common():
+                    f.write(f"{stack} {count}\n")
+            self.files.append(path)
+        return self.files
+
+    def enter(self, name):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 同一时刻只能有一个 cProfile 生效（如阶段在多个线程中重叠），此时只保留采样
+            profile = None
+        with self._lock:
+            self._active.append((name, profile, time.perf_counter()))
+
+    def exit(self, name):
+        ended_at = time.perf_counter()
+        with self._lock:
+            for index in range(len(self._active) - 1, -1, -1):
+                if self._active[index][0] == name:
+                    _, profile, started_at = self._active.pop(index)
+                    break
+            else:
+                return
+            self._sequence += 1
+            sequence = self._sequence
+            self._timings.append((name, ended_at - started_at))
+        if profile is None:
+            return
+        profile.disable()
+        path = os.path.join(self.output_dir, f"{sequence:02d}-{name}.pstats")
+        profile.dump_stats(path)
+        self.files.append(path)
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                if not self._active:
+                    continue
+                # 重叠时归入最近进入的阶段
+                name = self._active[-1][0]
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(thread_names.get(ident, f"thread-{ident}"))
+                stacks.append(';'.join(reversed(labels)))
+            with self._lock:
+                self._samples.setdefault(name, Counter()).update(stacks)
+
+    def report(self, limit=10):
+        """生成文本报告：各阶段耗时及 cProfile 累计耗时最多的函数"""
+        lines = [f"{'阶段':<12}{'耗时(s)':>10}"]
+        lines.extend(f"{name:<12}{seconds:>10.2f}" for name, seconds in self._timings)
+        for path in self.files:
+            if not path.endswith('.pstats'):
+                continue
+            lines.append("")
+            lines.append(f"[{os.path.basename(path)}] 累计耗时最多的函数:")
+            stats = pstats.Stats(path)
+            entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+            for (filename, lineno, function), (_, calls, _, cumulative, _) in entries:
+                lines.append(f"  {cumulative:8.3f}s {calls:>8}  {function} ({os.path.basename(filename)}:{lineno})")
+        lines.append("")
+        lines.append(f"输出目录: {self.output_dir}")
+        return '\n'.join(lines)
@@ -0,0 +1,43 @@
+import re
+
+"""本地 token 数估算。
+
+不依赖分词器，按字符类别粗略估算：中日韩字符约 1 个 token，
+其余字符约 4 个字符 1 个 token。用于限流、预算等只需要量级准确的场景。
+"""
+
+# 每条消息的额外开销（角色、分隔符等）
+MESSAGE_OVERHEAD = 4
+
+_CJK_RE = re.compile(
+    '[　-〿぀-ヿ㐀-䶿一-鿿가-힯＀-￯]'
+)
+
+
+def estimate_tokens(text):
+    """估算文本的 token 数"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def estimate_messages_tokens(messages):
+    """估算聊天消息列表的 token 数"""
+    return sum(estimate_tokens(message.get('content', '')) + MESSAGE_OVERHEAD for message in messages)
+
+
+def truncate_tokens(text, max_tokens):
+    """把文本按行截断到约 max_tokens 个 token，截断时在末尾注明省略的行数"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    lines = text.splitlines(keepends=True)
+    kept = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line)
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return ''.join(kept) + f"\n... 已截断，省略 {len(lines) - len(kept)} 行\n"
@@ -0,0 +1,72 @@
+import re
+import subprocess
+
+from benchmarks.synthetic import SyntheticConfig
+from src.core.git_assistant import GitAssistant
+from src.core.hunks import join_hunks, split_tagged_suggestions
+from src.core.pipeline import AnalysisPipeline
+from src.core.result_store import ResultStore
+
+LINES = [f"line_{i} = {i}" for i in range(200)]
+
+
+class HunkAnalyzer:
+    """为每个差异块的新增行给出一条问题，差异块带编号时按编号标注"""
+
+    def __init__(self):
+        self.requests = []
+
+    def analyze_changes(self, file_path, diff_content, cancel_token=None, priority=None, context=None,
+                        detail='full', tag_hunks=False):
+        issues = []
+        tag = ''
+        for line in diff_content.splitlines():
+            marker = re.match(r'\[差异块 (\d+)\]$', line)
+            if marker:
+                tag = f"{line} "
+            elif line.startswith('+') and not line.startswith('+++'):
+                issues.append(f"{tag if tag_hunks else ''}检查 {line[1:]}")
+        self.requests.append(len(issues))
+        return {'code_quality': {'issues': issues}}
+
+
+def _run(repo, store, changed):
+    lines = list(LINES)
+    for index, value in changed.items():
+        lines[index] = f"line_{index} = {value}"
+    (repo / 'f.py').write_text('\n'.join(lines) + '\n')
+    config = SyntheticConfig()
+    config.hunk_cache = True
+    config.reuse_results = True
+    analyzer = HunkAnalyzer()
+    assistant = GitAssistant(str(repo), config=config)
+    result, = AnalysisPipeline(assistant, analyzer, store).run(assistant.get_modified_files())['results']
+    return analyzer.requests, sorted(finding.text for finding in result.findings)
+
+
+def test_split_tagged_suggestions_routes_items_by_number():
+    parts, stripped = split_tagged_suggestions(
+        {'code_quality': {'issues': ['[差异块 2] 第二块', '整体评价']}}, 2
+    )
+    assert stripped == {'code_quality': {'issues': ['第二块', '整体评价']}}
+    assert parts[0] == {'code_quality': {'issues': ['整体评价']}}
+    assert parts[1] == {'code_quality': {'issues': ['第二块', '整体评价']}}
+    assert join_hunks('', ['@@ a', '@@ b'], numbered=True) == '[差异块 1]\n@@ a\n[差异块 2]\n@@ b'
+
+
+def test_editing_one_hunk_only_sends_that_hunk(tmp_path):
+    subprocess.run(['git', 'init', '-q'], cwd=tmp_path, check=True)
+    (tmp_path / 'f.py').write_text('\n'.join(LINES) + '\n')
+    subprocess.run(['git', 'add', '-A'], cwd=tmp_path, check=True)
+    subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@example.com', 'commit', '-q', '-m', 'init'],
+                   cwd=tmp_path, check=True)
+    store = ResultStore(str(tmp_path / 'results.db'))
+
+    requests, findings = _run(tmp_path, store, {10: 'a', 80: 'b', 150: 'c'})
+    assert requests == [3]
+    assert findings == ['检查 line_10 = a', '检查 line_150 = c', '检查 line_80 = b']
+
+    # 只改动中间的差异块：其余两块复用，请求中只有变化的一块
+    requests, findings = _run(tmp_path, store, {10: 'a', 80: 'changed', 150: 'c'})
+    assert requests == [1]
+    assert findings == ['检查 line_10 = a', '检查 line_150 = c', '检查 line_80 = changed']
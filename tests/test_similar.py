@@ -0,0 +1,68 @@
+import subprocess
+
+from benchmarks.synthetic import SyntheticAnalyzer, SyntheticConfig
+from src.core.git_assistant import GitAssistant
+from src.core.pipeline import AnalysisPipeline
+from src.core.result_store import ResultStore
+from src.core.similar import diff_literals, diff_signature, normalize_diff
+
+DIFF = (
+    "--- a/buffer.py\n+++ b/buffer.py\n@@ -10,4 +10,4 @@ def flush(buffer):\n"
+    "-    if size == limit:\n"
+    "+    if size == limit and buffer_size > 2048:\n"
+    "         return handle_overflow(buffer, retries=3)\n"
+    "-    buffer.clear()\n"
+    "+    buffer.reset(keep_capacity=True)\n"
+)
+
+
+def _lookup(store, diff_text):
+    return store.lookup_similar(diff_signature(diff_text), diff_literals(diff_text), 'm', 0.9)
+
+
+def test_normalization_keeps_operators_and_numbers():
+    assert normalize_diff(DIFF.replace('==', '!=', 1)) != normalize_diff(DIFF)
+    assert normalize_diff(DIFF.replace('2048', '512')) != normalize_diff(DIFF)
+    moved = DIFF.replace('@@ -10,4 +10,4 @@', '@@ -42,4 +44,4 @@').replace('    if', '\tif')
+    assert normalize_diff(moved) == normalize_diff(DIFF)
+
+
+def test_similar_lookup_rejects_changed_operator_or_literal(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.db'))
+    store.record_similar('buffer.py', diff_signature(DIFF), diff_literals(DIFF), {'analysis': 'ok'}, 'm')
+
+    moved = DIFF.replace('@@ -10,4 +10,4 @@', '@@ -42,4 +44,4 @@')
+    assert _lookup(store, moved) is not None
+    assert _lookup(store, DIFF.replace('==', '!=', 1)) is None
+    assert _lookup(store, DIFF.replace('2048', '512')) is None
+
+
+def test_shared_cluster_result_has_the_source_findings(tmp_path):
+    """复用来源标记不是建议，共享结果的问题应与代表文件完全相同"""
+    def git(*args):
+        subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@example.com', *args],
+                       cwd=tmp_path, check=True, stdout=subprocess.DEVNULL)
+
+    git('init', '-q')
+    for i in range(3):
+        (tmp_path / f'mod_{i}.py').write_text(f"from legacy.http import fetch\n\ndef handler_{i}(data):\n"
+                                              f"    return fetch(data)\n")
+    git('add', '-A')
+    git('commit', '-q', '-m', 'init')
+    for i in range(3):
+        path = tmp_path / f'mod_{i}.py'
+        path.write_text(path.read_text().replace('legacy.http import fetch', 'core.net import request')
+                        .replace('fetch(', 'request('))
+
+    config = SyntheticConfig()
+    config.cluster_threshold = 0.85
+    assistant = GitAssistant(str(tmp_path), config=config)
+    results = AnalysisPipeline(assistant, SyntheticAnalyzer()).run(assistant.get_modified_files())['results']
+
+    shared = [result for result in results if result.reused]
+    assert shared
+    by_file = {result.file: result for result in results}
+    for result in shared:
+        source = by_file[result.reused['path']]
+        assert [(f.severity, f.issue_type, f.text) for f in result.findings] == \
+            [(f.severity, f.issue_type, f.text) for f in source.findings]